@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from expiry import ExpiryIndex
+from schema import ALERT_COLUMNS, REPLACEMENT_YEARS
+
+# --- 設定: 期日アラートの条件 ---
+# 訪問車: 満了日の何日前から知らせるか
+CAR_ALERT_DAYS = 45
+# 画面に最初から表示する件数 (残りはトグルをONにしたときだけ表示)
+ALERT_PREVIEW_COUNT = 20
+
+
+# --- アラートデータの収集 ---
+# 期限カレンダーの索引から、期日が近い (または過ぎた) 項目を行ごとにまとめる。
+# 戻り値: [{"row": 行, "title": 表示名, "messages": [メッセージ]}] (一覧と同じ並び順)
+def collect_alerts(df, today=None, index=None):
+    today = today or datetime.now().date()
+    if df.empty:
+        return []
+    if index is None:
+        index = ExpiryIndex.build(df)
+
+    messages = {}
+
+    # --- 訪問車アラート ---
+    car_columns = ALERT_COLUMNS["訪問車"]
+    for e in index.due_within(CAR_ALERT_DAYS, today, categories={"訪問車"}, items=set(car_columns)):
+        diff = (e["期日"] - today).days
+        date_str = e["期日"].strftime('%Y-%m-%d')
+        msg = f"{e['項目']} 超過 ({date_str})" if diff < 0 else f"{e['項目']} あと{diff}日 ({date_str})"
+        messages.setdefault(e["pos"], []).append((car_columns.index(e["項目"]), msg))
+
+    # --- iPadアラート ---
+    years = REPLACEMENT_YEARS["iPad"]
+    for e in index.due_within(0, today, categories={"iPad"}, items={f"購入から{years}年"}):
+        msg = f"購入から{years}年経過 ({e['元の日付'].strftime('%Y-%m-%d')})"
+        messages.setdefault(e["pos"], []).append((0, msg))
+
+    alert_items = []
+    for pos in sorted(messages):
+        row = df.iloc[pos]
+        name = row.get('品名', '名称不明')
+        if row.get('カテゴリ') == "訪問車":
+            display_text = f"{name} {str(row.get('登録番号', ''))}".strip()
+            title = f"訪問車【{display_text}】"
+        else:
+            display_text = f"{str(row.get('ラベル', ''))} {name}".strip()
+            title = f"iPad【{display_text}】"
+        alert_items.append({
+            "row": row,
+            "title": title,
+            "messages": [msg for _, msg in sorted(messages[pos], key=lambda m: m[0])],
+        })
+    return alert_items
@@ -1,159 +1,44 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime, timedelta
-import time
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+import metrics
+from alerts import ALERT_PREVIEW_COUNT, collect_alerts
+from connection import open_storage
+from expiry import EXPIRY_HORIZONS, EXPIRY_CATEGORIES, ExpiryIndex, timeline_frame
+from import_export import EXPORT_FORMATS, IMPORT_EXTENSIONS, read_upload, plan_import, commit_all, export_file_name, export_bytes
+from integrity import IntegrityReport
+from inventory_store import ConflictError, InventoryStore
+from schema import CATEGORY_MAP, COLUMNS_DEF, STATUS_OPTIONS, BULK_EDIT_COLUMNS, sheet_columns, parse_date
+from search import filter_by_query
+from storage import DuplicateIdError
+from ui_static import APP_CSS, MANUAL_MARKDOWN
 
 # --- ページ設定 ---
 st.set_page_config(page_title="総務備品管理アプリ", page_icon="🏢", layout="wide")
 
+# --- 再実行ごとの計測 (画面の上から順に段階を区切る。結果は末尾で締める) ---
+_script_ctx = get_script_run_ctx()
+metrics.start_run(session=_script_ctx.session_id if _script_ctx else "")
+metrics.phase("setup")
+
 # --- CSS (UI調整: 極限までコンパクト化) ---
-st.markdown("""
-    <style>
-        /* メインエリアの上部余白 */
-        .block-container {
-            padding-top: 4rem !important;
-            padding-bottom: 5rem;
-        }
-
-        /* タイトルの固定 */
-        div[data-testid="stVerticalBlock"] > div:has(h1) {
-            position: sticky !important;
-            top: 2.875rem !important;
-            background-color: white !important;
-            z-index: 1000 !important;
-            padding-top: 1rem !important;
-            padding-bottom: 0.5rem !important;
-            border-bottom: 2px solid #f0f2f6;
-            margin-bottom: 0 !important;
-        }
-        
-        h1 {
-            margin: 0 !important;
-            padding: 0 !important;
-            font-size: 1.8rem !important;
-        }
-
-        /* タブバーの固定 */
-        div[data-baseweb="tab-list"],
-        div[role="tablist"],
-        div[data-testid="stTabs"] > div:first-child {
-            position: sticky !important;
-            top: 6.8rem !important;
-            background-color: white !important;
-            z-index: 999 !important;
-            padding-top: 0.5rem !important;
-            padding-bottom: 0.5rem !important;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.05);
-        }
-
-        div[data-testid="stTabs"] button {
-            background-color: white !important;
-        }
-
-        /* === 行間短縮のための設定 === */
-        
-        /* ボタンを小さく薄く */
-        .stButton button {
-            height: 1.6rem !important;
-            min-height: 1.6rem !important;
-            padding-top: 0 !important;
-            padding-bottom: 0 !important;
-            margin-top: 2px !important;
-            font-size: 0.8rem !important;
-        }
-        
-        /* テキストの行間・余白を削除 */
-        p {
-            margin-bottom: 0px !important;
-            padding-bottom: 0px !important;
-            font-size: 0.9rem !important;
-            line-height: 1.7rem !important;
-        }
-        
-        /* 区切り線(hr)の余白を極小に */
-        hr {
-            margin: 2px 0 !important;
-            padding: 0 !important;
-        }
-        
-        /* 列(カラム)内の余白削除 */
-        div[data-testid="column"] {
-            padding: 0px !important;
-        }
-        
-        /* 要素間の垂直ギャップを詰める */
-        div.stMarkdown {
-            margin-bottom: 0px !important;
-        }
-        
-        /* アラート外枠のパディング調整 */
-        div.alert-box {
-            padding: 0.5rem 1rem !important;
-        }
-        
-        /* トグルスイッチの位置調整 */
-        div[data-testid="stToggle"] {
-            margin-top: 0px;
-            padding-top: 5px;
-        }
-        div[data-testid="stToggle"] label {
-            font-size: 0.9rem !important;
-        }
-    </style>
-""", unsafe_allow_html=True)
-
-# --- 設定: カテゴリとシート名の対応表 ---
-CATEGORY_MAP = {
-    "PC": "PC",
-    "訪問車": "訪問車",
-    "iPad": "iPad",
-    "携帯電話": "携帯電話",
-    "Office365": "Office365",
-    "ウイルスバスター": "ウイルスバスター",
-    "その他": "その他"
-}
-
-# --- 設定: 各シートの列定義 ---
-COLUMNS_DEF = {
-    "PC": [
-        "購入日", "OS", "プロダクトID(シリアルNo)", "ラベル",
-        "ORCA宇都宮", "ORCA鹿沼", "ORCA益子", 
-        "officeのアカウント割振", "ウィルスバスターシリアルNo", "ウィルスバスター期限", "ウィルスバスター識別ネーム",
-        "チームビューワID", "チームビューワPW", "備考"
-    ],
-    "訪問車": [
-        "登録番号", "洗車グループ", "駐車場", 
-        "タイヤサイズ", "スタッドレス有無", "タイヤ保管場所", 
-        "リース開始日", "リース満了日", "車検満了日", 
-        "駐禁除外指定満了日", "通行禁止許可満了日", "使用部署", "備考"
-    ],
-    "iPad": [
-        "購入日", "ラベル", "AppleID", "シリアルNo", 
-        "ストレージ", "製造番号IMEI", "端末番号", 
-        "使用部署", "キャリア", "備考"
-    ],
-    "携帯電話": [
-        "購入日", "電話番号", "SIM", "メーカー",
-        "製造番号", "使用部署", "保管場所", "キャリア", "備考"
-    ],
-    "Office365": [
-        "アカウントID", "パスワード", "利用者1", "利用者2", "利用者3", "利用者4", "利用者5", "備考"
-    ],
-    "ウイルスバスター": [
-        "利用者1", "利用者2", "利用者3", "期限", "備考"
-    ],
-    "その他": [
-        "備考"
-    ]
-}
+st.markdown(APP_CSS, unsafe_allow_html=True)
 
 # --- 設定: クラウドの金庫(Secrets)から情報を取得 ---
-scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-creds = ServiceAccountCredentials.from_json_keyfile_dict(st.secrets["gcp_service_account"], scope)
-client = gspread.authorize(creds)
-SPREADSHEET_NAME = 'management_db'
+# secrets.toml の任意セクションを読む (ファイル自体がなくても動くように)
+def get_config(section):
+    try:
+        return dict(st.secrets.get(section, {}))
+    except FileNotFoundError:
+        return {}
+
+# --- 保存先 (Sheets クライアントのレート制限・リトライを含む) はプロセス内で1つだけ作る ---
+# [storage] / [sheets] の設定項目は connection.py を参照
+@st.cache_resource
+def get_storage():
+    return open_storage({section: get_config(section) for section in ("storage", "sheets", "gcp_service_account")})
 
 # --- セッションステート初期化 ---
 if 'form_data' not in st.session_state:
@@ -162,55 +47,32 @@ if 'page_number' not in st.session_state:
     st.session_state['page_number'] = 0
 if 'active_search_query' not in st.session_state:
     st.session_state['active_search_query'] = ""
+if 'bulk_selected' not in st.session_state:
+    st.session_state['bulk_selected'] = {}
 
 # --- データ取得関数 ---
-@st.cache_data(ttl=600)
+# シートごとの読込状況を持つ共有キャッシュ。失敗したシートだけがバックグラウンドで再取得される。
+@st.cache_resource
+def get_inventory_store():
+    return InventoryStore(get_storage(), CATEGORY_MAP)
+
 def get_all_data():
-    all_data = []
-    for cat_name, sheet_name in CATEGORY_MAP.items():
-        try:
-            worksheet = client.open(SPREADSHEET_NAME).worksheet(sheet_name)
-            records = worksheet.get_all_records(value_render_option='FORMATTED_VALUE')
-            for record in records:
-                record['カテゴリ'] = cat_name
-            all_data.extend(records)
-        except gspread.WorksheetNotFound:
-            pass
-        except Exception:
-            pass
-    
-    df = pd.DataFrame(all_data)
-    
-    if not df.empty:
-        df['sort_order'] = df['ステータス'].apply(lambda x: 1 if x == '廃棄' else 0)
-        df = df.sort_values(by=['sort_order', 'ID'], ascending=[True, True])
-    
-    return df
+    return get_inventory_store().get_data()
 
-# --- 【最強版】日付パース関数 ---
-def parse_date(date_val):
-    if date_val is None or date_val == "":
-        return None
-    
-    if isinstance(date_val, (int, float)):
-        try:
-            return datetime(1899, 12, 30) + timedelta(days=date_val)
-        except:
-            pass
+# 期限カレンダーの索引 (データが変わったときだけ作り直す)
+def get_expiry_index():
+    return get_inventory_store().derived("expiry", ExpiryIndex.build)
 
-    date_str = str(date_val).strip()
-    if not date_str:
-        return None
+# データ整合性チェック (データが変わったときだけ作り直す)
+def get_integrity_report():
+    return get_inventory_store().derived("integrity", IntegrityReport.build)
 
-    date_str = date_str.replace('.', '/').replace('-', '/').replace('年', '/').replace('月', '/').replace('日', '')
-    
-    try:
-        ts = pd.to_datetime(date_str, errors='coerce')
-        if pd.isna(ts):
-            return None
-        return ts.to_pydatetime()
-    except:
-        return None
+# 期日アラート (データが変わったときと、日付が変わったときだけ作り直す)
+def get_alert_items():
+    today = datetime.now().date()
+    return get_inventory_store().derived(
+        "alerts", lambda df: collect_alerts(df, today, index=get_expiry_index()), key=today
+    )
 
 # --- 検索実行用コールバック関数 ---
 def submit_search():
@@ -223,11 +85,156 @@ def clear_search():
     st.session_state.active_search_query = ""
     st.session_state.page_number = 0
 
+# --- 複数選択用コールバック関数 ---
+# 同じ行は「すべて」タブとカテゴリ別タブの両方に出るので、両方のチェック状態を揃える
+def toggle_selection(widget_key, cat, item_id, index):
+    checked = st.session_state[widget_key]
+    if checked:
+        st.session_state.bulk_selected[(cat, item_id)] = True
+    else:
+        st.session_state.bulk_selected.pop((cat, item_id), None)
+    for tab in ("すべて", cat):
+        st.session_state[f"sel_{tab}_{index}_{item_id}"] = checked
+
+def clear_selection():
+    st.session_state.bulk_selected = {}
+    for key in [k for k in st.session_state if str(k).startswith("sel_")]:
+        del st.session_state[key]
+
+# --- 一覧の左端 (詳細ボタン or 選択チェック) ---
+def render_row_action(cell, category, index, row):
+    if st.session_state.get('bulk_mode'):
+        cat, item_id = row['カテゴリ'], str(row['ID'])
+        widget_key = f"sel_{category}_{index}_{item_id}"
+        if widget_key not in st.session_state:
+            st.session_state[widget_key] = (cat, item_id) in st.session_state.bulk_selected
+        cell.checkbox("選択", key=widget_key, label_visibility="collapsed",
+                      on_change=toggle_selection, args=(widget_key, cat, item_id, index))
+    elif cell.button("詳細", key=f"btn_{category}_{index}"):
+        open_detail_dialog(row)
+
+# --- 一括編集フォーム ---
+def show_bulk_edit_form():
+    selected = list(st.session_state.bulk_selected)
+    with st.form("bulk_edit_form"):
+        st.markdown(f"##### 🧰 一括編集 (選択中: {len(selected)} 件)")
+        st.caption("変更したい項目だけ入力してください。空欄・「変更しない」の項目はそのまま残ります。")
+        new_values = {}
+        for col, cell in zip(BULK_EDIT_COLUMNS, st.columns(len(BULK_EDIT_COLUMNS))):
+            if col == "ステータス":
+                value = cell.selectbox(col, ["(変更しない)"] + STATUS_OPTIONS)
+                if value != "(変更しない)":
+                    new_values[col] = value
+            else:
+                value = cell.text_input(col).strip()
+                if value:
+                    new_values[col] = value
+
+        c_apply, c_clear = st.columns([1, 1])
+        submitted = c_apply.form_submit_button("✅ 選択した全件に反映する")
+        c_clear.form_submit_button("選択を解除", on_click=clear_selection)
+
+    if submitted:
+        if not new_values:
+            st.error("変更する項目が指定されていません。")
+            return
+        by_cat = {}
+        for cat, item_id in selected:
+            by_cat.setdefault(cat, []).append(item_id)
+
+        store = get_inventory_store()
+        current_time = datetime.now().strftime('%Y-%m-%d')
+        messages = []
+        try:
+            # シートごとに1回の batch_update で書き込み、キャッシュは書いた行だけ差し替える
+            for cat, ids in by_cat.items():
+                fields = {k: v for k, v in new_values.items() if k in sheet_columns(cat)}
+                skipped = [k for k in new_values if k not in fields]
+                if skipped:
+                    messages.append(f"{cat}: 「{'、'.join(skipped)}」列がないため変更しませんでした")
+                if not fields:
+                    continue
+                fields['更新日'] = current_time
+                updated, missing = store.write_fields(cat, {item_id: fields for item_id in ids}, site="一括編集")
+                messages.append(f"{cat}: {len(updated)} 件を更新しました")
+                if missing:
+                    messages.append(f"{cat}: ID {', '.join(missing)} がシートに見つかりませんでした")
+        except Exception as e:
+            st.error(f"一括更新エラー: {e}")
+            return
+        clear_selection()
+        st.session_state.bulk_messages = messages
+        st.rerun()
+
 # --- ポップアップ詳細・編集画面 ---
-@st.dialog("📝 詳細情報の編集")
+def open_detail_dialog(row):
+    # 前に開いたときの競合表示は持ち越さない。別の行を開くときは、入力値と版も捨てる
+    st.session_state.pop("save_conflict", None)
+    if detail_base_key(row) not in st.session_state:
+        clear_detail_state()
+    show_detail_dialog(row)
+
+def detail_base_key(row):
+    return f"detail_base_{row['カテゴリ']}_{row['ID']}"
+
+def clear_detail_state():
+    # 詳細ダイアログの版 (detail_base_...) と入力欄 (detail_列名) を捨てる。閉じたとき・保存できたときに呼ぶ
+    for key in [k for k in st.session_state if str(k).startswith("detail_")]:
+        del st.session_state[key]
+
+def save_detail(row_data, edited, force=False):
+    # 開いたときの内容 (row_data) を版として条件付きで保存する。競合したら内容を残して画面に出す
+    cat = row_data['カテゴリ']
+    try:
+        result = get_inventory_store().save_record(cat, row_data['ID'], row_data, edited, site="編集ダイアログ", force=force)
+    except ConflictError as e:
+        st.session_state.save_conflict = {"カテゴリ": cat, "ID": row_data['ID'], "base": row_data, "edited": edited, "conflicts": e.conflicts}
+        return
+    except KeyError:
+        st.error("エラー: IDが見つかりませんでした。")
+        return
+    except Exception as e:
+        st.error(f"更新エラー: {e}")
+        return
+    st.session_state.pop("save_conflict", None)
+    clear_detail_state()
+    if not result["written"]:
+        st.toast("変更はありませんでした。", icon="ℹ️")
+    elif result["merged"]:
+        st.toast(f"更新しました！ (他の人が変更した「{'、'.join(result['merged'])}」はそのまま残しました)", icon="✅")
+    else:
+        st.toast("更新しました！", icon="✅")
+    st.rerun()
+
+def show_save_conflict(conflict):
+    st.warning("⚠️ 編集中に、他の人が同じ項目を更新していました。保存していません。")
+    st.dataframe(pd.DataFrame([
+        {"項目": col, "開いたときの値": base, "他の人の変更": theirs, "あなたの入力": mine}
+        for col, (base, theirs, mine) in conflict["conflicts"].items()
+    ]), hide_index=True)
+    c_force, c_reload = st.columns(2)
+    if c_force.button("自分の入力で上書きする", key="conflict_force_btn"):
+        save_detail(conflict["base"], conflict["edited"], force=True)
+    if c_reload.button("最新の内容で編集し直す", key="conflict_reload_btn"):
+        st.session_state.pop("save_conflict", None)
+        clear_detail_state()
+        st.rerun(scope="fragment")
+
+@st.dialog("📝 詳細情報の編集", on_dismiss=clear_detail_state)
 def show_detail_dialog(row_data):
     st.caption("ここで内容を修正して「更新」ボタンを押すと保存されます。")
-    
+
+    # 一覧には一部の列しかないので、開いたときに1行分の全項目を取得する (最近開いたものはキャッシュから)。
+    # 取得した行はダイアログを閉じるまで保存の版として使い、再実行のたびに取り直さない
+    base_key = detail_base_key(row_data)
+    if base_key not in st.session_state:
+        try:
+            st.session_state[base_key] = get_inventory_store().get_record(row_data['カテゴリ'], row_data['ID'])
+        except Exception as e:
+            st.error(f"詳細データの取得に失敗しました: {e}")
+            return
+    row_data = st.session_state[base_key]
+
     def get_date_val(key):
         return parse_date(row_data.get(key))
 
@@ -237,13 +244,12 @@ def show_detail_dialog(row_data):
         
         col1, col2 = st.columns(2)
         with col1:
-            new_name = st.text_input("品名", value=row_data['品名'])
-            new_user = st.text_input("利用者(代表)", value=row_data['利用者'])
+            new_name = st.text_input("品名", value=row_data['品名'], key="detail_品名")
+            new_user = st.text_input("利用者(代表)", value=row_data['利用者'], key="detail_利用者")
         with col2:
-            status_options = ["利用可能", "貸出中", "故障/修理中", "廃棄"]
             curr_status = row_data['ステータス']
-            idx_status = status_options.index(curr_status) if curr_status in status_options else 0
-            new_status = st.selectbox("ステータス", status_options, index=idx_status)
+            idx_status = STATUS_OPTIONS.index(curr_status) if curr_status in STATUS_OPTIONS else 0
+            new_status = st.selectbox("ステータス", STATUS_OPTIONS, index=idx_status, key="detail_ステータス")
         
         st.markdown("---")
         
@@ -253,804 +259,825 @@ def show_detail_dialog(row_data):
         if cat == "PC":
             c1, c2 = st.columns(2)
             with c1:
-                d_buy = st.date_input("購入日", value=get_date_val('購入日'))
+                d_buy = st.date_input("購入日", value=get_date_val('購入日'), key="detail_購入日")
                 custom_values['購入日'] = d_buy.strftime('%Y-%m-%d') if d_buy else ''
-                custom_values['OS'] = st.text_input("OS", value=row_data.get('OS'))
-                custom_values['プロダクトID(シリアルNo)'] = st.text_input("プロダクトID(シリアルNo)", value=row_data.get('プロダクトID(シリアルNo)'))
-                custom_values['ラベル'] = st.text_input("ラベル", value=row_data.get('ラベル'))
-                custom_values['officeのアカウント割振'] = st.text_input("officeのアカウント割振", value=row_data.get('officeのアカウント割振'))
+                custom_values['OS'] = st.text_input("OS", value=row_data.get('OS'), key="detail_OS")
+                custom_values['プロダクトID(シリアルNo)'] = st.text_input("プロダクトID(シリアルNo)", value=row_data.get('プロダクトID(シリアルNo)'), key="detail_プロダクトID(シリアルNo)")
+                custom_values['ラベル'] = st.text_input("ラベル", value=row_data.get('ラベル'), key="detail_ラベル")
+                custom_values['officeのアカウント割振'] = st.text_input("officeのアカウント割振", value=row_data.get('officeのアカウント割振'), key="detail_officeのアカウント割振")
             with c2:
-                custom_values['ORCA宇都宮'] = st.text_input("ORCA宇都宮", value=row_data.get('ORCA宇都宮'))
-                custom_values['ORCA鹿沼'] = st.text_input("ORCA鹿沼", value=row_data.get('ORCA鹿沼'))
-                custom_values['ORCA益子'] = st.text_input("ORCA益子", value=row_data.get('ORCA益子'))
-                custom_values['チームビューワID'] = st.text_input("チームビューワID", value=row_data.get('チームビューワID'))
-                custom_values['チームビューワPW'] = st.text_input("チームビューワPW", value=row_data.get('チームビューワPW'))
+                custom_values['ORCA宇都宮'] = st.text_input("ORCA宇都宮", value=row_data.get('ORCA宇都宮'), key="detail_ORCA宇都宮")
+                custom_values['ORCA鹿沼'] = st.text_input("ORCA鹿沼", value=row_data.get('ORCA鹿沼'), key="detail_ORCA鹿沼")
+                custom_values['ORCA益子'] = st.text_input("ORCA益子", value=row_data.get('ORCA益子'), key="detail_ORCA益子")
+                custom_values['チームビューワID'] = st.text_input("チームビューワID", value=row_data.get('チームビューワID'), key="detail_チームビューワID")
+                custom_values['チームビューワPW'] = st.text_input("チームビューワPW", value=row_data.get('チームビューワPW'), key="detail_チームビューワPW")
             st.caption("ウィルスバスター情報")
             c3, c4, c5 = st.columns(3)
-            with c3: custom_values['ウィルスバスターシリアルNo'] = st.text_input("VBシリアルNo", value=row_data.get('ウィルスバスターシリアルNo'))
+            with c3: custom_values['ウィルスバスターシリアルNo'] = st.text_input("VBシリアルNo", value=row_data.get('ウィルスバスターシリアルNo'), key="detail_ウィルスバスターシリアルNo")
             with c4: 
-                d_vb = st.date_input("VB期限", value=get_date_val('ウィルスバスター期限'))
+                d_vb = st.date_input("VB期限", value=get_date_val('ウィルスバスター期限'), key="detail_ウィルスバスター期限")
                 custom_values['ウィルスバスター期限'] = d_vb.strftime('%Y-%m-%d') if d_vb else ''
-            with c5: custom_values['ウィルスバスター識別ネーム'] = st.text_input("VB識別ネーム", value=row_data.get('ウィルスバスター識別ネーム'))
-            custom_values['備考'] = st.text_area("備考", value=row_data.get('備考'))
+            with c5: custom_values['ウィルスバスター識別ネーム'] = st.text_input("VB識別ネーム", value=row_data.get('ウィルスバスター識別ネーム'), key="detail_ウィルスバスター識別ネーム")
+            custom_values['備考'] = st.text_area("備考", value=row_data.get('備考'), key="detail_備考")
 
         elif cat == "訪問車":
             c1, c2 = st.columns(2)
             with c1:
-                custom_values['登録番号'] = st.text_input("登録番号", value=row_data.get('登録番号'))
-                custom_values['使用部署'] = st.text_input("使用部署", value=row_data.get('使用部署'))
-                custom_values['洗車グループ'] = st.text_input("洗車グループ", value=row_data.get('洗車グループ'))
-                custom_values['駐車場'] = st.text_input("駐車場", value=row_data.get('駐車場'))
-                custom_values['タイヤサイズ'] = st.text_input("タイヤサイズ", value=row_data.get('タイヤサイズ'))
-                custom_values['タイヤ保管場所'] = st.text_input("タイヤ保管場所", value=row_data.get('タイヤ保管場所'))
-                custom_values['スタッドレス有無'] = st.text_input("スタッドレス有無", value=row_data.get('スタッドレス有無'))
+                custom_values['登録番号'] = st.text_input("登録番号", value=row_data.get('登録番号'), key="detail_登録番号")
+                custom_values['使用部署'] = st.text_input("使用部署", value=row_data.get('使用部署'), key="detail_使用部署")
+                custom_values['洗車グループ'] = st.text_input("洗車グループ", value=row_data.get('洗車グループ'), key="detail_洗車グループ")
+                custom_values['駐車場'] = st.text_input("駐車場", value=row_data.get('駐車場'), key="detail_駐車場")
+                custom_values['タイヤサイズ'] = st.text_input("タイヤサイズ", value=row_data.get('タイヤサイズ'), key="detail_タイヤサイズ")
+                custom_values['タイヤ保管場所'] = st.text_input("タイヤ保管場所", value=row_data.get('タイヤ保管場所'), key="detail_タイヤ保管場所")
+                custom_values['スタッドレス有無'] = st.text_input("スタッドレス有無", value=row_data.get('スタッドレス有無'), key="detail_スタッドレス有無")
             with c2:
-                d_lease_s = st.date_input("リース開始日", value=get_date_val('リース開始日'))
+                d_lease_s = st.date_input("リース開始日", value=get_date_val('リース開始日'), key="detail_リース開始日")
                 custom_values['リース開始日'] = d_lease_s.strftime('%Y-%m-%d') if d_lease_s else ''
-                d_lease_e = st.date_input("リース満了日", value=get_date_val('リース満了日'))
+                d_lease_e = st.date_input("リース満了日", value=get_date_val('リース満了日'), key="detail_リース満了日")
                 custom_values['リース満了日'] = d_lease_e.strftime('%Y-%m-%d') if d_lease_e else ''
-                d_syaken = st.date_input("車検満了日", value=get_date_val('車検満了日'))
+                d_syaken = st.date_input("車検満了日", value=get_date_val('車検満了日'), key="detail_車検満了日")
                 custom_values['車検満了日'] = d_syaken.strftime('%Y-%m-%d') if d_syaken else ''
-                d_park = st.date_input("駐禁除外指定満了日", value=get_date_val('駐禁除外指定満了日'))
+                d_park = st.date_input("駐禁除外指定満了日", value=get_date_val('駐禁除外指定満了日'), key="detail_駐禁除外指定満了日")
                 custom_values['駐禁除外指定満了日'] = d_park.strftime('%Y-%m-%d') if d_park else ''
-                d_road = st.date_input("通行禁止許可満了日", value=get_date_val('通行禁止許可満了日'))
+                d_road = st.date_input("通行禁止許可満了日", value=get_date_val('通行禁止許可満了日'), key="detail_通行禁止許可満了日")
                 custom_values['通行禁止許可満了日'] = d_road.strftime('%Y-%m-%d') if d_road else ''
-            custom_values['備考'] = st.text_area("備考", value=row_data.get('備考'))
+            custom_values['備考'] = st.text_area("備考", value=row_data.get('備考'), key="detail_備考")
 
         elif cat == "iPad":
             c1, c2 = st.columns(2)
             with c1:
-                d_buy = st.date_input("購入日", value=get_date_val('購入日'))
+                d_buy = st.date_input("購入日", value=get_date_val('購入日'), key="detail_購入日")
                 custom_values['購入日'] = d_buy.strftime('%Y-%m-%d') if d_buy else ''
-                custom_values['ラベル'] = st.text_input("ラベル", value=row_data.get('ラベル'))
-                custom_values['AppleID'] = st.text_input("AppleID", value=row_data.get('AppleID'))
-                custom_values['シリアルNo'] = st.text_input("シリアルNo", value=row_data.get('シリアルNo'))
-                custom_values['ストレージ'] = st.text_input("ストレージ", value=row_data.get('ストレージ'))
+                custom_values['ラベル'] = st.text_input("ラベル", value=row_data.get('ラベル'), key="detail_ラベル")
+                custom_values['AppleID'] = st.text_input("AppleID", value=row_data.get('AppleID'), key="detail_AppleID")
+                custom_values['シリアルNo'] = st.text_input("シリアルNo", value=row_data.get('シリアルNo'), key="detail_シリアルNo")
+                custom_values['ストレージ'] = st.text_input("ストレージ", value=row_data.get('ストレージ'), key="detail_ストレージ")
             with c2:
-                custom_values['製造番号IMEI'] = st.text_input("製造番号IMEI", value=row_data.get('製造番号IMEI'))
-                custom_values['端末番号'] = st.text_input("端末番号", value=row_data.get('端末番号'))
-                custom_values['使用部署'] = st.text_input("使用部署", value=row_data.get('使用部署'))
-                custom_values['キャリア'] = st.text_input("キャリア", value=row_data.get('キャリア'))
-            custom_values['備考'] = st.text_area("備考", value=row_data.get('備考'))
+                custom_values['製造番号IMEI'] = st.text_input("製造番号IMEI", value=row_data.get('製造番号IMEI'), key="detail_製造番号IMEI")
+                custom_values['端末番号'] = st.text_input("端末番号", value=row_data.get('端末番号'), key="detail_端末番号")
+                custom_values['使用部署'] = st.text_input("使用部署", value=row_data.get('使用部署'), key="detail_使用部署")
+                custom_values['キャリア'] = st.text_input("キャリア", value=row_data.get('キャリア'), key="detail_キャリア")
+            custom_values['備考'] = st.text_area("備考", value=row_data.get('備考'), key="detail_備考")
 
         elif cat == "携帯電話":
             c1, c2 = st.columns(2)
             with c1:
-                d_buy = st.date_input("購入日", value=get_date_val('購入日'))
+                d_buy = st.date_input("購入日", value=get_date_val('購入日'), key="detail_購入日")
                 custom_values['購入日'] = d_buy.strftime('%Y-%m-%d') if d_buy else ''
-                custom_values['電話番号'] = st.text_input("電話番号", value=row_data.get('電話番号'))
-                custom_values['SIM'] = st.text_input("SIM", value=row_data.get('SIM'))
-                custom_values['メーカー'] = st.text_input("メーカー", value=row_data.get('メーカー'))
+                custom_values['電話番号'] = st.text_input("電話番号", value=row_data.get('電話番号'), key="detail_電話番号")
+                custom_values['SIM'] = st.text_input("SIM", value=row_data.get('SIM'), key="detail_SIM")
+                custom_values['メーカー'] = st.text_input("メーカー", value=row_data.get('メーカー'), key="detail_メーカー")
             with c2:
-                custom_values['製造番号'] = st.text_input("製造番号", value=row_data.get('製造番号'))
-                custom_values['使用部署'] = st.text_input("使用部署", value=row_data.get('使用部署'))
-                custom_values['保管場所'] = st.text_input("保管場所", value=row_data.get('保管場所'))
-                custom_values['キャリア'] = st.text_input("キャリア", value=row_data.get('キャリア'))
-            custom_values['備考'] = st.text_area("備考", value=row_data.get('備考'))
+                custom_values['製造番号'] = st.text_input("製造番号", value=row_data.get('製造番号'), key="detail_製造番号")
+                custom_values['使用部署'] = st.text_input("使用部署", value=row_data.get('使用部署'), key="detail_使用部署")
+                custom_values['保管場所'] = st.text_input("保管場所", value=row_data.get('保管場所'), key="detail_保管場所")
+                custom_values['キャリア'] = st.text_input("キャリア", value=row_data.get('キャリア'), key="detail_キャリア")
+            custom_values['備考'] = st.text_area("備考", value=row_data.get('備考'), key="detail_備考")
 
         elif cat == "Office365":
             c1, c2 = st.columns(2)
-            with c1: custom_values['アカウントID'] = st.text_input("アカウントID", value=row_data.get('アカウントID'))
-            with c2: custom_values['パスワード'] = st.text_input("パスワード", value=row_data.get('パスワード'))
+            with c1: custom_values['アカウントID'] = st.text_input("アカウントID", value=row_data.get('アカウントID'), key="detail_アカウントID")
+            with c2: custom_values['パスワード'] = st.text_input("パスワード", value=row_data.get('パスワード'), key="detail_パスワード")
             
             st.caption("共有利用者")
             c_u1, c_u2, c_u3 = st.columns(3)
-            with c_u1: custom_values['利用者1'] = st.text_input("利用者1", value=row_data.get('利用者1'))
-            with c_u2: custom_values['利用者2'] = st.text_input("利用者2", value=row_data.get('利用者2'))
-            with c_u3: custom_values['利用者3'] = st.text_input("利用者3", value=row_data.get('利用者3'))
+            with c_u1: custom_values['利用者1'] = st.text_input("利用者1", value=row_data.get('利用者1'), key="detail_利用者1")
+            with c_u2: custom_values['利用者2'] = st.text_input("利用者2", value=row_data.get('利用者2'), key="detail_利用者2")
+            with c_u3: custom_values['利用者3'] = st.text_input("利用者3", value=row_data.get('利用者3'), key="detail_利用者3")
             
             c_u4, c_u5 = st.columns(2)
-            with c_u4: custom_values['利用者4'] = st.text_input("利用者4", value=row_data.get('利用者4'))
-            with c_u5: custom_values['利用者5'] = st.text_input("利用者5", value=row_data.get('利用者5'))
+            with c_u4: custom_values['利用者4'] = st.text_input("利用者4", value=row_data.get('利用者4'), key="detail_利用者4")
+            with c_u5: custom_values['利用者5'] = st.text_input("利用者5", value=row_data.get('利用者5'), key="detail_利用者5")
             
-            custom_values['備考'] = st.text_area("備考", value=row_data.get('備考'))
+            custom_values['備考'] = st.text_area("備考", value=row_data.get('備考'), key="detail_備考")
 
         elif cat == "ウイルスバスター":
             st.caption("利用者情報")
             c1, c2, c3 = st.columns(3)
-            with c1: custom_values['利用者1'] = st.text_input("利用者1", value=row_data.get('利用者1'))
-            with c2: custom_values['利用者2'] = st.text_input("利用者2", value=row_data.get('利用者2'))
-            with c3: custom_values['利用者3'] = st.text_input("利用者3", value=row_data.get('利用者3'))
+            with c1: custom_values['利用者1'] = st.text_input("利用者1", value=row_data.get('利用者1'), key="detail_利用者1")
+            with c2: custom_values['利用者2'] = st.text_input("利用者2", value=row_data.get('利用者2'), key="detail_利用者2")
+            with c3: custom_values['利用者3'] = st.text_input("利用者3", value=row_data.get('利用者3'), key="detail_利用者3")
             
             st.caption("期限")
-            d_exp = st.date_input("期限", value=get_date_val('期限'))
+            d_exp = st.date_input("期限", value=get_date_val('期限'), key="detail_期限")
             custom_values['期限'] = d_exp.strftime('%Y-%m-%d') if d_exp else ''
             
-            custom_values['備考'] = st.text_area("備考", value=row_data.get('備考'))
+            custom_values['備考'] = st.text_area("備考", value=row_data.get('備考'), key="detail_備考")
 
         elif cat == "その他":
-            custom_values['備考'] = st.text_area("備考", value=row_data.get('備考'))
+            custom_values['備考'] = st.text_area("備考", value=row_data.get('備考'), key="detail_備考")
 
         st.markdown("---")
         if st.form_submit_button("✅ この内容で更新する"):
-            try:
-                target_sheet_name = CATEGORY_MAP[cat]
-                worksheet = client.open(SPREADSHEET_NAME).worksheet(target_sheet_name)
-                current_time = datetime.now().strftime('%Y-%m-%d')
-                
-                row_to_save = [
-                    row_data['ID'], cat, new_name, new_user, new_status, current_time
-                ]
-                for col_name in COLUMNS_DEF.get(cat, []):
-                    row_to_save.append(custom_values.get(col_name, ''))
-                
-                cell = worksheet.find(str(row_data['ID']))
-                if cell:
-                    r = cell.row
-                    worksheet.update(f"A{r}", [row_to_save])
-                    st.toast("更新しました！", icon="✅")
-                    get_all_data.clear()
-                    st.rerun()
-                else:
-                    st.error("エラー: IDが見つかりませんでした。")
-            except Exception as e:
-                st.error(f"更新エラー: {e}")
+            current_time = datetime.now().strftime('%Y-%m-%d')
+            
+            row_to_save = [
+                row_data['ID'], cat, new_name, new_user, new_status, current_time
+            ]
+            for col_name in COLUMNS_DEF.get(cat, []):
+                row_to_save.append(custom_values.get(col_name, ''))
+            
+            # 変えた列だけを書き込む (開いたときと同じ値の列は書かない)
+            save_detail(row_data, dict(zip(sheet_columns(cat), row_to_save)))
+
+    conflict = st.session_state.get("save_conflict")
+    if conflict and conflict["カテゴリ"] == row_data['カテゴリ'] and str(conflict["ID"]) == str(row_data['ID']):
+        show_save_conflict(conflict)
+
+# --- 計測パネル (再実行1回ぶんの内訳と、プロセス内の直近の履歴) ---
+def show_metrics_panel(run):
+    with st.expander("⏱️ パフォーマンス計測", expanded=True):
+        st.caption(f"今回の再実行: {run.total * 1000:.0f} ms")
+        st.dataframe(pd.DataFrame(
+            [{"段階": name, "ms": round(sec * 1000, 1)} for name, sec in run.phases.items()]
+        ), hide_index=True)
+        if run.spans:
+            st.dataframe(pd.DataFrame(
+                [{"処理": name, "ms": round(s["seconds"] * 1000, 1), "回数": s["calls"]} for name, s in run.spans.items()]
+            ), hide_index=True)
+        if run.counters:
+            st.dataframe(pd.DataFrame(
+                [{"項目": name, "件数": n} for name, n in run.counters.items()]
+            ), hide_index=True)
+        recent = metrics.history()[-20:]
+        st.caption(f"直近 {len(recent)} 回 (全セッション)")
+        st.dataframe(pd.DataFrame([{
+            "開始": r.started_at.strftime("%H:%M:%S"),
+            "ms": round(r.total * 1000),
+            "API": r.counters.get("api_read", 0) + r.counters.get("api_write", 0),
+            "表示行": r.counters.get("rows_rendered", 0),
+        } for r in reversed(recent)]), hide_index=True)
 
 # --- アプリの画面構成 ---
+metrics.phase("sidebar")
 st.title('📱 総務備品管理アプリ')
 
 with st.sidebar:
     if st.button("🔄 データを最新にする"):
-        get_all_data.clear()
+        get_inventory_store().invalidate()
         st.rerun()
     
     st.markdown("---")
     
-    with st.expander("❓ 操作マニュアル", expanded=False):
-        st.markdown("""
-        **1. 検索機能**
-        * 画面上部の枠に文字を入れて `Enter` を押すと検索できます。
-        * **バーコードリーダー対応:** 入力後、自動で文字が消えるので連続して読み取れます。
-        * 「検索解除」ボタンで全表示に戻ります。
-
-        **2. 期日アラート**
-        * 期限が **45日以内**（車）または **5年経過**（iPad）の場合、検索窓の下に赤字で警告が出ます。
-        * アラート右側の **「詳細」ボタン** を押すと、その場で編集・確認ができます。
-        * 赤枠内のトグルスイッチで「訪問車」と「iPad」の表示を切り替えられます。
-
-        **3. 編集・更新**
-        * リスト左の「詳細」ボタンで編集画面が開きます。
-        * 内容を書き換えて「更新する」を押すと保存されます。
-
-        **4. 新規登録**
-        * 上部のタブを「📝 新規登録」に切り替えて入力してください。
-        
-        **5. CSV一括入出力**
-        * データをCSVでダウンロードしてExcel等で編集し、一括で更新・登録ができます。
-        """)
+    # 開いたときだけ本文を組み立てる
+    manual = st.expander("❓ 操作マニュアル", expanded=False, key="manual_open", on_change="rerun")
+    if manual.open:
+        manual.markdown(MANUAL_MARKDOWN)
+
+    with st.expander("📊 API呼び出し状況", expanded=False):
+        api_stats = get_storage().api_stats()
+        if api_stats:
+            st.dataframe(pd.DataFrame(api_stats), hide_index=True)
+        else:
+            st.caption("まだAPI呼び出しはありません。")
+        change_log = get_inventory_store().change_log_status()
+        if change_log["polled_at"]:
+            st.caption(f"変更履歴: 連番 {change_log['seq']} まで取り込み済み (最終確認 {change_log['polled_at']:%H:%M:%S})")
+        if change_log["error"]:
+            st.caption(f"⚠️ 変更履歴を読み書きできません (他の端末の変更は自動読込まで反映されません): {change_log['error']}")
 
 try:
+    metrics.phase("load_data")
     df = get_all_data()
 
-    main_tab1, main_tab2, main_tab3 = st.tabs(["🔍 一覧・検索", "📝 新規登録", "📂 CSV一括入出力"])
+    # --- 読み込みに失敗したカテゴリの表示 ---
+    stale_categories = get_inventory_store().stale_categories()
+    if stale_categories:
+        c_warn, c_retry = st.columns([4, 1])
+        c_warn.warning(
+            f"⚠️ 次のカテゴリの読み込みに失敗しました: **{'、'.join(stale_categories)}**  \n"
+            "自動で再試行中です。表示中のデータが古いか、含まれていない可能性があります。"
+        )
+        if c_retry.button("🔁 失敗分を再読込", key="retry_stale_btn"):
+            get_inventory_store().retry_failed()
+            st.rerun()
+
+    # --- データ整合性チェック (IDや機器番号の重複) ---
+    metrics.phase("integrity")
+    integrity = get_integrity_report()
+    if integrity.issues:
+        summary = "、".join(f"{kind} {n}件" for kind, n in integrity.counts().items())
+        st.warning(f"⚠️ データに重複が見つかりました: {summary}")
+        if integrity.ambiguous:
+            st.caption("※ 同じシートで重複しているIDは、どの行を更新するか決められないため編集・インポートで書き込みません。シート上で重複を解消してください。")
+        report = st.expander("🧾 データ整合性レポート", expanded=False, key="integrity_open", on_change="rerun")
+        if report.open:
+            report.dataframe(integrity.to_frame(), hide_index=True)
+
+    # 画面の切り替えはタブで行い、開いているタブの中身だけを組み立てる (閉じているタブは再実行しない)
+    main_tab1, main_tab2, main_tab3, main_tab4 = st.tabs(
+        ["🔍 一覧・検索", "📝 新規登録", "📂 ファイル一括入出力", "📅 期限カレンダー"], key="main_nav", on_change="rerun"
+    )
 
     # ==========================================
     # タブ1：一覧・検索
     # ==========================================
     with main_tab1:
-        st.markdown("#### 在庫データの検索")
-        
-        # --- アラートデータの収集 ---
-        alert_items = []
-        today = datetime.now().date()
+        if main_tab1.open:
+            st.markdown("#### 在庫データの検索")
         
-        if not df.empty:
-            for index, row in df.iterrows():
-                status = str(row.get('ステータス', '')).strip()
-                if status == '廃棄':
-                    continue
-
-                cat = row.get('カテゴリ')
-                name = row.get('品名', '名称不明')
-                
-                msg_list = []
-                
-                # --- 訪問車アラート ---
-                if cat == "訪問車":
-                    reg_num = str(row.get('登録番号', ''))
-                    display_text = f"{name} {reg_num}".strip()
-                    
-                    check_cols = ["リース満了日", "車検満了日", "駐禁除外指定満了日", "通行禁止許可満了日"]
-                    for col in check_cols:
-                        val = row.get(col)
-                        dt = parse_date(val)
-                        if dt:
-                            diff = (dt.date() - today).days
-                            if diff < 0:
-                                msg_list.append(f"{col} 超過 ({dt.strftime('%Y-%m-%d')})")
-                            elif diff <= 45:
-                                msg_list.append(f"{col} あと{diff}日 ({dt.strftime('%Y-%m-%d')})")
-                    
-                    if msg_list:
-                        alert_items.append({
-                            "row": row,
-                            "title": f"訪問車【{display_text}】",
-                            "messages": msg_list
-                        })
-                
-                # --- iPadアラート ---
-                elif cat == "iPad":
-                    label = str(row.get('ラベル', ''))
-                    display_text = f"{label} {name}".strip()
-                    
-                    val = row.get("購入日")
-                    dt = parse_date(val)
-                    if dt:
-                        try:
-                            target_date = dt.date().replace(year=dt.year + 5)
-                        except ValueError:
-                            target_date = dt.date().replace(year=dt.year + 5, month=2, day=28)
-                        
-                        if today >= target_date:
-                            msg_list.append(f"購入から5年経過 ({dt.strftime('%Y-%m-%d')})")
-                    
-                    if msg_list:
-                        alert_items.append({
-                            "row": row,
-                            "title": f"iPad【{display_text}】",
-                            "messages": msg_list
-                        })
-
-        # --- アラートの表示 ---
-        if alert_items:
-            c_head, c_tog1, c_tog2 = st.columns([2, 1, 1])
+            # --- アラートデータの収集 ---
+            metrics.phase("alerts")
+            alert_items = get_alert_items()
+
+            # --- アラートの表示 ---
+            metrics.phase("render_alerts")
+            stale_alert_cats = [c for c in ("訪問車", "iPad") if c in stale_categories]
+            if stale_alert_cats:
+                st.caption(f"※ {'、'.join(stale_alert_cats)} のデータが最新でないため、期日アラートが欠けている可能性があります。")
+
+            if alert_items:
+                c_head, c_tog1, c_tog2 = st.columns([2, 1, 1])
             
-            with c_head:
-                st.markdown("""
-                    <div class="alert-box" style="background-color: #ffcccc; padding: 0.2rem 0.5rem; border-radius: 0.5rem; border: 1px solid #ff4b4b;">
-                        <h5 style="margin: 0; padding: 0.2rem 0; color: #8B0000; font-size: 1rem;">⚠️ 期日アラート</h5>
-                    </div>
-                """, unsafe_allow_html=True)
+                with c_head:
+                    st.markdown("""
+                        <div class="alert-box" style="background-color: #ffcccc; padding: 0.2rem 0.5rem; border-radius: 0.5rem; border: 1px solid #ff4b4b;">
+                            <h5 style="margin: 0; padding: 0.2rem 0; color: #8B0000; font-size: 1rem;">⚠️ 期日アラート</h5>
+                        </div>
+                    """, unsafe_allow_html=True)
             
-            with c_tog1:
-                show_car = st.toggle("🚙 訪問車", value=True)
+                with c_tog1:
+                    show_car = st.toggle("🚙 訪問車", value=True)
                 
-            with c_tog2:
-                show_ipad = st.toggle("📱 iPad", value=True)
-
-            display_alerts = []
-            for item in alert_items:
-                if "訪問車" in item['title'] and show_car:
-                    display_alerts.append(item)
-                elif "iPad" in item['title'] and show_ipad:
-                    display_alerts.append(item)
-
-            if display_alerts:
-                for i, item in enumerate(display_alerts):
-                    c1, c2 = st.columns([5, 1])
-                    alert_str = f"{item['title']} : " + ", ".join(item['messages'])
-                    c1.markdown(f"<div style='color: #8B0000; font-weight: bold;'>{alert_str}</div>", unsafe_allow_html=True)
-                    if c2.button("詳細", key=f"alert_btn_{i}"):
-                        show_detail_dialog(item['row'])
-                    if i < len(display_alerts) - 1:
-                        st.markdown('<hr style="margin: 0.2rem 0; border-top: 1px dotted #ff9999;">', unsafe_allow_html=True)
-            elif (not show_car and not show_ipad):
-                st.info("すべての表示がOFFになっています。")
-            else:
-                st.info("該当するアラートはありません。")
+                with c_tog2:
+                    show_ipad = st.toggle("📱 iPad", value=True)
+
+                display_alerts = []
+                for item in alert_items:
+                    if "訪問車" in item['title'] and show_car:
+                        display_alerts.append(item)
+                    elif "iPad" in item['title'] and show_ipad:
+                        display_alerts.append(item)
+
+                if display_alerts:
+                    # 件数が多いときは先頭だけを表示し、残りは開いたときだけ組み立てる
+                    hidden_count = len(display_alerts) - ALERT_PREVIEW_COUNT
+                    if hidden_count > 0 and not st.session_state.get('show_all_alerts'):
+                        display_alerts = display_alerts[:ALERT_PREVIEW_COUNT]
+                    for i, item in enumerate(display_alerts):
+                        c1, c2 = st.columns([5, 1])
+                        alert_str = f"{item['title']} : " + ", ".join(item['messages'])
+                        c1.markdown(f"<div style='color: #8B0000; font-weight: bold;'>{alert_str}</div>", unsafe_allow_html=True)
+                        if c2.button("詳細", key=f"alert_btn_{i}"):
+                            open_detail_dialog(item['row'])
+                        if i < len(display_alerts) - 1:
+                            st.markdown('<hr style="margin: 0.2rem 0; border-top: 1px dotted #ff9999;">', unsafe_allow_html=True)
+                    if hidden_count > 0:
+                        st.toggle(f"残りの {hidden_count} 件も表示する", key="show_all_alerts")
+                elif (not show_car and not show_ipad):
+                    st.info("すべての表示がOFFになっています。")
+                else:
+                    st.info("該当するアラートはありません。")
                 
-            st.write("") 
-
-        # --- 検索窓 ---
-        col_search_input, col_clear_btn = st.columns([4, 1])
-        with col_search_input:
-            st.text_input(
-                "フリーワード検索", 
-                placeholder="キーワード入力 (Enterで検索＆クリア)", 
-                key="input_search_key",
-                label_visibility="collapsed",
-                on_change=submit_search
-            )
+                st.write("") 
+
+            # --- 検索窓 ---
+            metrics.phase("search")
+            col_search_input, col_clear_btn = st.columns([4, 1])
+            with col_search_input:
+                st.text_input(
+                    "フリーワード検索", 
+                    placeholder="キーワード入力 (Enterで検索＆クリア)", 
+                    key="input_search_key",
+                    label_visibility="collapsed",
+                    on_change=submit_search
+                )
         
-        current_query = st.session_state.active_search_query
-        if current_query:
-            st.info(f"🔍 検索中のワード: **{current_query}**")
-            with col_clear_btn:
-                if st.button("検索解除", key="clear_search_btn"):
-                    clear_search()
-                    st.rerun()
-
-        # --- フィルタリング実行 ---
-        filtered_df = df.copy() if not df.empty else pd.DataFrame()
-        if not filtered_df.empty:
+            current_query = st.session_state.active_search_query
             if current_query:
-                filtered_df = filtered_df[filtered_df.astype(str).apply(lambda row: row.str.contains(current_query, case=False).any(), axis=1)]
-            st.success(f"検索結果: {len(filtered_df)} 件")
-        else:
-            filtered_df = df
-
-        st.markdown('<hr style="margin: 5px 0; border: 0; border-top: 1px solid #eee;">', unsafe_allow_html=True)
-
-        categories = ["すべて"] + list(CATEGORY_MAP.keys())
-        cat_tabs = st.tabs(categories)
-
-        for i, category in enumerate(categories):
-            with cat_tabs[i]:
-                if filtered_df.empty:
-                    st.warning("該当するデータがありません")
-                else:
-                    if category == "すべて":
-                        display_df = filtered_df
-                        header_g = "詳細1 (G列)"
-                        header_h = "詳細2 (H列)"
-                    else:
-                        display_df = filtered_df[filtered_df['カテゴリ'] == category]
-                        cols_def = COLUMNS_DEF.get(category, [])
-                        header_g = cols_def[0] if len(cols_def) > 0 else "-"
-                        header_h = cols_def[1] if len(cols_def) > 1 else "-"
-
-                    if display_df.empty:
-                        st.warning("このカテゴリには該当するデータがありません")
-                    else:
-                        ITEMS_PER_PAGE = 50
-                        total_items = len(display_df)
-                        max_page = max(0, (total_items - 1) // ITEMS_PER_PAGE)
-                        if st.session_state.page_number > max_page:
-                            st.session_state.page_number = 0
-                        
-                        current_page = st.session_state.page_number
-                        start_idx = current_page * ITEMS_PER_PAGE
-                        end_idx = start_idx + ITEMS_PER_PAGE
+                st.info(f"🔍 検索中のワード: **{current_query}**")
+                with col_clear_btn:
+                    if st.button("検索解除", key="clear_search_btn"):
+                        clear_search()
+                        st.rerun()
+
+            # --- フィルタリング実行 ---
+            filtered_df = filter_by_query(df, current_query)
+            if not filtered_df.empty:
+                st.success(f"検索結果: {len(filtered_df)} 件")
+
+            st.markdown('<hr style="margin: 5px 0; border: 0; border-top: 1px solid #eee;">', unsafe_allow_html=True)
+
+            # --- 複数選択・一括編集 ---
+            metrics.phase("render_list")
+            st.toggle("☑️ 複数選択して一括編集", key="bulk_mode")
+            for msg in st.session_state.pop('bulk_messages', []):
+                st.success(msg)
+            if st.session_state.bulk_mode and st.session_state.bulk_selected:
+                show_bulk_edit_form()
+
+            categories = ["すべて"] + list(CATEGORY_MAP.keys())
+            cat_tabs = st.tabs(categories, key="cat_nav", on_change="rerun")
+
+            for i, category in enumerate(categories):
+                with cat_tabs[i]:
+                    if cat_tabs[i].open:
+                        if filtered_df.empty:
+                            st.warning("該当するデータがありません")
+                        else:
+                            if category == "すべて":
+                                display_df = filtered_df
+                                header_g = "詳細1 (G列)"
+                                header_h = "詳細2 (H列)"
+                            else:
+                                display_df = filtered_df[filtered_df['カテゴリ'] == category]
+                                cols_def = COLUMNS_DEF.get(category, [])
+                                header_g = cols_def[0] if len(cols_def) > 0 else "-"
+                                header_h = cols_def[1] if len(cols_def) > 1 else "-"
+
+                            if display_df.empty:
+                                st.warning("このカテゴリには該当するデータがありません")
+                            else:
+                                ITEMS_PER_PAGE = 50
+                                total_items = len(display_df)
+                                max_page = max(0, (total_items - 1) // ITEMS_PER_PAGE)
+                                if st.session_state.page_number > max_page:
+                                    st.session_state.page_number = 0
                         
-                        df_to_show = display_df.iloc[start_idx:end_idx]
+                                current_page = st.session_state.page_number
+                                start_idx = current_page * ITEMS_PER_PAGE
+                                end_idx = start_idx + ITEMS_PER_PAGE
                         
-                        st.caption(f"全 {total_items} 件中、{start_idx + 1} 〜 {min(end_idx, total_items)} 件目を表示中")
-
-                        if category == "訪問車":
-                            cols = st.columns([0.7, 1.2, 1.8, 1.5, 1.5, 1.5, 1.0, 1.5])
-                            cols[0].write("**編集**")
-                            cols[1].write("**ID**")
-                            cols[2].write("**品名**")
-                            cols[3].write("**登録番号**")
-                            cols[4].write("**利用者**")
-                            cols[5].write("**使用部署**")
-                            cols[6].write("**ステータス**")
-                            cols[7].write("**洗車G**")
-
-                        elif category == "iPad":
-                            cols = st.columns([0.7, 1.2, 1.5, 1.8, 1.5, 1.5, 1.0, 1.5])
-                            cols[0].write("**編集**")
-                            cols[1].write("**ID**")
-                            cols[2].write("**ラベル**")
-                            cols[3].write("**品名**")
-                            cols[4].write("**利用者**")
-                            cols[5].write("**使用部署**")
-                            cols[6].write("**ステータス**")
-                            cols[7].write("**購入日**")
-
-                        elif category == "携帯電話":
-                            cols = st.columns([0.7, 1.2, 1.8, 1.5, 1.5, 1.0, 1.5, 1.5])
-                            cols[0].write("**編集**")
-                            cols[1].write("**ID**")
-                            cols[2].write("**品名**")
-                            cols[3].write("**利用者**")
-                            cols[4].write("**使用部署**")
-                            cols[5].write("**ステータス**")
-                            cols[6].write(f"**{header_g}**")
-                            cols[7].write(f"**{header_h}**")
+                                df_to_show = display_df.iloc[start_idx:end_idx]
+                                metrics.count("rows_rendered", len(df_to_show))
                         
-                        elif category == "Office365": # 変更
-                            # Edit(0.7), ID(1.0), Name(1.5), U1(1.0), U2(1.0), U3(1.0), U4(1.0), U5(1.0)
-                            cols = st.columns([0.7, 1.0, 1.5, 1.0, 1.0, 1.0, 1.0, 1.0])
-                            cols[0].write("**編集**")
-                            cols[1].write("**ID**")
-                            cols[2].write("**品名**")
-                            cols[3].write("**利用者1**")
-                            cols[4].write("**利用者2**")
-                            cols[5].write("**利用者3**")
-                            cols[6].write("**利用者4**")
-                            cols[7].write("**利用者5**")
-
-                        elif category == "ウイルスバスター": # 変更
-                            cols = st.columns([0.7, 1.2, 2.0, 1.2, 1.2, 1.2, 1.0, 1.5])
-                            cols[0].write("**編集**")
-                            cols[1].write("**ID**")
-                            cols[2].write("**品名**")
-                            cols[3].write("**利用者1**")
-                            cols[4].write("**利用者2**")
-                            cols[5].write("**利用者3**")
-                            cols[6].write("**ステータス**")
-                            cols[7].write("**期限**")
+                                st.caption(f"全 {total_items} 件中、{start_idx + 1} 〜 {min(end_idx, total_items)} 件目を表示中")
 
-                        else:
-                            cols = st.columns([0.7, 1.5, 2.0, 1.5, 1.2, 1.5, 1.5])
-                            cols[0].write("**編集**")
-                            cols[1].write("**ID**")
-                            cols[2].write("**品名**")
-                            cols[3].write("**利用者**")
-                            cols[4].write("**ステータス**")
-                            cols[5].write(f"**{header_g}**")
-                            cols[6].write(f"**{header_h}**")
-                        
-                        with st.container(height=500, border=True):
-                            for index, row in df_to_show.iterrows():
                                 if category == "訪問車":
-                                    c = st.columns([0.7, 1.2, 1.8, 1.5, 1.5, 1.5, 1.0, 1.5])
-                                    if c[0].button("詳細", key=f"btn_{category}_{index}"):
-                                        show_detail_dialog(row)
-                                    c[1].write(f"{row['ID']}")
-                                    c[2].write(f"**{row['品名']}**")
-                                    c[3].write(f"{row.get('登録番号', '')}")
-                                    c[4].write(f"{row['利用者']}")
-                                    c[5].write(f"{row.get('使用部署', '')}")
-                                    
-                                    status = row['ステータス']
-                                    if status == "利用可能": c[6].info(status, icon="✅")
-                                    elif status == "貸出中": c[6].warning(status, icon="🏃")
-                                    elif status == "故障/修理中": c[6].error(status, icon="⚠️")
-                                    else: c[6].write(status)
-                                    
-                                    c[7].write(f"{row.get('洗車グループ', '')}")
+                                    cols = st.columns([0.7, 1.2, 1.8, 1.5, 1.5, 1.5, 1.0, 1.5])
+                                    cols[0].write("**編集**")
+                                    cols[1].write("**ID**")
+                                    cols[2].write("**品名**")
+                                    cols[3].write("**登録番号**")
+                                    cols[4].write("**利用者**")
+                                    cols[5].write("**使用部署**")
+                                    cols[6].write("**ステータス**")
+                                    cols[7].write("**洗車G**")
 
                                 elif category == "iPad":
-                                    c = st.columns([0.7, 1.2, 1.5, 1.8, 1.5, 1.5, 1.0, 1.5])
-                                    if c[0].button("詳細", key=f"btn_{category}_{index}"):
-                                        show_detail_dialog(row)
-                                    c[1].write(f"{row['ID']}")
-                                    c[2].write(f"**{row.get('ラベル', '')}**")
-                                    c[3].write(f"**{row['品名']}**")
-                                    c[4].write(f"{row['利用者']}")
-                                    c[5].write(f"{row.get('使用部署', '')}")
-                                    
-                                    status = row['ステータス']
-                                    if status == "利用可能": c[6].info(status, icon="✅")
-                                    elif status == "貸出中": c[6].warning(status, icon="🏃")
-                                    elif status == "故障/修理中": c[6].error(status, icon="⚠️")
-                                    else: c[6].write(status)
-                                    
-                                    c[7].write(f"{row.get('購入日', '')}")
+                                    cols = st.columns([0.7, 1.2, 1.5, 1.8, 1.5, 1.5, 1.0, 1.5])
+                                    cols[0].write("**編集**")
+                                    cols[1].write("**ID**")
+                                    cols[2].write("**ラベル**")
+                                    cols[3].write("**品名**")
+                                    cols[4].write("**利用者**")
+                                    cols[5].write("**使用部署**")
+                                    cols[6].write("**ステータス**")
+                                    cols[7].write("**購入日**")
 
                                 elif category == "携帯電話":
-                                    c = st.columns([0.7, 1.2, 1.8, 1.5, 1.5, 1.0, 1.5, 1.5])
-                                    if c[0].button("詳細", key=f"btn_{category}_{index}"):
-                                        show_detail_dialog(row)
-                                    c[1].write(f"{row['ID']}")
-                                    c[2].write(f"**{row['品名']}**")
-                                    c[3].write(f"{row['利用者']}")
-                                    c[4].write(f"{row.get('使用部署', '')}")
-                                    
-                                    status = row['ステータス']
-                                    if status == "利用可能": c[5].info(status, icon="✅")
-                                    elif status == "貸出中": c[5].warning(status, icon="🏃")
-                                    elif status == "故障/修理中": c[5].error(status, icon="⚠️")
-                                    else: c[5].write(status)
-
-                                    curr_cols_def = COLUMNS_DEF.get(category, [])
-                                    val_g = row.get(curr_cols_def[0], '') if len(curr_cols_def) > 0 else ""
-                                    val_h = row.get(curr_cols_def[1], '') if len(curr_cols_def) > 1 else ""
-                                    c[6].write(f"{val_g}")
-                                    c[7].write(f"{val_h}")
-                                
+                                    cols = st.columns([0.7, 1.2, 1.8, 1.5, 1.5, 1.0, 1.5, 1.5])
+                                    cols[0].write("**編集**")
+                                    cols[1].write("**ID**")
+                                    cols[2].write("**品名**")
+                                    cols[3].write("**利用者**")
+                                    cols[4].write("**使用部署**")
+                                    cols[5].write("**ステータス**")
+                                    cols[6].write(f"**{header_g}**")
+                                    cols[7].write(f"**{header_h}**")
+                        
                                 elif category == "Office365": # 変更
-                                    c = st.columns([0.7, 1.0, 1.5, 1.0, 1.0, 1.0, 1.0, 1.0])
-                                    if c[0].button("詳細", key=f"btn_{category}_{index}"):
-                                        show_detail_dialog(row)
-                                    c[1].write(f"{row['ID']}")
-                                    c[2].write(f"**{row['品名']}**")
-                                    c[3].write(f"{row.get('利用者1', '')}")
-                                    c[4].write(f"{row.get('利用者2', '')}")
-                                    c[5].write(f"{row.get('利用者3', '')}")
-                                    c[6].write(f"{row.get('利用者4', '')}")
-                                    c[7].write(f"{row.get('利用者5', '')}")
+                                    # Edit(0.7), ID(1.0), Name(1.5), U1(1.0), U2(1.0), U3(1.0), U4(1.0), U5(1.0)
+                                    cols = st.columns([0.7, 1.0, 1.5, 1.0, 1.0, 1.0, 1.0, 1.0])
+                                    cols[0].write("**編集**")
+                                    cols[1].write("**ID**")
+                                    cols[2].write("**品名**")
+                                    cols[3].write("**利用者1**")
+                                    cols[4].write("**利用者2**")
+                                    cols[5].write("**利用者3**")
+                                    cols[6].write("**利用者4**")
+                                    cols[7].write("**利用者5**")
 
                                 elif category == "ウイルスバスター": # 変更
-                                    c = st.columns([0.7, 1.2, 2.0, 1.2, 1.2, 1.2, 1.0, 1.5])
-                                    if c[0].button("詳細", key=f"btn_{category}_{index}"):
-                                        show_detail_dialog(row)
-                                    c[1].write(f"{row['ID']}")
-                                    c[2].write(f"**{row['品名']}**")
-                                    c[3].write(f"{row.get('利用者1', '')}")
-                                    c[4].write(f"{row.get('利用者2', '')}")
-                                    c[5].write(f"{row.get('利用者3', '')}")
-                                    
-                                    status = row['ステータス']
-                                    if status == "利用可能": c[6].info(status, icon="✅")
-                                    elif status == "貸出中": c[6].warning(status, icon="🏃")
-                                    elif status == "故障/修理中": c[6].error(status, icon="⚠️")
-                                    else: c[6].write(status)
-                                    
-                                    c[7].write(f"{row.get('期限', '')}")
+                                    cols = st.columns([0.7, 1.2, 2.0, 1.2, 1.2, 1.2, 1.0, 1.5])
+                                    cols[0].write("**編集**")
+                                    cols[1].write("**ID**")
+                                    cols[2].write("**品名**")
+                                    cols[3].write("**利用者1**")
+                                    cols[4].write("**利用者2**")
+                                    cols[5].write("**利用者3**")
+                                    cols[6].write("**ステータス**")
+                                    cols[7].write("**期限**")
 
                                 else:
-                                    c = st.columns([0.7, 1.5, 2.0, 1.5, 1.2, 1.5, 1.5])
-                                    if c[0].button("詳細", key=f"btn_{category}_{index}"):
-                                        show_detail_dialog(row)
-                                    c[1].write(f"{row['ID']}")
-                                    c[2].write(f"**{row['品名']}**")
-                                    c[3].write(f"{row['利用者']}")
+                                    cols = st.columns([0.7, 1.5, 2.0, 1.5, 1.2, 1.5, 1.5])
+                                    cols[0].write("**編集**")
+                                    cols[1].write("**ID**")
+                                    cols[2].write("**品名**")
+                                    cols[3].write("**利用者**")
+                                    cols[4].write("**ステータス**")
+                                    cols[5].write(f"**{header_g}**")
+                                    cols[6].write(f"**{header_h}**")
+                        
+                                with st.container(height=500, border=True):
+                                    for index, row in df_to_show.iterrows():
+                                        if category == "訪問車":
+                                            c = st.columns([0.7, 1.2, 1.8, 1.5, 1.5, 1.5, 1.0, 1.5])
+                                            render_row_action(c[0], category, index, row)
+                                            c[1].write(f"{row['ID']}")
+                                            c[2].write(f"**{row['品名']}**")
+                                            c[3].write(f"{row.get('登録番号', '')}")
+                                            c[4].write(f"{row['利用者']}")
+                                            c[5].write(f"{row.get('使用部署', '')}")
+                                    
+                                            status = row['ステータス']
+                                            if status == "利用可能": c[6].info(status, icon="✅")
+                                            elif status == "貸出中": c[6].warning(status, icon="🏃")
+                                            elif status == "故障/修理中": c[6].error(status, icon="⚠️")
+                                            else: c[6].write(status)
+                                    
+                                            c[7].write(f"{row.get('洗車グループ', '')}")
+
+                                        elif category == "iPad":
+                                            c = st.columns([0.7, 1.2, 1.5, 1.8, 1.5, 1.5, 1.0, 1.5])
+                                            render_row_action(c[0], category, index, row)
+                                            c[1].write(f"{row['ID']}")
+                                            c[2].write(f"**{row.get('ラベル', '')}**")
+                                            c[3].write(f"**{row['品名']}**")
+                                            c[4].write(f"{row['利用者']}")
+                                            c[5].write(f"{row.get('使用部署', '')}")
+                                    
+                                            status = row['ステータス']
+                                            if status == "利用可能": c[6].info(status, icon="✅")
+                                            elif status == "貸出中": c[6].warning(status, icon="🏃")
+                                            elif status == "故障/修理中": c[6].error(status, icon="⚠️")
+                                            else: c[6].write(status)
                                     
-                                    status = row['ステータス']
-                                    if status == "利用可能": c[4].info(status, icon="✅")
-                                    elif status == "貸出中": c[4].warning(status, icon="🏃")
-                                    elif status == "故障/修理中": c[4].error(status, icon="⚠️")
-                                    else: c[4].write(status)
-
-                                    curr_cols_def = COLUMNS_DEF.get(category, [])
-                                    val_g = row.get(curr_cols_def[0], '') if len(curr_cols_def) > 0 else ""
-                                    val_h = row.get(curr_cols_def[1], '') if len(curr_cols_def) > 1 else ""
-                                    c[5].write(f"{val_g}")
-                                    c[6].write(f"{val_h}")
+                                            c[7].write(f"{row.get('購入日', '')}")
+
+                                        elif category == "携帯電話":
+                                            c = st.columns([0.7, 1.2, 1.8, 1.5, 1.5, 1.0, 1.5, 1.5])
+                                            render_row_action(c[0], category, index, row)
+                                            c[1].write(f"{row['ID']}")
+                                            c[2].write(f"**{row['品名']}**")
+                                            c[3].write(f"{row['利用者']}")
+                                            c[4].write(f"{row.get('使用部署', '')}")
+                                    
+                                            status = row['ステータス']
+                                            if status == "利用可能": c[5].info(status, icon="✅")
+                                            elif status == "貸出中": c[5].warning(status, icon="🏃")
+                                            elif status == "故障/修理中": c[5].error(status, icon="⚠️")
+                                            else: c[5].write(status)
+
+                                            curr_cols_def = COLUMNS_DEF.get(category, [])
+                                            val_g = row.get(curr_cols_def[0], '') if len(curr_cols_def) > 0 else ""
+                                            val_h = row.get(curr_cols_def[1], '') if len(curr_cols_def) > 1 else ""
+                                            c[6].write(f"{val_g}")
+                                            c[7].write(f"{val_h}")
                                 
-                                st.markdown('<hr>', unsafe_allow_html=True)
+                                        elif category == "Office365": # 変更
+                                            c = st.columns([0.7, 1.0, 1.5, 1.0, 1.0, 1.0, 1.0, 1.0])
+                                            render_row_action(c[0], category, index, row)
+                                            c[1].write(f"{row['ID']}")
+                                            c[2].write(f"**{row['品名']}**")
+                                            c[3].write(f"{row.get('利用者1', '')}")
+                                            c[4].write(f"{row.get('利用者2', '')}")
+                                            c[5].write(f"{row.get('利用者3', '')}")
+                                            c[6].write(f"{row.get('利用者4', '')}")
+                                            c[7].write(f"{row.get('利用者5', '')}")
+
+                                        elif category == "ウイルスバスター": # 変更
+                                            c = st.columns([0.7, 1.2, 2.0, 1.2, 1.2, 1.2, 1.0, 1.5])
+                                            render_row_action(c[0], category, index, row)
+                                            c[1].write(f"{row['ID']}")
+                                            c[2].write(f"**{row['品名']}**")
+                                            c[3].write(f"{row.get('利用者1', '')}")
+                                            c[4].write(f"{row.get('利用者2', '')}")
+                                            c[5].write(f"{row.get('利用者3', '')}")
+                                    
+                                            status = row['ステータス']
+                                            if status == "利用可能": c[6].info(status, icon="✅")
+                                            elif status == "貸出中": c[6].warning(status, icon="🏃")
+                                            elif status == "故障/修理中": c[6].error(status, icon="⚠️")
+                                            else: c[6].write(status)
+                                    
+                                            c[7].write(f"{row.get('期限', '')}")
+
+                                        else:
+                                            c = st.columns([0.7, 1.5, 2.0, 1.5, 1.2, 1.5, 1.5])
+                                            render_row_action(c[0], category, index, row)
+                                            c[1].write(f"{row['ID']}")
+                                            c[2].write(f"**{row['品名']}**")
+                                            c[3].write(f"{row['利用者']}")
+                                    
+                                            status = row['ステータス']
+                                            if status == "利用可能": c[4].info(status, icon="✅")
+                                            elif status == "貸出中": c[4].warning(status, icon="🏃")
+                                            elif status == "故障/修理中": c[4].error(status, icon="⚠️")
+                                            else: c[4].write(status)
+
+                                            curr_cols_def = COLUMNS_DEF.get(category, [])
+                                            val_g = row.get(curr_cols_def[0], '') if len(curr_cols_def) > 0 else ""
+                                            val_h = row.get(curr_cols_def[1], '') if len(curr_cols_def) > 1 else ""
+                                            c[5].write(f"{val_g}")
+                                            c[6].write(f"{val_h}")
+                                
+                                        st.markdown('<hr>', unsafe_allow_html=True)
 
-                        st.write("")
-                        col_prev, col_page_info, col_next = st.columns([1, 2, 1])
+                                st.write("")
+                                col_prev, col_page_info, col_next = st.columns([1, 2, 1])
                         
-                        with col_prev:
-                            if current_page > 0:
-                                if st.button("⬅️ 前の50件", key=f"prev_{category}"):
-                                    st.session_state.page_number -= 1
-                                    st.rerun()
+                                with col_prev:
+                                    if current_page > 0:
+                                        if st.button("⬅️ 前の50件", key=f"prev_{category}"):
+                                            st.session_state.page_number -= 1
+                                            st.rerun()
                         
-                        with col_page_info:
-                            st.markdown(f"<div style='text-align: center; color: gray;'>Page {current_page + 1} / {max_page + 1}</div>", unsafe_allow_html=True)
+                                with col_page_info:
+                                    st.markdown(f"<div style='text-align: center; color: gray;'>Page {current_page + 1} / {max_page + 1}</div>", unsafe_allow_html=True)
 
-                        with col_next:
-                            if end_idx < total_items:
-                                if st.button("次の50件 ➡️", key=f"next_{category}"):
-                                    st.session_state.page_number += 1
-                                    st.rerun()
+                                with col_next:
+                                    if end_idx < total_items:
+                                        if st.button("次の50件 ➡️", key=f"next_{category}"):
+                                            st.session_state.page_number += 1
+                                            st.rerun()
 
     # ==========================================
     # タブ2：新規登録
     # ==========================================
+    metrics.phase("new_entry_form")
     with main_tab2:
-        st.header("新規データの登録")
-        st.caption("※既存データの編集は、一覧タブの「詳細」ボタンから行ってください。")
+        if main_tab2.open:
+            st.header("新規データの登録")
+            st.caption("※既存データの編集は、一覧タブの「詳細」ボタンから行ってください。")
         
-        st.subheader("① カテゴリとIDを指定")
-        selected_category_key = st.radio("カテゴリ", list(CATEGORY_MAP.keys()), horizontal=True, key="new_reg_cat")
-        target_sheet_name = CATEGORY_MAP[selected_category_key]
-
-        st.subheader("② 詳細情報の入力")
-        with st.form("new_entry_form"):
-            col_basic1, col_basic2 = st.columns(2)
-            with col_basic1:
-                input_id = st.text_input("ID (資産番号)")
-                input_name = st.text_input("品名 (管理上の名称)")
-            with col_basic2:
-                input_user = st.text_input("利用者(代表)")
-                input_status = st.selectbox("ステータス", ["利用可能", "貸出中", "故障/修理中", "廃棄"])
-
-            st.markdown("---")
-            st.markdown(f"##### 📝 {selected_category_key} 詳細情報")
+            st.subheader("① カテゴリとIDを指定")
+            selected_category_key = st.radio("カテゴリ", list(CATEGORY_MAP.keys()), horizontal=True, key="new_reg_cat")
+
+            st.subheader("② 詳細情報の入力")
+            with st.form("new_entry_form"):
+                col_basic1, col_basic2 = st.columns(2)
+                with col_basic1:
+                    input_id = st.text_input("ID (資産番号)")
+                    input_name = st.text_input("品名 (管理上の名称)")
+                with col_basic2:
+                    input_user = st.text_input("利用者(代表)")
+                    input_status = st.selectbox("ステータス", STATUS_OPTIONS)
+
+                st.markdown("---")
+                st.markdown(f"##### 📝 {selected_category_key} 詳細情報")
             
-            custom_values = {}
-
-            if selected_category_key == "PC":
-                c1, c2 = st.columns(2)
-                with c1:
-                    d_buy = st.date_input("購入日", value=None)
-                    custom_values['購入日'] = d_buy.strftime('%Y-%m-%d') if d_buy else ''
-                    custom_values['OS'] = st.text_input("OS")
-                    custom_values['プロダクトID(シリアルNo)'] = st.text_input("プロダクトID(シリアルNo)")
-                    custom_values['ラベル'] = st.text_input("ラベル")
-                    custom_values['officeのアカウント割振'] = st.text_input("officeのアカウント割振")
-                with c2:
-                    custom_values['ORCA宇都宮'] = st.text_input("ORCA宇都宮")
-                    custom_values['ORCA鹿沼'] = st.text_input("ORCA鹿沼")
-                    custom_values['ORCA益子'] = st.text_input("ORCA益子")
-                    custom_values['チームビューワID'] = st.text_input("チームビューワID")
-                    custom_values['チームビューワPW'] = st.text_input("チームビューワPW")
+                custom_values = {}
+
+                if selected_category_key == "PC":
+                    c1, c2 = st.columns(2)
+                    with c1:
+                        d_buy = st.date_input("購入日", value=None)
+                        custom_values['購入日'] = d_buy.strftime('%Y-%m-%d') if d_buy else ''
+                        custom_values['OS'] = st.text_input("OS")
+                        custom_values['プロダクトID(シリアルNo)'] = st.text_input("プロダクトID(シリアルNo)")
+                        custom_values['ラベル'] = st.text_input("ラベル")
+                        custom_values['officeのアカウント割振'] = st.text_input("officeのアカウント割振")
+                    with c2:
+                        custom_values['ORCA宇都宮'] = st.text_input("ORCA宇都宮")
+                        custom_values['ORCA鹿沼'] = st.text_input("ORCA鹿沼")
+                        custom_values['ORCA益子'] = st.text_input("ORCA益子")
+                        custom_values['チームビューワID'] = st.text_input("チームビューワID")
+                        custom_values['チームビューワPW'] = st.text_input("チームビューワPW")
                 
-                st.caption("ウィルスバスター情報")
-                c3, c4, c5 = st.columns(3)
-                with c3: custom_values['ウィルスバスターシリアルNo'] = st.text_input("VBシリアルNo")
-                with c4: 
-                    d_vb = st.date_input("VB期限", value=None)
-                    custom_values['ウィルスバスター期限'] = d_vb.strftime('%Y-%m-%d') if d_vb else ''
-                with c5: custom_values['ウィルスバスター識別ネーム'] = st.text_input("VB識別ネーム")
-                custom_values['備考'] = st.text_area("備考")
-
-            elif selected_category_key == "訪問車":
-                c1, c2 = st.columns(2)
-                with c1:
-                    custom_values['登録番号'] = st.text_input("登録番号")
-                    custom_values['使用部署'] = st.text_input("使用部署")
-                    custom_values['洗車グループ'] = st.text_input("洗車グループ")
-                    custom_values['駐車場'] = st.text_input("駐車場")
-                    custom_values['タイヤサイズ'] = st.text_input("タイヤサイズ")
-                    custom_values['タイヤ保管場所'] = st.text_input("タイヤ保管場所")
-                    custom_values['スタッドレス有無'] = st.text_input("スタッドレス有無")
-                with c2:
-                    d_lease_s = st.date_input("リース開始日", value=None)
-                    custom_values['リース開始日'] = d_lease_s.strftime('%Y-%m-%d') if d_lease_s else ''
-                    d_lease_e = st.date_input("リース満了日", value=None)
-                    custom_values['リース満了日'] = d_lease_e.strftime('%Y-%m-%d') if d_lease_e else ''
-                    d_syaken = st.date_input("車検満了日", value=None)
-                    custom_values['車検満了日'] = d_syaken.strftime('%Y-%m-%d') if d_syaken else ''
-                    d_park = st.date_input("駐禁除外指定満了日", value=None)
-                    custom_values['駐禁除外指定満了日'] = d_park.strftime('%Y-%m-%d') if d_park else ''
-                    d_road = st.date_input("通行禁止許可満了日", value=None)
-                    custom_values['通行禁止許可満了日'] = d_road.strftime('%Y-%m-%d') if d_road else ''
-                custom_values['備考'] = st.text_area("備考")
-
-            elif selected_category_key == "iPad":
-                c1, c2 = st.columns(2)
-                with c1:
-                    d_buy = st.date_input("購入日", value=None)
-                    custom_values['購入日'] = d_buy.strftime('%Y-%m-%d') if d_buy else ''
-                    custom_values['ラベル'] = st.text_input("ラベル")
-                    custom_values['AppleID'] = st.text_input("AppleID")
-                    custom_values['シリアルNo'] = st.text_input("シリアルNo")
-                    custom_values['ストレージ'] = st.text_input("ストレージ")
-                with c2:
-                    custom_values['製造番号IMEI'] = st.text_input("製造番号IMEI")
-                    custom_values['端末番号'] = st.text_input("端末番号")
-                    custom_values['使用部署'] = st.text_input("使用部署")
-                    custom_values['キャリア'] = st.text_input("キャリア")
-                custom_values['備考'] = st.text_area("備考")
-
-            elif selected_category_key == "携帯電話":
-                c1, c2 = st.columns(2)
-                with c1:
-                    d_buy = st.date_input("購入日", value=None)
-                    custom_values['購入日'] = d_buy.strftime('%Y-%m-%d') if d_buy else ''
-                    custom_values['電話番号'] = st.text_input("電話番号")
-                    custom_values['SIM'] = st.text_input("SIM")
-                    custom_values['メーカー'] = st.text_input("メーカー")
-                with c2:
-                    custom_values['製造番号'] = st.text_input("製造番号")
-                    custom_values['使用部署'] = st.text_input("使用部署")
-                    custom_values['保管場所'] = st.text_input("保管場所")
-                    custom_values['キャリア'] = st.text_input("キャリア")
-                custom_values['備考'] = st.text_area("備考")
-
-            elif selected_category_key == "Office365":
-                c1, c2 = st.columns(2)
-                with c1: custom_values['アカウントID'] = st.text_input("アカウントID")
-                with c2: custom_values['パスワード'] = st.text_input("パスワード")
+                    st.caption("ウィルスバスター情報")
+                    c3, c4, c5 = st.columns(3)
+                    with c3: custom_values['ウィルスバスターシリアルNo'] = st.text_input("VBシリアルNo")
+                    with c4: 
+                        d_vb = st.date_input("VB期限", value=None)
+                        custom_values['ウィルスバスター期限'] = d_vb.strftime('%Y-%m-%d') if d_vb else ''
+                    with c5: custom_values['ウィルスバスター識別ネーム'] = st.text_input("VB識別ネーム")
+                    custom_values['備考'] = st.text_area("備考")
+
+                elif selected_category_key == "訪問車":
+                    c1, c2 = st.columns(2)
+                    with c1:
+                        custom_values['登録番号'] = st.text_input("登録番号")
+                        custom_values['使用部署'] = st.text_input("使用部署")
+                        custom_values['洗車グループ'] = st.text_input("洗車グループ")
+                        custom_values['駐車場'] = st.text_input("駐車場")
+                        custom_values['タイヤサイズ'] = st.text_input("タイヤサイズ")
+                        custom_values['タイヤ保管場所'] = st.text_input("タイヤ保管場所")
+                        custom_values['スタッドレス有無'] = st.text_input("スタッドレス有無")
+                    with c2:
+                        d_lease_s = st.date_input("リース開始日", value=None)
+                        custom_values['リース開始日'] = d_lease_s.strftime('%Y-%m-%d') if d_lease_s else ''
+                        d_lease_e = st.date_input("リース満了日", value=None)
+                        custom_values['リース満了日'] = d_lease_e.strftime('%Y-%m-%d') if d_lease_e else ''
+                        d_syaken = st.date_input("車検満了日", value=None)
+                        custom_values['車検満了日'] = d_syaken.strftime('%Y-%m-%d') if d_syaken else ''
+                        d_park = st.date_input("駐禁除外指定満了日", value=None)
+                        custom_values['駐禁除外指定満了日'] = d_park.strftime('%Y-%m-%d') if d_park else ''
+                        d_road = st.date_input("通行禁止許可満了日", value=None)
+                        custom_values['通行禁止許可満了日'] = d_road.strftime('%Y-%m-%d') if d_road else ''
+                    custom_values['備考'] = st.text_area("備考")
+
+                elif selected_category_key == "iPad":
+                    c1, c2 = st.columns(2)
+                    with c1:
+                        d_buy = st.date_input("購入日", value=None)
+                        custom_values['購入日'] = d_buy.strftime('%Y-%m-%d') if d_buy else ''
+                        custom_values['ラベル'] = st.text_input("ラベル")
+                        custom_values['AppleID'] = st.text_input("AppleID")
+                        custom_values['シリアルNo'] = st.text_input("シリアルNo")
+                        custom_values['ストレージ'] = st.text_input("ストレージ")
+                    with c2:
+                        custom_values['製造番号IMEI'] = st.text_input("製造番号IMEI")
+                        custom_values['端末番号'] = st.text_input("端末番号")
+                        custom_values['使用部署'] = st.text_input("使用部署")
+                        custom_values['キャリア'] = st.text_input("キャリア")
+                    custom_values['備考'] = st.text_area("備考")
+
+                elif selected_category_key == "携帯電話":
+                    c1, c2 = st.columns(2)
+                    with c1:
+                        d_buy = st.date_input("購入日", value=None)
+                        custom_values['購入日'] = d_buy.strftime('%Y-%m-%d') if d_buy else ''
+                        custom_values['電話番号'] = st.text_input("電話番号")
+                        custom_values['SIM'] = st.text_input("SIM")
+                        custom_values['メーカー'] = st.text_input("メーカー")
+                    with c2:
+                        custom_values['製造番号'] = st.text_input("製造番号")
+                        custom_values['使用部署'] = st.text_input("使用部署")
+                        custom_values['保管場所'] = st.text_input("保管場所")
+                        custom_values['キャリア'] = st.text_input("キャリア")
+                    custom_values['備考'] = st.text_area("備考")
+
+                elif selected_category_key == "Office365":
+                    c1, c2 = st.columns(2)
+                    with c1: custom_values['アカウントID'] = st.text_input("アカウントID")
+                    with c2: custom_values['パスワード'] = st.text_input("パスワード")
                 
-                st.caption("共有利用者")
-                c_u1, c_u2, c_u3 = st.columns(3)
-                with c_u1: custom_values['利用者1'] = st.text_input("利用者1")
-                with c_u2: custom_values['利用者2'] = st.text_input("利用者2")
-                with c_u3: custom_values['利用者3'] = st.text_input("利用者3")
+                    st.caption("共有利用者")
+                    c_u1, c_u2, c_u3 = st.columns(3)
+                    with c_u1: custom_values['利用者1'] = st.text_input("利用者1")
+                    with c_u2: custom_values['利用者2'] = st.text_input("利用者2")
+                    with c_u3: custom_values['利用者3'] = st.text_input("利用者3")
                 
-                c_u4, c_u5 = st.columns(2)
-                with c_u4: custom_values['利用者4'] = st.text_input("利用者4")
-                with c_u5: custom_values['利用者5'] = st.text_input("利用者5")
+                    c_u4, c_u5 = st.columns(2)
+                    with c_u4: custom_values['利用者4'] = st.text_input("利用者4")
+                    with c_u5: custom_values['利用者5'] = st.text_input("利用者5")
                 
-                custom_values['備考'] = st.text_area("備考")
-
-            elif selected_category_key == "ウイルスバスター":
-                st.caption("利用者情報")
-                c1, c2, c3 = st.columns(3)
-                with c1: custom_values['利用者1'] = st.text_input("利用者1")
-                with c2: custom_values['利用者2'] = st.text_input("利用者2")
-                with c3: custom_values['利用者3'] = st.text_input("利用者3")
+                    custom_values['備考'] = st.text_area("備考")
+
+                elif selected_category_key == "ウイルスバスター":
+                    st.caption("利用者情報")
+                    c1, c2, c3 = st.columns(3)
+                    with c1: custom_values['利用者1'] = st.text_input("利用者1")
+                    with c2: custom_values['利用者2'] = st.text_input("利用者2")
+                    with c3: custom_values['利用者3'] = st.text_input("利用者3")
                 
-                st.caption("期限")
-                d_exp = st.date_input("期限", value=None)
-                custom_values['期限'] = d_exp.strftime('%Y-%m-%d') if d_exp else ''
+                    st.caption("期限")
+                    d_exp = st.date_input("期限", value=None)
+                    custom_values['期限'] = d_exp.strftime('%Y-%m-%d') if d_exp else ''
                 
-                custom_values['備考'] = st.text_area("備考")
+                    custom_values['備考'] = st.text_area("備考")
 
-            elif selected_category_key == "その他":
-                custom_values['備考'] = st.text_area("備考")
+                elif selected_category_key == "その他":
+                    custom_values['備考'] = st.text_area("備考")
 
-            st.markdown("---")
-            if st.form_submit_button("新規登録"):
-                if not input_id or not input_name:
-                    st.error("IDと品名は必須です！")
-                else:
-                    try:
-                        worksheet = client.open(SPREADSHEET_NAME).worksheet(target_sheet_name)
-                        current_time = datetime.now().strftime('%Y-%m-%d')
-                        row_to_save = [input_id, selected_category_key, input_name, input_user, input_status, current_time]
-                        for col_name in COLUMNS_DEF.get(selected_category_key, []):
-                            row_to_save.append(custom_values.get(col_name, ''))
+                st.markdown("---")
+                if st.form_submit_button("新規登録"):
+                    if not input_id or not input_name:
+                        st.error("IDと品名は必須です！")
+                    else:
+                        try:
+                            current_time = datetime.now().strftime('%Y-%m-%d')
+                            row_to_save = [input_id, selected_category_key, input_name, input_user, input_status, current_time]
+                            for col_name in COLUMNS_DEF.get(selected_category_key, []):
+                                row_to_save.append(custom_values.get(col_name, ''))
                         
-                        if worksheet.find(input_id):
-                            st.error(f"エラー: ID '{input_id}' は既に登録されています。")
-                        else:
-                            worksheet.append_row(row_to_save)
+                            get_inventory_store().append_rows(selected_category_key, [row_to_save], site="新規登録")
                             st.toast(f"新規登録しました！ ID: {input_id}", icon="✅")
-                            get_all_data.clear()
                             st.rerun()
-                    except Exception as e:
-                        st.error(f"書き込みエラー: {e}")
+                        except DuplicateIdError:
+                            st.error(f"エラー: ID '{input_id}' は既に登録されています。")
+                        except Exception as e:
+                            st.error(f"書き込みエラー: {e}")
 
     # ==========================================
-    # タブ3：CSV一括入出力
+    # タブ3：ファイル一括入出力
     # ==========================================
+    metrics.phase("file_io")
     with main_tab3:
-        st.header("📂 CSVによる一括登録・編集")
-        st.caption("既存データの編集や、大量の新規データをまとめて登録するのに便利です。")
-
-        # --- エクスポート ---
-        st.subheader("1. データのエクスポート (ダウンロード)")
-        st.caption("現在登録されているデータをCSVファイルとしてダウンロードします。")
+        if main_tab3.open:
+            st.header("📂 ファイルによる一括登録・編集")
+            st.caption("既存データの編集や、大量の新規データをまとめて登録するのに便利です。")
+
+            # --- エクスポート ---
+            st.subheader("1. データのエクスポート (ダウンロード)")
+            st.caption("現在登録されているデータをダウンロードします。CSV・Parquetで「すべて」を選ぶとカテゴリ別のファイルをまとめたZIPに、Excelはカテゴリごとのシートを持つ1つのブックになります。")
+            st.caption("Excel・Parquetでは日付列が日付型、それ以外が文字列型で保存されるため、電話番号やIMEIの先頭の0も失われません。")
         
-        export_cat = st.selectbox("カテゴリを選択", list(CATEGORY_MAP.keys()), key="export_cat")
-        if st.button("CSVをダウンロード作成"):
-            try:
-                target_sheet_name = CATEGORY_MAP[export_cat]
-                worksheet = client.open(SPREADSHEET_NAME).worksheet(target_sheet_name)
-                # 全データを取得してDataFrame化
-                records = worksheet.get_all_records()
-                export_df = pd.DataFrame(records)
-                
-                # CSV変換
-                csv = export_df.to_csv(index=False).encode('utf-8_sig')
-                
-                st.download_button(
-                    label="📥 CSVをダウンロード",
-                    data=csv,
-                    file_name=f"{export_cat}_inventory_{datetime.now().strftime('%Y%m%d')}.csv",
-                    mime="text/csv",
-                )
-            except Exception as e:
-                st.error(f"エクスポートエラー: {e}")
+            c_exp_cat, c_exp_fmt = st.columns(2)
+            export_cat = c_exp_cat.selectbox("カテゴリを選択", ["すべて"] + list(CATEGORY_MAP.keys()), key="export_cat")
+            export_fmt = c_exp_fmt.selectbox("ファイル形式", list(EXPORT_FORMATS.keys()), key="export_fmt")
+            if st.button("ダウンロードファイルを作成"):
+                try:
+                    store = get_inventory_store()
+                    export_cats = list(CATEGORY_MAP.keys()) if export_cat == "すべて" else [export_cat]
+                    frames = {cat: store.fetch_full_sheet(cat, site="エクスポート") for cat in export_cats}
+                    data, ext, mime = export_bytes(frames, export_fmt)
+                    st.download_button(
+                        label=f"📥 {ext.upper()}をダウンロード",
+                        data=data,
+                        file_name=export_file_name("all" if export_cat == "すべて" else export_cat, ext),
+                        mime=mime,
+                    )
+                except Exception as e:
+                    st.error(f"エクスポートエラー: {e}")
 
-        st.markdown("---")
+            st.markdown("---")
 
-        # --- インポート ---
-        st.subheader("2. データのインポート (アップロード)")
-        st.caption("編集したCSVファイルをアップロードしてください。**IDが一致するものは「更新」、新しいIDは「新規登録」**されます。")
-        
-        import_cat = st.selectbox("カテゴリを選択 (インポート先)", list(CATEGORY_MAP.keys()), key="import_cat")
-        uploaded_file = st.file_uploader("CSVファイルをドラッグ＆ドロップ", type=["csv"])
+            # --- インポート ---
+            st.subheader("2. データのインポート (アップロード)")
+            st.caption("編集したファイルをアップロードしてください。**IDが一致するものは「更新」、新しいIDは「新規登録」**されます。")
+
+            for msg in st.session_state.pop('import_messages', []):
+                st.success(msg)
+
+            import_mode = st.radio("インポート先", ["カテゴリ列で振り分け (全カテゴリ)", "カテゴリを指定"], horizontal=True, key="import_mode")
+            import_cat = None
+            if import_mode == "カテゴリを指定":
+                import_cat = st.selectbox("カテゴリを選択 (インポート先)", list(CATEGORY_MAP.keys()), key="import_cat")
+            uploaded_file = st.file_uploader("CSV / Excel / Parquet ファイル (またはエクスポートしたZIP) をドラッグ＆ドロップ", type=IMPORT_EXTENSIONS)
         
-        if uploaded_file is not None:
-            try:
-                # CSV読み込み
-                import_df = pd.read_csv(uploaded_file)
-                st.write("プレビュー:", import_df.head())
-                
-                if st.button("🚀 この内容で一括更新を実行"):
-                    target_sheet_name = CATEGORY_MAP[import_cat]
-                    worksheet = client.open(SPREADSHEET_NAME).worksheet(target_sheet_name)
-                    
-                    # 現在の全データを取得してIDリストを作成 (行番号の特定用)
-                    current_records = worksheet.get_all_records()
-                    # IDをキー、行番号(2行目~)を値とする辞書を作成
-                    id_map = {str(record['ID']): i + 2 for i, record in enumerate(current_records)}
-                    
-                    # プログレスバー
-                    progress_bar = st.progress(0)
-                    total_rows = len(import_df)
-                    
-                    for i, row in import_df.iterrows():
-                        row_id = str(row['ID'])
-                        current_time = datetime.now().strftime('%Y-%m-%d')
-                        
-                        # 保存するデータの並び順を作成 (基本列 + カテゴリ固有列)
-                        # 基本列: ID, カテゴリ, 品名, 利用者, ステータス, 更新日
-                        row_data = [
-                            row_id,
-                            import_cat,
-                            row.get('品名', ''),
-                            row.get('利用者', ''),
-                            row.get('ステータス', '利用可能'),
-                            current_time
-                        ]
-                        
-                        # カテゴリ固有列
-                        for col_name in COLUMNS_DEF.get(import_cat, []):
-                            row_data.append(row.get(col_name, ''))
-                        
-                        # 更新 or 追加
-                        if row_id in id_map:
-                            # 既存IDならその行を更新
-                            row_num = id_map[row_id]
-                            # rangeを使って一括更新 (A列から最後まで)
-                            worksheet.update(f"A{row_num}", [row_data])
-                        else:
-                            # 新規IDなら末尾に追加
-                            worksheet.append_row(row_data)
-                        
-                        # 進捗更新
-                        progress_bar.progress((i + 1) / total_rows)
-                        time.sleep(0.1) # API制限考慮
-                    
-                    st.success("一括処理が完了しました！")
-                    get_all_data.clear() # キャッシュクリア
-                    time.sleep(1)
-                    st.rerun()
+            if uploaded_file is not None:
+                try:
+                    import_df = read_upload(uploaded_file.name, uploaded_file.getvalue())
+                    st.write("プレビュー:", import_df.head())
+
+                    # カテゴリごとに振り分けて、列定義に沿って検証する
+                    batches, import_errors, import_warnings = plan_import(import_df, fixed_cat=import_cat)
+                    for msg in import_warnings:
+                        st.warning(msg)
+                    if import_errors:
+                        with st.expander(f"⚠️ 取り込めない行が {len(import_errors)} 件あります (これらはスキップされます)", expanded=True):
+                            st.write("\n".join(f"- {msg}" for msg in import_errors))
+                    if batches:
+                        st.dataframe(pd.DataFrame(
+                            [{"カテゴリ": cat, "件数": len(rows)} for cat, rows in batches.items()]
+                        ), hide_index=True)
+
+                    if batches and st.button("🚀 この内容で一括更新を実行"):
+                        # シートごとに「ID列の読込1回 + 更新1回 + 追加1回」を並行して実行する
+                        with st.spinner("書き込み中..."):
+                            results = commit_all(get_inventory_store(), batches)
+                        messages = []
+                        done = []
+                        for cat, result in results.items():
+                            if isinstance(result, Exception):
+                                st.error(f"{cat}: インポートエラー: {result}")
+                            else:
+                                done.append(cat)
+                                messages.append(f"{cat}: 更新 {result['updated']} 件 / 新規 {result['appended']} 件")
+                        if len(done) == len(results):
+                            st.session_state.import_messages = ["一括処理が完了しました！"] + messages
+                            st.rerun()
+                        for msg in messages:
+                            st.success(msg)
                     
-            except Exception as e:
-                st.error(f"インポートエラー: {e}")
+                except Exception as e:
+                    st.error(f"インポートエラー: {e}")
+
+    # ==========================================
+    # タブ4：期限カレンダー
+    # ==========================================
+    metrics.phase("expiry_calendar")
+    with main_tab4:
+        if main_tab4.open:
+            st.markdown("#### 期限・満了日の一覧")
+            st.caption("ウイルスバスター期限・車検やリースの満了日と、iPadの買い替え時期 (購入から5年) をまとめて表示します。廃棄済みは除きます。")
+
+            c_horizon, c_cats = st.columns([1, 3])
+            horizon = c_horizon.selectbox("期間", list(EXPIRY_HORIZONS.keys()), index=1, key="expiry_horizon")
+            expiry_cats = c_cats.multiselect("カテゴリ", EXPIRY_CATEGORIES, default=EXPIRY_CATEGORIES, key="expiry_cats")
+            include_overdue = st.checkbox("期限切れのものも表示する", value=True, key="expiry_overdue")
+
+            today = datetime.now().date()
+            expiry_entries = get_expiry_index().between(
+                None if include_overdue else today,
+                today + timedelta(days=EXPIRY_HORIZONS[horizon]),
+                categories=set(expiry_cats),
+            )
+            if not expiry_entries:
+                st.info("該当する期限はありません。")
+            else:
+                timeline = timeline_frame(expiry_entries, today)
+                st.write(f"該当: {len(timeline)} 件")
+                # 月 × カテゴリの件数
+                counts = timeline.pivot_table(index="月", columns="カテゴリ", values="ID", aggfunc="count", fill_value=0, sort=False)
+                st.dataframe(counts[[c for c in EXPIRY_CATEGORIES if c in counts.columns]])
+                for month, group in timeline.groupby("月", sort=False):
+                    st.markdown(f"**{month}** ({len(group)} 件)")
+                    st.dataframe(group.drop(columns=["月"]), hide_index=True)
 
 except Exception as e:
     st.error(f"エラー: {e}")
+
+# --- 計測結果の記録と表示 ---
+# [metrics] セクションで有効にする (既定ではどれも無効)
+#   [metrics]
+#   panel = true             # サイドバーに計測パネルを表示 (URL に ?debug=1 を付けても表示)
+#   log = true               # 再実行ごとに1行の JSON をログ (標準エラー出力) に出す
+#   file = "metrics.jsonl"   # 同じ内容をファイルに追記する
+metrics_conf = get_config("metrics")
+last_run = metrics.finish_run(log=metrics_conf.get("log", False), file_path=metrics_conf.get("file"))
+if last_run is not None and (metrics_conf.get("panel") or st.query_params.get("debug") == "1"):
+    with st.sidebar:
+        show_metrics_panel(last_run)
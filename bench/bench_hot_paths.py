@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from alerts import collect_alerts
+from fake_sheets import FakeClient
+from generate_inventory import generate
+from import_export import export_bytes, read_upload, plan_import, commit_all
+from inventory_store import InventoryStore
+from schema import CATEGORY_MAP, DATE_COLUMNS, sheet_columns, parse_date
+from search import filter_by_query
+from sheets_client import SheetsClient
+from storage import SheetsBackend
+
+APP_FILE = os.path.join(ROOT, "app.py")
+SPREADSHEET_NAME = "management_db"
+DEFAULT_SIZES = [1000, 10000, 100000]
+# レート制限の待ち時間を計測に含めないよう、クォータを事実上無制限にする
+UNTHROTTLED = 10 ** 9
+
+# --- 計測する処理 ---
+# 一覧表示までに毎回通る処理 (読込 → 日付解釈 → アラート → 検索) と、CSV 一括インポート。
+# Sheets API はメモリ上の代替 (fake_sheets) に置き換え、通信の遅延は含めない
+
+
+def make_client(fake):
+    return SheetsClient(fake, SPREADSHEET_NAME, read_per_minute=UNTHROTTLED, write_per_minute=UNTHROTTLED)
+
+
+def make_store(df):
+    fake = FakeClient()
+    fake.seed(SPREADSHEET_NAME, df)
+    return InventoryStore(SheetsBackend(make_client(fake)), CATEGORY_MAP)
+
+
+def bench_load(df):
+    store = make_store(df)
+
+    def run():
+        # TTL 切れと同じ状態にして、全シートを読み直す
+        store.invalidate()
+        return store.get_data()
+    return run
+
+
+def bench_parse_date(df):
+    values = [v for col in DATE_COLUMNS if col in df.columns for v in df[col]]
+    return lambda: [parse_date(v) for v in values]
+
+
+def bench_alerts(df):
+    data = make_store(df).get_data()
+    return lambda: collect_alerts(data)
+
+
+def bench_search(df):
+    data = make_store(df).get_data()
+    return lambda: filter_by_query(data, "佐藤")
+
+
+def bench_csv_import(df):
+    frames = {cat: df[df["カテゴリ"] == cat][sheet_columns(cat)] for cat in CATEGORY_MAP}
+    data, ext, _ = export_bytes(frames, "CSV")
+    file_name = f"inventory.{ext}"
+
+    def run():
+        # ファイルの読込・検証と、空のシートへの書き込みまで (シートは毎回作り直す)
+        store = InventoryStore(SheetsBackend(make_client(_empty_fake())), CATEGORY_MAP)
+        batches, errors, _ = plan_import(read_upload(file_name, data))
+        results = commit_all(store, batches)
+        failed = [cat for cat, r in results.items() if isinstance(r, Exception)]
+        if errors or failed:
+            raise RuntimeError(f"インポートに失敗しました: {errors[:3]} {failed}")
+    return run
+
+
+def bench_idle_rerun(df):
+    # 何も操作せずに再実行したときの時間 (データはキャッシュ済み)。画面全体の固定費にあたる
+    frames = {cat: df[df["カテゴリ"] == cat][sheet_columns(cat)] for cat in CATEGORY_MAP}
+    data, ext, _ = export_bytes(frames, "CSV")
+    fd, seed_file = tempfile.mkstemp(suffix=f".{ext}")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    # 件数ごとに別のデータで動かすため、プロセス共有のキャッシュ (保存先・在庫キャッシュ) を捨てる
+    st.cache_resource.clear()
+    at = AppTest.from_file(APP_FILE, default_timeout=600)
+    at.secrets["sheets"] = {"client": "fake", "seed_file": seed_file}
+    at.run()
+    os.remove(seed_file)
+    return at.run
+
+
+def _empty_fake():
+    fake = FakeClient()
+    fake.create(SPREADSHEET_NAME)
+    return fake
+
+
+STAGES = {
+    "load": bench_load,
+    "parse_date": bench_parse_date,
+    "alerts": bench_alerts,
+    "search": bench_search,
+    "csv_import": bench_csv_import,
+    "idle_rerun": bench_idle_rerun,
+}
+
+
+def measure(func, repeat):
+    func()  # 1回目はウォームアップとして捨てる
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - t0)
+    return timings
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run(sizes, stages, repeat, seed):
+    results = []
+    for rows in sizes:
+        df = generate(rows, seed)
+        for name in stages:
+            timings = measure(STAGES[name](df), repeat)
+            results.append({
+                "stage": name,
+                "rows": rows,
+                "repeat": repeat,
+                "min": min(timings),
+                "median": statistics.median(timings),
+                "mean": statistics.fmean(timings),
+                "max": max(timings),
+            })
+            print(f"{name:>12} {rows:>7} 件: 中央値 {results[-1]['median'] * 1000:9.1f} ms", file=sys.stderr)
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="一覧表示・インポートの主要処理の所要時間を計測します")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="データ件数 (複数指定可)")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="結果の JSON を書き出すファイル (省略時は標準出力)")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.stages, args.repeat, args.seed)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from import_export import EXPORT_FORMATS, export_bytes
+from schema import CATEGORY_MAP, DATE_COLUMNS, STATUS_OPTIONS, sheet_columns
+
+# --- 設定: カテゴリごとの件数の比率 (実データのおおよその構成) ---
+CATEGORY_WEIGHTS = {
+    "PC": 30,
+    "訪問車": 10,
+    "iPad": 20,
+    "携帯電話": 20,
+    "Office365": 10,
+    "ウイルスバスター": 5,
+    "その他": 5,
+}
+
+# ステータスの出現比率 (STATUS_OPTIONS と同じ順)
+STATUS_WEIGHTS = [70, 15, 5, 10]
+
+LAST_NAMES = ["佐藤", "鈴木", "高橋", "田中", "渡辺", "伊藤", "山本", "中村", "小林", "加藤", "ｻｲﾄｳ", "ＹＡＭＡＤＡ"]
+FIRST_NAMES = ["太郎", "花子", "一郎", "美咲", "健", "由美", "ﾋﾛｼ", "ｱｷﾗ"]
+DEPARTMENTS = ["総務課", "訪問看護", "訪問ﾘﾊﾋﾞﾘ", "居宅介護支援", "デイサービス", "ＩＴ推進室"]
+PRODUCT_NAMES = {
+    "PC": ["ThinkPad X1", "Let's note SV", "ＤＥＬＬ Latitude", "富士通 LIFEBOOK"],
+    "訪問車": ["N-BOX", "ﾀﾝﾄ", "ムーヴ", "スペーシア"],
+    "iPad": ["iPad 第9世代", "iPad Air", "ｉＰａｄ mini"],
+    "携帯電話": ["iPhone SE", "AQUOS sense", "らくらくホン", "ｶﾞﾗﾎ"],
+    "Office365": ["Microsoft 365 Business", "M365 Basic"],
+    "ウイルスバスター": ["ウイルスバスター ビジネス", "ﾊﾞｽﾀｰ Corp."],
+    "その他": ["プロジェクター", "ﾌﾟﾘﾝﾀｰ", "Wi-Fiルーター", "シュレッダー"],
+}
+
+
+# --- 表記ゆれのある日付 (手入力のシートに実際に混ざる書き方) ---
+def messy_date(rng, d):
+    style = rng.randrange(10)
+    if style == 0:
+        return f"{d.year}年{d.month}月{d.day}日"
+    if style == 1:
+        return f"{d.year}.{d.month}.{d.day}"
+    if style == 2:
+        return f"{d.year}/{d.month}/{d.day}"
+    if style == 3:
+        return d.strftime("%Y-%m-%d").translate(str.maketrans("0123456789-", "０１２３４５６７８９－"))
+    if style == 4:
+        return ""
+    if style == 5:
+        return rng.choice(["不明", "未定", "-"])
+    return d.strftime("%Y/%m/%d")
+
+
+def mixed_width(rng, text):
+    # 半角・全角の英数字が混在する入力を再現する
+    if rng.random() < 0.3:
+        return text.translate(str.maketrans(
+            "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ-",
+            "０１２３４５６７８９ＡＢＣＤＥＦＧＨＩＪＫＬＭＮＯＰＱＲＳＴＵＶＷＸＹＺ－",
+        ))
+    return text
+
+
+def random_date(rng, start_year=2015, end_year=2030):
+    start = date(start_year, 1, 1)
+    return start + timedelta(days=rng.randrange((date(end_year, 12, 31) - start).days))
+
+
+def person(rng):
+    return f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}"
+
+
+def field_value(rng, cat, col, i):
+    if col in DATE_COLUMNS:
+        return messy_date(rng, random_date(rng))
+    if col in ("利用者1", "利用者2", "利用者3", "利用者4", "利用者5"):
+        return person(rng) if rng.random() < 0.7 else ""
+    if col == "使用部署":
+        return rng.choice(DEPARTMENTS)
+    if col == "電話番号":
+        return f"090-{rng.randrange(10000):04d}-{rng.randrange(10000):04d}"
+    if col in ("製造番号IMEI", "製造番号"):
+        return f"35{rng.randrange(10 ** 13):013d}"
+    if col == "登録番号":
+        return f"宇都宮 580 {rng.choice('あかさたなはまやらわ')} {rng.randrange(1, 10000):>4}"
+    if col == "備考":
+        return rng.choice(["", "", "", "バッテリー交換済み", "ｹｰｽ破損あり", "予備機\n(倉庫保管)"])
+    if col in ("チームビューワPW", "パスワード"):
+        return "".join(rng.choice("abcdefghjkmnpqrstuvwxyz23456789") for _ in range(10))
+    if col == "アカウントID":
+        return f"user{i:05d}@example.jp"
+    return mixed_width(rng, f"{col[:2]}-{rng.randrange(100000):05d}")
+
+
+# --- 全カテゴリ分の在庫データを生成する (カテゴリ列付き、値はすべて文字列) ---
+def generate(rows, seed=0):
+    rng = random.Random(seed)
+    cats = list(CATEGORY_MAP)
+    weights = [CATEGORY_WEIGHTS.get(c, 1) for c in cats]
+    counters = {c: 0 for c in cats}
+    records = []
+    for i in range(rows):
+        cat = rng.choices(cats, weights)[0]
+        counters[cat] += 1
+        record = {
+            "ID": mixed_width(rng, f"{cat[:2].upper()}-{counters[cat]:06d}"),
+            "カテゴリ": cat,
+            "品名": rng.choice(PRODUCT_NAMES.get(cat, ["備品"])),
+            "利用者": person(rng) if rng.random() < 0.8 else "",
+            "ステータス": rng.choices(STATUS_OPTIONS, STATUS_WEIGHTS)[0],
+            "更新日": random_date(rng, 2023, 2025).strftime("%Y-%m-%d"),
+        }
+        for col in sheet_columns(cat)[len(record):]:
+            record[col] = field_value(rng, cat, col, i)
+        records.append(record)
+    columns = list(dict.fromkeys(c for cat in cats for c in sheet_columns(cat)))
+    return pd.DataFrame(records).reindex(columns=columns, fill_value="").fillna("")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ベンチマーク用の在庫データを生成します")
+    parser.add_argument("--rows", type=int, default=10000, help="生成する件数 (全カテゴリ合計)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="CSV")
+    parser.add_argument("--out", default=None, help="出力先 (省略時は inventory_<件数>.<拡張子>)")
+    args = parser.parse_args()
+
+    df = generate(args.rows, args.seed)
+    frames = {cat: df[df["カテゴリ"] == cat][sheet_columns(cat)] for cat in CATEGORY_MAP}
+    data, ext, _ = export_bytes(frames, args.format)
+    out = args.out or f"inventory_{args.rows}.{ext}"
+    with open(out, "wb") as f:
+        f.write(data)
+    print(f"{len(df)} 件を {out} に書き出しました")
+
+
+if __name__ == "__main__":
+    main()
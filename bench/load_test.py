@@ -0,0 +1,355 @@
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest
+
+import metrics
+from generate_inventory import generate
+from import_export import export_bytes
+from schema import CATEGORY_MAP, sheet_columns
+
+APP_FILE = os.path.join(ROOT, "app.py")
+RUN_TIMEOUT = 300
+SEARCH_WORDS = ["佐藤", "iPad", "総務課", "ThinkPad", "090", "廃棄"]
+EDIT_SUBMIT_KEY = "FormSubmitter:edit_dialog_form-✅ この内容で更新する"
+CATEGORY_TABS = ["すべて"] + list(CATEGORY_MAP)
+
+# --- スクリプトのコンパイル結果をセッション間で共有する ---
+# 本物のサーバーは1つの ScriptCache を全セッションで共有するが、AppTest は実行のたびに作り直す。
+# 複数スレッドから同時に app.py を構文解析すると Python 自体が失敗することがあるため、
+# サーバーと同じく1度だけコンパイルして使い回す
+_bytecode = {}
+_bytecode_lock = threading.Lock()
+_original_get_bytecode = ScriptCache.get_bytecode
+
+
+def _shared_get_bytecode(self, script_path):
+    with _bytecode_lock:
+        if script_path not in _bytecode:
+            _bytecode[script_path] = _original_get_bytecode(self, script_path)
+        return _bytecode[script_path]
+
+
+ScriptCache.get_bytecode = _shared_get_bytecode
+
+# AppTest は1回の実行ごとに仮の Runtime を差し込み、終わると消す (1スレッドで使う前提)。
+# 同時に動いている他のセッションの実行中に消されないよう、最後に差し込まれたものを使い続ける
+_last_runtime = None
+
+
+def _shared_runtime_instance(cls):
+    global _last_runtime
+    if cls._instance is not None:
+        _last_runtime = cls._instance
+    if _last_runtime is None:
+        raise RuntimeError("Runtime hasn't been created!")
+    return _last_runtime
+
+
+Runtime.instance = classmethod(_shared_runtime_instance)
+Runtime.exists = classmethod(lambda cls: cls._instance is not None or _last_runtime is not None)
+
+# --- セッションごとの API 呼び出し数 ---
+# サイドバーの「API呼び出し状況」はプロセス全体の累計で、しかも読込より前に描かれるので、操作ごとの数には使えない。
+# 計測パネルの件数も、st.rerun() で打ち切られた再実行 (保存など) の分が残らない。
+# そこで API 呼び出しの件数を数える metrics.count を包み、呼び出したスクリプトのセッションごとに足し込む
+API_COUNTERS = ("api_read", "api_write")
+_api_counts = {}
+_api_counts_lock = threading.Lock()
+_original_count = metrics.count
+
+
+def _session_count(name, n=1):
+    _original_count(name, n)
+    if name not in API_COUNTERS:
+        return
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return
+    with _api_counts_lock:
+        counts = _api_counts.setdefault(id(ctx.session_state._state), dict.fromkeys(API_COUNTERS, 0))
+        counts[name] += n
+
+
+metrics.count = _session_count
+
+
+# --- 1人分の操作の流れ (重み付きでランダムに選ぶ) ---
+# AppTest はブラウザを介さずにスクリプトを実行するので、1回の操作 = 1回の再実行 (rerun) として計測する
+ACTION_WEIGHTS = {
+    "search": 30,
+    "tab_switch": 20,
+    "open_dialog": 20,
+    "save": 10,
+    "page_next": 20,
+}
+
+
+# --- 同時アクセスの再現 ---
+# Streamlit サーバーと同じく、すべてのセッションを1つのプロセス内で動かす。
+# st.cache_resource (Sheets クライアント・在庫キャッシュ) はセッション間で共有される
+class Session:
+    def __init__(self, number, secrets, rng):
+        self.number = number
+        self.rng = rng
+        self.at = AppTest.from_file(APP_FILE, default_timeout=RUN_TIMEOUT)
+        for section, values in secrets.items():
+            self.at.secrets[section] = values
+        self.samples = []
+
+    def api_counts(self):
+        with _api_counts_lock:
+            return dict(_api_counts.get(id(self.at._session_state._state), dict.fromkeys(API_COUNTERS, 0)))
+
+    def run(self, actions, think_time, stop_at):
+        self._timed("load", self.at.run)
+        for _ in range(actions):
+            if time.monotonic() > stop_at:
+                break
+            time.sleep(self.rng.uniform(0, think_time))
+            action = self.rng.choices(list(ACTION_WEIGHTS), list(ACTION_WEIGHTS.values()))[0]
+            getattr(self, f"do_{action}")()
+
+    def _timed(self, action, func):
+        before = self.api_counts()
+        t0 = time.perf_counter()
+        error = ""
+        try:
+            func()
+            if self.at.exception:
+                error = self.at.exception[0].value
+        except Exception as e:
+            error = repr(e)
+        elapsed = time.perf_counter() - t0
+        after = self.api_counts()
+        self.samples.append({
+            "session": self.number,
+            "action": action,
+            "seconds": elapsed,
+            "api_reads": after["api_read"] - before["api_read"],
+            "api_writes": after["api_write"] - before["api_write"],
+            "error": error,
+        })
+
+    # --- 操作 ---
+    def do_search(self):
+        self._ensure_list_tab()
+        if self.at.session_state["active_search_query"] and self.rng.random() < 0.5:
+            self._timed("search", lambda: self.at.button(key="clear_search_btn").click().run())
+            return
+        word = self.rng.choice(SEARCH_WORDS)
+        self._timed("search", lambda: self.at.text_input(key="input_search_key").input(word).run())
+
+    def do_tab_switch(self):
+        # 画面のタブ (main_nav) かカテゴリのタブ (cat_nav) を切り替える。
+        # どちらも開いたタブの中身だけを組み立てるので、切り替えのたびに再実行が起きる
+        labels = [t.label for t in self.at.tabs]
+        cat_labels = [l for l in labels if l in CATEGORY_TABS]
+        main_labels = [l for l in labels if l not in CATEGORY_TABS]
+        if cat_labels and self.rng.random() < 0.7:
+            self._switch_tab("cat_nav", self.rng.choice(cat_labels))
+        elif main_labels:
+            self._switch_tab("main_nav", self.rng.choice(main_labels))
+
+    def _switch_tab(self, key, label):
+        def switch():
+            self.at.session_state[key] = label
+            self.at.run()
+        self._timed("tab_switch", switch)
+
+    def _ensure_list_tab(self):
+        # 一覧以外のタブを開いているときは、一覧に戻ってから操作する
+        if not [t for t in self.at.text_input if t.key == "input_search_key"]:
+            self._switch_tab("main_nav", self.at.tabs[0].label)
+
+    def do_open_dialog(self):
+        self._ensure_list_tab()
+        key = self._detail_button()
+        if key:
+            self._timed("open_dialog", lambda: self.at.button(key=key).click().run())
+
+    def do_save(self):
+        # ダイアログを開いたまま保存する操作を再現する。
+        # 本物のダイアログは保存時にダイアログ部分だけ再実行されるが、AppTest は常に全体を再実行するため、
+        # 詳細ボタンと保存ボタンを同じ回に押して、ダイアログ内の保存処理まで到達させる
+        self._ensure_list_tab()
+        key = self._detail_button()
+        if not key:
+            return
+        self.at.button(key=key).click().run()
+        if not [b for b in self.at.button if b.key == EDIT_SUBMIT_KEY]:
+            return
+
+        # 変えた列だけが書き込まれるので、備考を書き換えてから保存する
+        notes = [t for t in self.at.text_area if t.label == "備考"]
+
+        def save():
+            self.at.button(key=key).click()
+            if notes:
+                notes[0].input(f"負荷試験 {self.rng.random():.6f}")
+            self.at.button(key=EDIT_SUBMIT_KEY).click()
+            self.at.run()
+        self._timed("save", save)
+
+    def do_page_next(self):
+        self._ensure_list_tab()
+        buttons = [b for b in self.at.button if b.key and b.key.startswith("next_")]
+        if buttons:
+            key = self.rng.choice(buttons).key
+            self._timed("page_next", lambda: self.at.button(key=key).click().run())
+        else:
+            self._timed("page_next", self.at.run)
+
+    def _detail_button(self):
+        keys = [b.key for b in self.at.button if b.key and b.key.startswith("btn_")]
+        return self.rng.choice(keys) if keys else None
+
+
+# --- 計測値の取得 ---
+
+
+def api_table(at):
+    for frame in at.dataframe:
+        df = frame.value
+        if "呼び出し元" in df.columns:
+            return df.to_dict("records")
+    return []
+
+
+def memory_mb():
+    # 現在の常駐メモリ (Linux) と、プロセス開始以降の最大値
+    current = None
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak = peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+    return {"rss_mb": current, "peak_rss_mb": peak}
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    k = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[k]
+
+
+def summarize(samples):
+    by_action = {}
+    for s in samples:
+        by_action.setdefault(s["action"], []).append(s)
+    summary = {}
+    for action, rows in [("all", samples)] + sorted(by_action.items()):
+        seconds = [r["seconds"] for r in rows]
+        summary[action] = {
+            "count": len(rows),
+            "errors": sum(1 for r in rows if r["error"]),
+            "p50": percentile(seconds, 50),
+            "p95": percentile(seconds, 95),
+            "p99": percentile(seconds, 99),
+            "max": max(seconds) if seconds else None,
+            "api_reads_per_action": sum(r["api_reads"] for r in rows) / len(rows) if rows else 0,
+            "api_writes_per_action": sum(r["api_writes"] for r in rows) / len(rows) if rows else 0,
+        }
+    return summary
+
+
+def write_seed(rows, seed):
+    df = generate(rows, seed)
+    frames = {cat: df[df["カテゴリ"] == cat][sheet_columns(cat)] for cat in CATEGORY_MAP}
+    data, ext, _ = export_bytes(frames, "CSV")
+    fd, path = tempfile.mkstemp(suffix=f".{ext}")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return path
+
+
+def run(sessions, actions, rows, think_time, duration, latency, read_quota, write_quota, seed):
+    seed_file = write_seed(rows, seed)
+    secrets = {"sheets": {"client": "fake", "seed_file": seed_file, "latency": latency}}
+    if read_quota:
+        secrets["sheets"]["read_quota"] = read_quota
+    if write_quota:
+        secrets["sheets"]["write_quota"] = write_quota
+
+    workers = [Session(i, secrets, random.Random(seed + i)) for i in range(sessions)]
+    stop_at = time.monotonic() + duration if duration else float("inf")
+    threads = [threading.Thread(target=w.run, args=(actions, think_time, stop_at)) for w in workers]
+    memory_before = memory_mb()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    os.remove(seed_file)
+
+    samples = [s for w in workers for s in w.samples]
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "sessions": sessions,
+            "actions_per_session": actions,
+            "rows": rows,
+            "think_time": think_time,
+            "latency": latency,
+            "elapsed": elapsed,
+        },
+        "memory": {"before": memory_before, "after": memory_mb()},
+        "summary": summarize(samples),
+        # 呼び出し元ごとの、プロセス全体 (全セッション) の最終集計
+        "api_by_site": api_table(workers[0].at) if workers else [],
+        "samples": samples,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="複数人が同時に操作したときの再実行の待ち時間を計測します")
+    parser.add_argument("--sessions", type=int, default=5, help="同時に操作する人数")
+    parser.add_argument("--actions", type=int, default=20, help="1人あたりの操作回数")
+    parser.add_argument("--rows", type=int, default=2000, help="在庫データの件数")
+    parser.add_argument("--think-time", type=float, default=1.0, help="操作の間隔の上限 (秒)")
+    parser.add_argument("--duration", type=float, default=0, help="計測を打ち切るまでの秒数 (0 は無制限)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Sheets API 1回あたりの遅延 (秒)")
+    parser.add_argument("--read-quota", type=int, default=0, help="1分あたりの読み取り上限 (0 は無制限)")
+    parser.add_argument("--write-quota", type=int, default=0, help="1分あたりの書き込み上限 (0 は無制限)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--samples", action="store_true", help="個々の計測値も出力する")
+    parser.add_argument("--output", default=None, help="結果の JSON を書き出すファイル (省略時は標準出力)")
+    args = parser.parse_args()
+
+    report = run(args.sessions, args.actions, args.rows, args.think_time, args.duration,
+                 args.latency, args.read_quota, args.write_quota, args.seed)
+    if not args.samples:
+        report.pop("samples")
+    for action, s in report["summary"].items():
+        print(f"{action:>12}: {s['count']:4d} 回  p50 {s['p50'] or 0:6.2f}s  p95 {s['p95'] or 0:6.2f}s  "
+              f"p99 {s['p99'] or 0:6.2f}s  API 読み {s['api_reads_per_action']:5.1f} / 書き {s['api_writes_per_action']:4.1f} 回/操作", file=sys.stderr)
+    text = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
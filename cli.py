@@ -0,0 +1,193 @@
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta
+
+from alerts import collect_alerts
+from connection import SECRETS_PATH, load_secrets, open_storage
+from expiry import ExpiryIndex, timeline_frame
+from integrity import IntegrityReport
+from import_export import EXPORT_FORMATS, read_upload, plan_import, commit_all, export_bytes, export_file_name
+from inventory_store import InventoryStore
+from schema import CATEGORY_MAP
+
+# --- 設定: インポートで1回に書き込む件数 (カテゴリごと) ---
+IMPORT_BATCH_SIZE = 500
+
+# 終了コード
+EXIT_OK = 0
+EXIT_ALERTS = 1      # --exit-code 指定時、アラート (check では重複) があった
+EXIT_FAILED = 2      # 読込・書き込みに失敗したカテゴリがある
+
+
+# --- 画面を使わずに一括処理を行うコマンド ---
+# 画面 (app.py) と同じ保存先・列定義・取り込み処理を使う。cron などから実行できる
+#   python cli.py export --format CSV --out backup.zip
+#   python cli.py import inventory.zip --dry-run
+#   python cli.py alerts --days 90 --json
+#   python cli.py check --exit-code
+def open_store(args):
+    # バックグラウンド再試行は行わない (失敗はそのまま終了コードで知らせる)
+    storage = open_storage(load_secrets(args.secrets))
+    return InventoryStore(storage, CATEGORY_MAP, retry_delays=[])
+
+
+def log(message):
+    print(message, file=sys.stderr)
+
+
+# --- エクスポート ---
+def cmd_export(args):
+    store = open_store(args)
+    cats = list(CATEGORY_MAP) if args.category == "すべて" else [args.category]
+    frames = {}
+    failed = []
+    for cat in cats:
+        try:
+            frames[cat] = store.fetch_full_sheet(cat, site="CLIエクスポート")
+        except Exception as e:
+            log(f"{cat}: 読込エラー: {e}")
+            failed.append(cat)
+    if not frames:
+        return EXIT_FAILED
+    data, ext, _ = export_bytes(frames, args.format)
+    out = args.out or export_file_name("all" if args.category == "すべて" else args.category, ext)
+    with open(out, "wb") as f:
+        f.write(data)
+    log(f"{sum(len(df) for df in frames.values())} 件を {out} に書き出しました")
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+# --- インポート ---
+def split_batches(batches, size):
+    # {カテゴリ: {ID: 行}} を、カテゴリごとに size 件ずつの塊に分ける
+    chunks = []
+    for cat, rows in batches.items():
+        items = list(rows.items())
+        for i, start in enumerate(range(0, len(items), size)):
+            if len(chunks) <= i:
+                chunks.append({})
+            chunks[i][cat] = dict(items[start:start + size])
+    return chunks
+
+
+def cmd_import(args):
+    with open(args.file, "rb") as f:
+        df = read_upload(args.file, f.read())
+    batches, errors, warnings = plan_import(df, fixed_cat=args.category)
+    for msg in warnings:
+        log(f"警告: {msg}")
+    for msg in errors:
+        log(f"スキップ: {msg}")
+    for cat, rows in batches.items():
+        log(f"{cat}: {len(rows)} 件")
+    if args.dry_run or not batches:
+        return EXIT_OK
+
+    store = open_store(args)
+    totals = {cat: {"updated": 0, "appended": 0} for cat in batches}
+    failed = set()
+    for chunk in split_batches(batches, args.batch_size):
+        # 失敗したカテゴリの残りは書き込まない (途中までの書き込みは残る)
+        chunk = {cat: rows for cat, rows in chunk.items() if cat not in failed}
+        for cat, result in commit_all(store, chunk).items():
+            if isinstance(result, Exception):
+                log(f"{cat}: インポートエラー: {result}")
+                failed.add(cat)
+            else:
+                totals[cat]["updated"] += result["updated"]
+                totals[cat]["appended"] += result["appended"]
+    for cat, t in totals.items():
+        log(f"{cat}: 更新 {t['updated']} 件 / 新規 {t['appended']} 件" + (" (途中で失敗)" if cat in failed else ""))
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+# --- 期日アラートと今後の期限のまとめ ---
+def cmd_alerts(args):
+    store = open_store(args)
+    df = store.get_data()
+    index = store.derived("expiry", ExpiryIndex.build)
+    today = datetime.now().date()
+    alert_items = collect_alerts(df, today, index=index)
+    upcoming = timeline_frame(index.between(today, today + timedelta(days=args.days)), today)
+    stale = store.stale_categories()
+
+    if args.json:
+        print(json.dumps({
+            "date": today.isoformat(),
+            "alerts": [{"title": item["title"], "messages": item["messages"]} for item in alert_items],
+            "upcoming": upcoming.assign(期日=upcoming["期日"].astype(str)).to_dict("records"),
+            "failed_categories": stale,
+        }, ensure_ascii=False, indent=2))
+    else:
+        print(f"■ 期日アラート ({today}): {len(alert_items)} 件")
+        for item in alert_items:
+            print(f"  {item['title']} : " + ", ".join(item["messages"]))
+        print(f"\n■ 今後 {args.days} 日以内の期限: {len(upcoming)} 件")
+        for month, group in upcoming.groupby("月", sort=False):
+            print(f"  [{month}]")
+            for row in group.to_dict("records"):
+                print(f"    {row['期日']} (あと{row['残り日数']}日)  {row['カテゴリ']}  {row['ID']}  {row['品名']}  {row['項目']}")
+    if stale:
+        log(f"読込に失敗したカテゴリ: {'、'.join(stale)} (アラートが欠けている可能性があります)")
+        return EXIT_FAILED
+    if args.exit_code and alert_items:
+        return EXIT_ALERTS
+    return EXIT_OK
+
+
+# --- データ整合性チェック (IDや機器番号の重複) ---
+def cmd_check(args):
+    store = open_store(args)
+    report = store.derived("integrity", IntegrityReport.build)
+    stale = store.stale_categories()
+
+    if args.json:
+        print(json.dumps({"issues": report.issues, "failed_categories": stale}, ensure_ascii=False, indent=2))
+    else:
+        print(f"■ データ整合性チェック: {len(report)} 件")
+        for issue in report.issues:
+            print(f"  [{issue['種類']}] {issue['値']} ({issue['件数']}行): {issue['該当']}")
+    if stale:
+        log(f"読込に失敗したカテゴリ: {'、'.join(stale)} (チェックが欠けている可能性があります)")
+        return EXIT_FAILED
+    if args.exit_code and report.issues:
+        return EXIT_ALERTS
+    return EXIT_OK
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="総務備品管理アプリの一括処理 (画面なし)")
+    parser.add_argument("--secrets", default=SECRETS_PATH, help="secrets.toml の場所")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("export", help="データをファイルに書き出す")
+    p.add_argument("--category", choices=["すべて"] + list(CATEGORY_MAP), default="すべて")
+    p.add_argument("--format", choices=list(EXPORT_FORMATS), default="CSV")
+    p.add_argument("--out", default=None, help="出力先 (省略時は画面からのダウンロードと同じ名前)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("import", help="ファイルの内容で更新・新規登録する")
+    p.add_argument("file", help="CSV / XLSX / Parquet / エクスポートした ZIP")
+    p.add_argument("--category", choices=list(CATEGORY_MAP), default=None, help="取り込み先 (省略時はカテゴリ列で振り分け)")
+    p.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="カテゴリごとに1回で書き込む件数")
+    p.add_argument("--dry-run", action="store_true", help="検証だけ行い、書き込まない")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("alerts", help="期日アラートと今後の期限を出力する")
+    p.add_argument("--days", type=int, default=90, help="今後の期限を何日先まで出すか")
+    p.add_argument("--json", action="store_true", help="JSON で出力する")
+    p.add_argument("--exit-code", action="store_true", help=f"アラートがあれば終了コード {EXIT_ALERTS} で終わる")
+    p.set_defaults(func=cmd_alerts)
+
+    p = sub.add_parser("check", help="IDやシリアル番号・IMEI・電話番号の重複を調べる")
+    p.add_argument("--json", action="store_true", help="JSON で出力する")
+    p.add_argument("--exit-code", action="store_true", help=f"重複があれば終了コード {EXIT_ALERTS} で終わる")
+    p.set_defaults(func=cmd_check)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python 3.10 以前は Streamlit が依存している toml を使う
+    tomllib = None
+    import toml
+
+import gspread
+from oauth2client.service_account import ServiceAccountCredentials
+
+from fake_sheets import FakeClient
+from import_export import read_upload
+from sheets_client import SheetsClient
+from storage import SheetsBackend, SQLiteBackend
+
+# --- 設定: 接続先のスプレッドシート ---
+SCOPE = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+SPREADSHEET_NAME = 'management_db'
+SECRETS_PATH = ".streamlit/secrets.toml"
+
+
+# --- 保存先の組み立て (画面 app.py とコマンド cli.py で共通) ---
+# secrets: secrets.toml と同じ形の {セクション: {キー: 値}}
+
+# Sheets クライアント (レート制限・リトライ付き)
+# [sheets] client = "fake" を指定すると、本物の代わりにメモリ上の代替 (fake_sheets.py) を使う。
+# 認証情報なしで、遅延やクォータ超過を再現しながら動作確認・計測ができる
+#   [sheets]
+#   client = "fake"
+#   latency = 0.3       # 1回の API 呼び出しにかかる秒数
+#   read_quota = 60     # 1分あたりの上限 (超えると 429)
+#   write_quota = 60
+#   error_rate = 0.0    # 503 を返す確率
+#   seed_file = "inventory.zip"  # 起動時に読み込むデータ (エクスポートした CSV/ZIP/XLSX/Parquet)
+def open_sheets_client(secrets):
+    sheets_conf = secrets.get("sheets", {})
+    if sheets_conf.get("client") == "fake":
+        fake = FakeClient(
+            latency=float(sheets_conf.get("latency", 0.0)),
+            read_quota=sheets_conf.get("read_quota"),
+            write_quota=sheets_conf.get("write_quota"),
+            error_rate=float(sheets_conf.get("error_rate", 0.0)),
+        )
+        fake.create(SPREADSHEET_NAME)
+        if sheets_conf.get("seed_file"):
+            with open(sheets_conf["seed_file"], "rb") as f:
+                fake.seed(SPREADSHEET_NAME, read_upload(sheets_conf["seed_file"], f.read()))
+        return SheetsClient(fake, SPREADSHEET_NAME)
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(secrets["gcp_service_account"], SCOPE)
+    return SheetsClient(gspread.authorize(creds), SPREADSHEET_NAME)
+
+
+# 保存先の選択
+# [storage] で backend = "sqlite" を指定すると、ローカルの SQLite だけで動く
+#   [storage]
+#   backend = "sqlite"
+#   path = "inventory.db"
+def open_storage(secrets):
+    storage_conf = secrets.get("storage", {})
+    if storage_conf.get("backend") == "sqlite":
+        return SQLiteBackend(storage_conf.get("path", "inventory.db"))
+    return SheetsBackend(open_sheets_client(secrets))
+
+
+def load_secrets(path=SECRETS_PATH):
+    # Streamlit を使わずに secrets.toml を読む (cli.py 用)
+    if tomllib is None:
+        return toml.load(path)
+    with open(path, "rb") as f:
+        return tomllib.load(f)
@@ -0,0 +1,107 @@
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+import pandas as pd
+
+import metrics
+from schema import CATEGORY_MAP, EXPIRY_COLUMNS, REPLACEMENT_YEARS, parse_date
+
+# --- 設定: 期限カレンダーで選べる期間 (表示名: 日数) ---
+EXPIRY_HORIZONS = {
+    "30日以内": 30,
+    "90日以内": 90,
+    "半年以内": 183,
+    "1年以内": 365,
+}
+
+# 期限カレンダーに載るカテゴリ
+EXPIRY_CATEGORIES = [c for c in CATEGORY_MAP if c in EXPIRY_COLUMNS or c in REPLACEMENT_YEARS]
+
+
+def add_years(d, years):
+    try:
+        return d.replace(year=d.year + years)
+    except ValueError:
+        # うるう日 (2/29) は 2/28 に寄せる
+        return d.replace(year=d.year + years, month=2, day=28)
+
+
+# --- 期限カレンダーの索引 ---
+# 全カテゴリの期限・満了日 (と、購入日から求めた買い替え時期) を期日順に並べたもの。
+# 読み込んだデータが変わるまで作り直さず (InventoryStore.derived)、期間の絞り込みは二分探索で行う。
+# 廃棄済みの行と、日付として読めない値は載せない
+class ExpiryIndex:
+    def __init__(self, entries):
+        self.entries = sorted(entries, key=lambda e: (e["期日"], e["pos"]))
+        self._dates = [e["期日"] for e in self.entries]
+
+    @classmethod
+    def build(cls, df):
+        # df: 一覧用の結合データ。各項目の pos は df 内の位置 (詳細画面を開くときに使う)
+        entries = []
+        if df.empty:
+            return cls(entries)
+        with metrics.span("build_expiry_index"):
+            for pos, row in enumerate(df.to_dict("records")):
+                if str(row.get("ステータス", "")).strip() == "廃棄":
+                    continue
+                cat = row.get("カテゴリ")
+                for col in EXPIRY_COLUMNS.get(cat, []):
+                    dt = parse_date(row.get(col))
+                    if dt:
+                        entries.append(_entry(row, pos, col, dt.date(), dt.date()))
+                years = REPLACEMENT_YEARS.get(cat)
+                if years:
+                    dt = parse_date(row.get("購入日"))
+                    if dt:
+                        entries.append(_entry(row, pos, f"購入から{years}年", add_years(dt.date(), years), dt.date()))
+        return cls(entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def between(self, start=None, end=None, categories=None, items=None):
+        # 期日が start 以上 end 以下の項目を期日順に返す (None は上限・下限なし)
+        lo = 0 if start is None else bisect_left(self._dates, start)
+        hi = len(self._dates) if end is None else bisect_right(self._dates, end)
+        found = self.entries[lo:hi]
+        if categories is not None:
+            found = [e for e in found if e["カテゴリ"] in categories]
+        if items is not None:
+            found = [e for e in found if e["項目"] in items]
+        return found
+
+    def due_within(self, days, today=None, categories=None, items=None):
+        # 期限切れのものも含めて、今日から days 日以内に期日が来る項目
+        today = today or date.today()
+        return self.between(None, date.fromordinal(today.toordinal() + days), categories, items)
+
+
+def _entry(row, pos, item, due, source):
+    return {
+        "期日": due,
+        "カテゴリ": row.get("カテゴリ"),
+        "ID": row.get("ID"),
+        "品名": row.get("品名", ""),
+        "利用者": row.get("利用者", ""),
+        "項目": item,
+        "元の日付": source,
+        "pos": pos,
+    }
+
+
+# --- 期限カレンダー用の表 (月ごと・カテゴリごと) ---
+# 期日を過ぎたものは「期限切れ」としてまとめる。行は期日順 (期限切れが先頭)
+def timeline_frame(entries, today=None):
+    today = today or date.today()
+    rows = [{
+        "月": "期限切れ" if e["期日"] < today else f"{e['期日'].year}年{e['期日'].month}月",
+        "期日": e["期日"],
+        "残り日数": (e["期日"] - today).days,
+        "カテゴリ": e["カテゴリ"],
+        "ID": e["ID"],
+        "品名": e["品名"],
+        "利用者": e["利用者"],
+        "項目": e["項目"],
+    } for e in entries]
+    return pd.DataFrame(rows, columns=["月", "期日", "残り日数", "カテゴリ", "ID", "品名", "利用者", "項目"])
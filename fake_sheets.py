@@ -0,0 +1,281 @@
+import random
+import re
+import threading
+import time
+from collections import deque
+
+import gspread
+from gspread.utils import numericise_all
+
+from schema import CATEGORY_MAP, sheet_columns
+
+# --- 設定: 本物の Sheets API に近い既定値 ---
+DEFAULT_LATENCY = 0.0
+QUOTA_WINDOW = 60.0
+
+
+# --- オフライン用の Google スプレッドシート代替 ---
+# app.py / storage.py が使う gspread の範囲 (open, worksheet, add_worksheet, get_all_records, find, update,
+# append_row(s), get, batch_get, batch_update, col_values, row_values) をメモリ上で再現する。
+# 応答の遅延・1分あたりのクォータ超過 (429)・一時的なエラー (503) を設定で再現できる。
+class FakeClient:
+    def __init__(self, latency=DEFAULT_LATENCY, jitter=0.0, read_quota=None, write_quota=None,
+                 error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.quotas = {"read": read_quota, "write": write_quota}
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._spreadsheets = {}
+        self._calls = {"read": deque(), "write": deque()}
+        self.counts = {"read": 0, "write": 0, "429": 0, "503": 0}
+        self._lock = threading.Lock()
+
+    def open(self, title):
+        self._request("read")
+        with self._lock:
+            if title not in self._spreadsheets:
+                raise gspread.SpreadsheetNotFound(title)
+            return self._spreadsheets[title]
+
+    def create(self, title, sheets=None):
+        # テスト用: スプレッドシートを作り、既定ではカテゴリごとのシートを見出し付きで用意する
+        spreadsheet = FakeSpreadsheet(self, title)
+        for cat_name, sheet_name in (sheets or CATEGORY_MAP).items():
+            spreadsheet._put_worksheet(sheet_name, [sheet_columns(cat_name)])
+        with self._lock:
+            self._spreadsheets[title] = spreadsheet
+        return spreadsheet
+
+    def seed(self, title, df):
+        # テスト用: カテゴリ列を持つ DataFrame の内容を、各シートに列定義の順で書き込む
+        spreadsheet = self._spreadsheets.get(title) or self.create(title)
+        for cat_name, sheet_name in CATEGORY_MAP.items():
+            rows = df[df['カテゴリ'] == cat_name].reindex(columns=sheet_columns(cat_name), fill_value='')
+            worksheet = spreadsheet._worksheets[sheet_name]
+            worksheet._rows = [sheet_columns(cat_name)] + rows.fillna('').astype(str).values.tolist()
+        return spreadsheet
+
+    def _request(self, kind):
+        # 1回の API 呼び出しとして、遅延・クォータ・エラーを適用する
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        with self._lock:
+            now = time.monotonic()
+            calls = self._calls[kind]
+            while calls and now - calls[0] > QUOTA_WINDOW:
+                calls.popleft()
+            quota = self.quotas[kind]
+            if quota is not None and len(calls) >= quota:
+                self.counts["429"] += 1
+                raise _api_error(429, "Quota exceeded", retry_after=QUOTA_WINDOW - (now - calls[0]))
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.counts["503"] += 1
+                raise _api_error(503, "The service is currently unavailable.")
+            calls.append(now)
+            self.counts[kind] += 1
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, title):
+        self.client = client
+        self.title = title
+        self._worksheets = {}
+
+    def worksheet(self, title):
+        self.client._request("read")
+        if title not in self._worksheets:
+            raise gspread.WorksheetNotFound(title)
+        return self._worksheets[title]
+
+    def add_worksheet(self, title, rows=1000, cols=26, index=None):
+        # gspread と同じく空のシートを追加する (rows / cols は受け取るだけ)
+        self.client._request("write")
+        if title in self._worksheets:
+            raise _api_error(400, f'A sheet with the name "{title}" already exists.')
+        return self._put_worksheet(title, [])
+
+    def _put_worksheet(self, title, rows):
+        worksheet = FakeWorksheet(self.client, title, rows)
+        self._worksheets[title] = worksheet
+        return worksheet
+
+    def worksheets(self):
+        return list(self._worksheets.values())
+
+
+class FakeWorksheet:
+    def __init__(self, client, title, rows):
+        self.client = client
+        self.title = title
+        self._rows = [[str(v) for v in row] for row in rows]
+        self._lock = threading.Lock()
+
+    # --- 読み取り ---
+    def get_all_values(self, **kwargs):
+        self.client._request("read")
+        return self._snapshot()
+
+    def get_all_records(self, head=1, default_blank='', numericise_ignore=(), **kwargs):
+        self.client._request("read")
+        rows = self._snapshot()
+        if len(rows) < head:
+            return []
+        header = rows[head - 1]
+        records = []
+        for row in rows[head:]:
+            row = (row + [''] * (len(header) - len(row)))[:len(header)]
+            if list(numericise_ignore) == ['all']:
+                values = [v if v != '' else default_blank for v in row]
+            else:
+                values = numericise_all(row, default_blank=default_blank, ignore=list(numericise_ignore))
+            records.append(dict(zip(header, values)))
+        return records
+
+    def get(self, range_name=None, **kwargs):
+        self.client._request("read")
+        return self._read_range(range_name)
+
+    def batch_get(self, ranges, **kwargs):
+        self.client._request("read")
+        return [self._read_range(r) for r in ranges]
+
+    def row_values(self, row, **kwargs):
+        self.client._request("read")
+        with self._lock:
+            if row - 1 >= len(self._rows):
+                return []
+            return _trim_row(self._rows[row - 1])
+
+    def col_values(self, col, **kwargs):
+        self.client._request("read")
+        with self._lock:
+            values = [row[col - 1] if col - 1 < len(row) else '' for row in self._rows]
+        while values and values[-1] == '':
+            values.pop()
+        return values
+
+    def find(self, query, in_row=None, in_column=None, case_sensitive=True):
+        self.client._request("read")
+        with self._lock:
+            for r, row in enumerate(self._rows, start=1):
+                if in_row is not None and r != in_row:
+                    continue
+                for c, value in enumerate(row, start=1):
+                    if in_column is not None and c != in_column:
+                        continue
+                    if value == str(query) or (not case_sensitive and value.lower() == str(query).lower()):
+                        return gspread.Cell(r, c, value)
+        return None
+
+    # --- 書き込み ---
+    def update(self, values=None, range_name=None, **kwargs):
+        # gspread 5 系の update(range, values) の順でも受け付ける
+        if isinstance(values, str):
+            values, range_name = range_name, values
+        self.client._request("write")
+        self._write_range(range_name or "A1", values)
+        return {"updatedRange": f"{self.title}!{range_name}"}
+
+    def batch_update(self, data, **kwargs):
+        self.client._request("write")
+        for item in data:
+            self._write_range(item["range"], item["values"])
+        return {"totalUpdatedCells": sum(len(row) for item in data for row in item["values"])}
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values], **kwargs)
+
+    def append_rows(self, values, **kwargs):
+        self.client._request("write")
+        with self._lock:
+            # 本物と同様、最後の空でない行の次から追加する
+            while self._rows and not any(self._rows[-1]):
+                self._rows.pop()
+            start = len(self._rows) + 1
+            self._rows.extend([str(v) for v in row] for row in values)
+        return {"updates": {"updatedRange": f"{self.title}!A{start}:A{start + len(values) - 1}"}}
+
+    # --- 内部処理 ---
+    def _snapshot(self):
+        with self._lock:
+            rows = [_trim_row(row) for row in self._rows]
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def _read_range(self, range_name):
+        r1, c1, r2, c2 = _parse_range(range_name)
+        with self._lock:
+            last_row = len(self._rows) if r2 is None else min(r2, len(self._rows))
+            rows = []
+            for r in range(r1, last_row + 1):
+                row = self._rows[r - 1]
+                end = len(row) if c2 is None else min(c2, len(row))
+                rows.append(_trim_row(row[c1 - 1:end]))
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def _write_range(self, range_name, values):
+        r1, c1, _, _ = _parse_range(range_name)
+        with self._lock:
+            for dr, row_values in enumerate(values):
+                r = r1 + dr
+                while len(self._rows) < r:
+                    self._rows.append([])
+                row = self._rows[r - 1]
+                for dc, value in enumerate(row_values):
+                    c = c1 + dc
+                    if len(row) < c:
+                        row.extend([''] * (c - len(row)))
+                    row[c - 1] = '' if value is None else str(value)
+
+
+def _trim_row(row):
+    end = len(row)
+    while end and row[end - 1] == '':
+        end -= 1
+    return list(row[:end])
+
+
+_CELL_RE = re.compile(r"^([A-Z]*)(\d*)$")
+
+
+def _parse_range(range_name):
+    # "A1" / "A2:F" / "1:1" / "'PC'!A1:C3" を (開始行, 開始列, 終了行, 終了列) に変換する (終端なしは None)
+    if '!' in range_name:
+        range_name = range_name.split('!', 1)[1]
+    start, _, end = range_name.partition(':')
+    r1, c1 = _parse_cell(start)
+    if not end:
+        return r1 or 1, c1 or 1, r1, c1
+    r2, c2 = _parse_cell(end)
+    return r1 or 1, c1 or 1, r2, c2
+
+
+def _parse_cell(cell):
+    m = _CELL_RE.match(cell.upper())
+    letters, digits = m.group(1), m.group(2)
+    col = None
+    if letters:
+        col = 0
+        for ch in letters:
+            col = col * 26 + ord(ch) - 64
+    return (int(digits) if digits else None), col
+
+
+class _FakeResponse:
+    def __init__(self, status_code, message, retry_after=None):
+        self.status_code = status_code
+        self.text = message
+        self.headers = {"Retry-After": str(int(retry_after) + 1)} if retry_after is not None else {}
+        self._message = message
+
+    def json(self):
+        return {"error": {"code": self.status_code, "message": self._message, "status": "FAKE"}}
+
+
+def _api_error(status_code, message, retry_after=None):
+    return gspread.exceptions.APIError(_FakeResponse(status_code, message, retry_after))
@@ -0,0 +1,230 @@
+import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from schema import CATEGORY_MAP, COLUMNS_DEF, STATUS_OPTIONS, DATE_COLUMNS, sheet_columns, parse_date
+
+# --- 設定: 同時に書き込むシート数 (API の呼び出し間隔は SheetsClient 側で調整される) ---
+MAX_PARALLEL_SHEETS = 4
+
+# 複数のファイル・シートをまとめて読んだときに付ける、元のファイル (シート) 名と行番号の列
+SOURCE_COLUMN = "取込元"
+SOURCE_LINE_COLUMN = "取込元の行"
+
+# エクスポート時に付く補助列など、取り込み時に黙って無視する列
+IGNORED_COLUMNS = {"sort_order", SOURCE_COLUMN, SOURCE_LINE_COLUMN}
+
+# --- 設定: 入出力できるファイル形式 (表示名: 拡張子) ---
+EXPORT_FORMATS = {
+    "CSV": "csv",
+    "Excel (XLSX)": "xlsx",
+    "Parquet": "parquet",
+}
+IMPORT_EXTENSIONS = ["csv", "zip", "xlsx", "parquet"]
+_MIME_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+# --- アップロードされたファイルの読み込み (CSV / XLSX / Parquet / エクスポートした ZIP) ---
+# どの形式でも、シートに書き込む文字列の表に揃えて返す。
+# ZIP と XLSX は中のファイル・シートをつなげるので、エラー表示用に取込元と元の行番号の列を付ける
+def read_upload(file_name, data):
+    ext = file_name.lower().rsplit('.', 1)[-1]
+    if ext == "zip":
+        frames = []
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            for name in zf.namelist():
+                if not name.lower().endswith((".csv", ".parquet")):
+                    continue
+                frame = read_upload(name, zf.read(name))
+                if 'カテゴリ' not in frame.columns:
+                    frame['カテゴリ'] = _category_from_file_name(name)
+                frames.append(_with_source(frame, name))
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True).fillna('')
+    if ext == "xlsx":
+        # シートごとにカテゴリが分かれている想定 (カテゴリ列がなければシート名を使う)
+        frames = []
+        for sheet_name, frame in pd.read_excel(io.BytesIO(data), sheet_name=None, dtype=object).items():
+            frame = _to_text_frame(frame)
+            if 'カテゴリ' not in frame.columns:
+                frame['カテゴリ'] = sheet_name
+            frames.append(_with_source(frame, f"{sheet_name} シート"))
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True).fillna('')
+    if ext == "parquet":
+        return _to_text_frame(pd.read_parquet(io.BytesIO(data)))
+    return _read_csv(data)
+
+
+def _with_source(frame, source):
+    # 見出しが1行目なので、データの1行目は2行目
+    frame[SOURCE_COLUMN] = source
+    frame[SOURCE_LINE_COLUMN] = [str(i + 2) for i in range(len(frame))]
+    return frame
+
+
+def _to_text(value):
+    if value is None or (not isinstance(value, (list, tuple)) and pd.isna(value)):
+        return ''
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _to_text_frame(df):
+    return df.astype(object).map(_to_text)
+
+
+def _read_csv(data):
+    # 文字列のまま読み込む (先頭の0や空欄を壊さない)。Excelで保存し直したShift_JISにも対応
+    for encoding in ('utf-8-sig', 'cp932'):
+        try:
+            return pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False, encoding=encoding)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("CSVの文字コードを判別できませんでした (UTF-8 または Shift_JIS で保存してください)")
+
+
+def _category_from_file_name(name):
+    base = name.rsplit('/', 1)[-1]
+    return base.split('_inventory')[0]
+
+
+# --- カテゴリごとへの振り分けと、列定義に沿った検証 ---
+def plan_import(df, fixed_cat=None):
+    # 戻り値: ({カテゴリ: {ID: 行データ}}, エラー一覧, 警告一覧)
+    batches = {}
+    errors = []
+    warnings = []
+
+    known = {c for cat in CATEGORY_MAP for c in sheet_columns(cat)}
+    unknown = [c for c in df.columns if c not in known and c not in IGNORED_COLUMNS]
+    if unknown:
+        warnings.append(f"定義にない列は無視します: {', '.join(map(str, unknown))}")
+    if fixed_cat is None and 'カテゴリ' not in df.columns:
+        errors.append("「カテゴリ」列がないため、振り分けできません。")
+        return batches, errors, warnings
+
+    duplicated = set()
+    for i, row in enumerate(df.fillna('').to_dict('records')):
+        line = _line_label(row, i)
+        cat = fixed_cat or str(row.get('カテゴリ', '')).strip()
+        if cat not in CATEGORY_MAP:
+            errors.append(f"{line}: カテゴリ「{cat}」は登録されていません")
+            continue
+        item_id = str(row.get('ID', '')).strip()
+        if not item_id:
+            errors.append(f"{line}: IDが空欄です")
+            continue
+        status = str(row.get('ステータス', '')).strip() or '利用可能'
+        if status not in STATUS_OPTIONS:
+            errors.append(f"{line}: ステータス「{status}」は選択肢にありません")
+            continue
+        # 他のカテゴリの列に入っている値はシートに書き込めない (黙って捨てずに知らせる)
+        columns = set(sheet_columns(cat))
+        dropped = [c for c in df.columns
+                   if c in known and c not in columns and str(row.get(c, '')).strip()]
+        if dropped:
+            warnings.append(f"{line}: {cat} にない列の値は取り込みません: {', '.join(dropped)}")
+        rows = batches.setdefault(cat, {})
+        if item_id in rows:
+            duplicated.add((cat, item_id))
+        rows[item_id] = dict(row, ID=item_id, ステータス=status)
+
+    for cat, item_id in sorted(duplicated):
+        warnings.append(f"{cat}: ID '{item_id}' がファイル内で重複しているため、最後の行を使います")
+    return batches, errors, warnings
+
+
+def _line_label(row, i):
+    # エラー表示用の位置。ZIP・XLSX はつなげた表の何行目かではなく、元のファイル (シート) の行で示す
+    if row.get(SOURCE_COLUMN):
+        return f"{row[SOURCE_COLUMN]} {row.get(SOURCE_LINE_COLUMN)}行目"
+    return f"{i + 2}行目"
+
+
+def build_row(cat, record, current_time):
+    # 保存するデータの並び順: 基本列 (ID, カテゴリ, 品名, 利用者, ステータス, 更新日) + カテゴリ固有列
+    row = [record['ID'], cat, record.get('品名', ''), record.get('利用者', ''), record['ステータス'], current_time]
+    for col_name in COLUMNS_DEF.get(cat, []):
+        row.append(record.get(col_name, ''))
+    return row
+
+
+# --- シートごとの一括書き込みを並行して実行 ---
+def commit_all(store, batches, max_workers=MAX_PARALLEL_SHEETS):
+    # 戻り値: {カテゴリ: {"updated": n, "appended": m} または 例外}
+    current_time = datetime.now().strftime('%Y-%m-%d')
+
+    def commit(cat):
+        rows = [build_row(cat, record, current_time) for record in batches[cat].values()]
+        return store.upsert_rows(cat, rows, site="インポート")
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {cat: pool.submit(commit, cat) for cat in batches}
+        for cat, future in futures.items():
+            try:
+                results[cat] = future.result()
+            except Exception as e:
+                results[cat] = e
+    return results
+
+
+# --- エクスポート ---
+def export_file_name(cat, ext):
+    return f"{cat}_inventory_{datetime.now().strftime('%Y%m%d')}.{ext}"
+
+
+def typed_frame(df):
+    # COLUMNS_DEF の日付列は日付型、それ以外は文字列型にする (電話番号やIMEIの先頭の0を保つ)。
+    # 日付として読めない値が混ざっている列は、値を失わないよう文字列のまま残す
+    out = pd.DataFrame(index=df.index)
+    for col in df.columns:
+        text = df[col].map(_to_text)
+        if col in DATE_COLUMNS:
+            parsed = text.map(parse_date)
+            if not (parsed.isna() & (text.str.strip() != '')).any():
+                out[col] = pd.to_datetime(parsed)
+                continue
+        out[col] = text.astype("string")
+    return out
+
+
+def export_bytes(frames, fmt):
+    # frames: {カテゴリ: DataFrame}。戻り値: (データ, 拡張子, MIMEタイプ)
+    ext = EXPORT_FORMATS[fmt]
+    if ext == "xlsx":
+        # Excel はカテゴリごとのシートを1つのブックにまとめる
+        buf = io.BytesIO()
+        with pd.ExcelWriter(buf, engine="openpyxl", date_format="YYYY-MM-DD", datetime_format="YYYY-MM-DD") as writer:
+            for cat, df in frames.items():
+                typed_frame(df).to_excel(writer, sheet_name=cat, index=False)
+        return buf.getvalue(), "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    if len(frames) == 1:
+        df = next(iter(frames.values()))
+        return _single_file_bytes(df, ext), ext, _MIME_TYPES[ext]
+    # 複数カテゴリの CSV / Parquet はカテゴリごとのファイルを ZIP にまとめる (そのまま一括インポートに使える)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for cat, df in frames.items():
+            zf.writestr(export_file_name(cat, ext), _single_file_bytes(df, ext))
+    return buf.getvalue(), "zip", "application/zip"
+
+
+def _single_file_bytes(df, ext):
+    if ext == "parquet":
+        buf = io.BytesIO()
+        typed_frame(df).to_parquet(buf, index=False)
+        return buf.getvalue()
+    return df.to_csv(index=False).encode('utf-8_sig')
@@ -0,0 +1,106 @@
+import unicodedata
+
+import pandas as pd
+
+import metrics
+from schema import IDENTIFIER_COLUMNS
+
+# --- 設定: 値が入っていないものとして扱う書き方 (重複とはみなさない) ---
+PLACEHOLDER_VALUES = {"", "-", "ー", "―", "なし", "無し", "不明", "未定", "N/A", "NA", "NONE", "NAN"}
+
+# 問題の種類 (表示順)
+ISSUE_SAME_SHEET = "ID重複 (同じシート)"    # 編集がどの行に書き込まれるか決まらない
+ISSUE_CROSS_SHEET = "ID重複 (別シート)"     # 一覧・インポートで取り違えやすい
+ISSUE_NOTATION = "ID表記ゆれ"               # 全角・半角や大文字・小文字だけが違う
+ISSUE_ORDER = [ISSUE_SAME_SHEET, ISSUE_CROSS_SHEET, ISSUE_NOTATION]
+
+
+def normalize_key(value, kind="ID"):
+    # 比較用の値: 全角・半角と大文字・小文字をそろえ、番号類は空白とハイフンを除く
+    text = unicodedata.normalize("NFKC", str(value if value is not None else "")).strip().upper()
+    if kind != "ID":
+        text = text.replace(" ", "").replace("-", "").replace("ー", "")
+    if text in PLACEHOLDER_VALUES:
+        return ""
+    return text
+
+
+# --- データ整合性チェック ---
+# 読み込んだ全カテゴリの行を1回だけなめて、ID と機器固有の番号 (シリアル・IMEI・電話番号) を
+# 正規化した値ごとに辞書へ振り分け、2行以上に出てくるものを問題として挙げる。
+# 読み込んだデータが変わるまで作り直さない (InventoryStore.derived)
+class IntegrityReport:
+    def __init__(self, issues, ambiguous):
+        self.issues = issues
+        # {カテゴリ: {ID, ...}} 同じシートに複数行ある ID (保存先は書き込みを拒否する)
+        self.ambiguous = ambiguous
+
+    @classmethod
+    def build(cls, df):
+        if df.empty:
+            return cls([], {})
+        with metrics.span("build_integrity_report"):
+            ids = {}       # 正規化した ID -> [(カテゴリ, 元の ID), ...]
+            numbers = {}   # (種類, 正規化した値) -> [(カテゴリ, ID, 列, 元の値), ...]
+            for row in df.to_dict("records"):
+                cat = row.get("カテゴリ")
+                item_id = str(row.get("ID", "")).strip()
+                key = normalize_key(item_id)
+                if key:
+                    ids.setdefault(key, []).append((cat, item_id))
+                for col, kind in IDENTIFIER_COLUMNS.get(cat, {}).items():
+                    value = row.get(col)
+                    key = normalize_key(value, kind)
+                    if key:
+                        numbers.setdefault((kind, key), []).append((cat, item_id, col, str(value).strip()))
+
+            issues = []
+            ambiguous = {}
+            for key, hits in ids.items():
+                if len(hits) < 2:
+                    continue
+                seen = set()
+                same_sheet = set()
+                for hit in hits:
+                    if hit in seen:
+                        same_sheet.add(hit)
+                    seen.add(hit)
+                for cat, item_id in same_sheet:
+                    ambiguous.setdefault(cat, set()).add(item_id)
+                if same_sheet:
+                    kind = ISSUE_SAME_SHEET
+                elif len({cat for cat, _ in hits}) > 1:
+                    kind = ISSUE_CROSS_SHEET
+                else:
+                    kind = ISSUE_NOTATION
+                issues.append({
+                    "種類": kind,
+                    "値": key,
+                    "件数": len(hits),
+                    "該当": "、".join(f"{cat} {item_id}" for cat, item_id in hits),
+                })
+            for (kind, key), hits in numbers.items():
+                if len({(cat, item_id) for cat, item_id, _, _ in hits}) < 2:
+                    continue
+                issues.append({
+                    "種類": f"{kind}重複",
+                    "値": key,
+                    "件数": len(hits),
+                    "該当": "、".join(f"{cat} {item_id} ({col}: {value})" for cat, item_id, col, value in hits),
+                })
+        order = {kind: i for i, kind in enumerate(ISSUE_ORDER)}
+        issues.sort(key=lambda i: (order.get(i["種類"], len(order)), i["種類"], i["値"]))
+        return cls(issues, ambiguous)
+
+    def __len__(self):
+        return len(self.issues)
+
+    def counts(self):
+        # {種類: 件数} (表示順)
+        result = {}
+        for issue in self.issues:
+            result[issue["種類"]] = result.get(issue["種類"], 0) + 1
+        return result
+
+    def to_frame(self):
+        return pd.DataFrame(self.issues, columns=["種類", "値", "件数", "該当"])
@@ -0,0 +1,525 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import metrics
+from schema import DATE_COLUMNS, SECRET_COLUMNS, eager_columns, parse_date, sheet_columns
+from storage import SheetNotFound
+
+# --- 設定: キャッシュの有効期限 (秒) と、失敗したシートの再試行間隔 (秒) ---
+CACHE_TTL = 600
+RETRY_DELAYS = [5, 15, 30, 60, 120]
+
+# --- 設定: 詳細画面で開いたレコードを保持する件数 ---
+DETAIL_CACHE_SIZE = 32
+
+# --- 設定: 変更履歴を確認する間隔 (秒) ---
+# 他のセッション・他のサーバー・cli.py の書き込みは、全件を読み直さずにこの間隔で差分だけ取り込む
+CHANGE_POLL_INTERVAL = 5
+
+# --- 設定: 変更履歴を残す日数と、古い変更を整理する間隔 (秒) ---
+# 変更履歴は全件読込 (CACHE_TTL) までのつなぎなので、それより十分長く残せばよい
+CHANGE_LOG_RETENTION_DAYS = 7
+CHANGE_LOG_COMPACT_INTERVAL = 24 * 60 * 60
+
+# --- 設定: 保存時に、他の人の書き込みと競合したまま再試行する回数 ---
+SAVE_ATTEMPTS = 3
+
+# 変更履歴の操作
+CHANGE_FIELDS = "更新"    # 一部の列だけを書き換えた (変更内容は書き換えた列だけ)
+CHANGE_ROW = "上書き"     # 行全体を書き込んだ (変更内容は全列。ない ID なら追加)
+
+# シートごとの読込状況
+#   ok      : 正常に読み込めた
+#   stale   : 今回の読込に失敗したので、前回読み込んだデータを表示中
+#   failed  : 読込に失敗し、表示できるデータがない
+#   missing : シート自体が存在しない (再試行しない)
+STALE_STATES = ("stale", "failed")
+
+
+class ConflictError(Exception):
+    # 編集中に、同じ行の同じ列を他の人が別の値に書き換えていた
+    def __init__(self, cat_name, item_id, conflicts, current):
+        self.cat_name = cat_name
+        self.item_id = item_id
+        # {列名: (開いたときの値, 現在の値, 入力した値)}
+        self.conflicts = conflicts
+        self.current = current
+        super().__init__(f"ID {item_id} の「{'、'.join(conflicts)}」は、編集中に他の人が更新しました")
+
+
+def same_value(col, a, b):
+    # 画面の入力値とシートの値の比較。日付列は書式の違い (2024/1/5 と 2024-01-05) を同じとみなす
+    a = '' if a is None else str(a).strip()
+    b = '' if b is None else str(b).strip()
+    if a == b:
+        return True
+    return col in DATE_COLUMNS and parse_date(a) == parse_date(b)
+
+
+# --- 在庫データのプロセス共有キャッシュ ---
+# シート単位で読み込み結果と状況を保持し、失敗したシートだけをバックグラウンドで再取得する。
+# 読み書きそのものは保存先 (storage.StorageBackend) に任せ、書き込んだ内容はキャッシュに直接反映する。
+# 書き込みは変更履歴にも残し、他のプロセスの書き込みは変更履歴の差分で取り込む。
+class InventoryStore:
+    def __init__(self, storage, category_map, ttl=CACHE_TTL, retry_delays=RETRY_DELAYS,
+                 poll_interval=CHANGE_POLL_INTERVAL):
+        self.storage = storage
+        self._category_map = category_map
+        self.ttl = ttl
+        self.retry_delays = retry_delays
+        self.poll_interval = poll_interval
+        # 変更履歴で自分の書き込みを見分けるための名前 (自分の書き込みはキャッシュに反映済み)
+        self.origin = uuid.uuid4().hex[:8]
+        self._change_seq = None
+        self._polled_at = 0.0
+        self._compacted_at = 0.0
+        self._change_error = ""
+        self._frames = {}
+        self._details = OrderedDict()
+        self._status = {}
+        self._loaded_at = None
+        self._combined = None
+        self._derived = {}
+        self.version = 0
+        self._lock = threading.RLock()
+        self._loaded = threading.Condition(self._lock)
+        # 全件読込・差分確認の通信はロックの外で行う。その間の状態
+        self._loading = False
+        self._polling = False
+        self._load_generation = 0
+        self._writes_during_load = []
+        self._retry_thread = None
+
+    def get_data(self):
+        # 通信はロックの外で1つのスレッドだけが行い、他のセッションはその間も手元のデータを使う
+        # (表示できるデータがまだない初回だけは、読み終わるのを待つ)
+        load = poll = False
+        with self._lock:
+            expired = self._loaded_at is None or time.time() - self._loaded_at > self.ttl
+            if expired and not self._loading:
+                load = self._loading = True
+                self._writes_during_load = []
+            elif expired and not self._status:
+                while self._loading:
+                    self._loaded.wait()
+            elif not expired and not self._polling and time.time() - self._polled_at > self.poll_interval:
+                poll = True
+        metrics.count("data_cache_miss" if load else "data_cache_hit")
+        if load:
+            self._reload_all()
+        elif poll:
+            self.sync_changes()
+        return self._current_frame()
+
+    def _current_frame(self):
+        with self._lock:
+            if self._combined is None:
+                with metrics.span("build_frame"):
+                    self._combined = self._build_frame()
+            return self._combined
+
+    def derived(self, name, build, key=None):
+        # 一覧データから作る索引など。データが変わる (version が進む) か key (日付など) が変わるまでは
+        # 作り直さずに使い回す
+        self.get_data()
+        with self._lock:
+            df = self._current_frame()
+            cached = self._derived.get(name)
+            if cached is not None and cached[0] == (self.version, key):
+                return cached[1]
+            value = build(df)
+            self._derived[name] = ((self.version, key), value)
+            return value
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+            self._details.clear()
+
+    def status(self):
+        with self._lock:
+            return {cat_name: dict(s) for cat_name, s in self._status.items()}
+
+    def stale_categories(self):
+        with self._lock:
+            return [cat_name for cat_name, s in self._status.items() if s["state"] in STALE_STATES]
+
+    def retry_failed(self):
+        # 失敗したシートだけを今すぐ再取得する (全件の再読込はしない)
+        results = {cat_name: self._fetch_sheet(cat_name) for cat_name in self.stale_categories()}
+        with self._lock:
+            for cat_name, result in results.items():
+                self._merge_sheet(cat_name, result)
+
+    def change_log_status(self):
+        with self._lock:
+            return {
+                "seq": self._change_seq,
+                "polled_at": datetime.fromtimestamp(self._polled_at) if self._polled_at else None,
+                "error": self._change_error,
+            }
+
+    # --- 変更履歴による差分の取り込み ---
+    def sync_changes(self):
+        # 前回確認した連番より後の変更だけを読み、キャッシュに反映する。戻り値: 反映した変更の件数
+        # 読むのはロックの外で、反映するときだけロックを取る
+        with self._lock:
+            if self._polling:
+                return 0
+            self._polling = True
+            self._polled_at = time.time()
+            after = self._change_seq
+            generation = self._load_generation
+        try:
+            if after is None:
+                # 全件読込のときに位置を取れなかった。取れるまでは TTL による読み直しに任せる
+                seq = self._read_change_seq()
+                with self._lock:
+                    if generation == self._load_generation and self._change_seq is None:
+                        self._change_seq = seq
+                return 0
+            try:
+                with metrics.span("fetch_changes"):
+                    changes = self.storage.load_changes(after, site="変更履歴")
+            except Exception as e:
+                metrics.count("change_log_error")
+                self._change_error = str(e)
+                return 0
+            self._change_error = ""
+            with self._lock:
+                if generation != self._load_generation or self._loading:
+                    # 読んでいる間に全件読込が始まった (済んだ)。この差分はそちらに含まれるので捨てる
+                    return 0
+                return self._apply_changes(changes)
+        finally:
+            with self._lock:
+                self._polling = False
+
+    def _apply_changes(self, changes):
+        with self._lock:
+            fields_by_cat = {}
+            rows_by_cat = {}
+            applied = 0
+            for change in changes:
+                self._change_seq = max(self._change_seq, change["連番"])
+                cat_name = change["カテゴリ"]
+                if change["送信元"] == self.origin or cat_name not in self._category_map:
+                    continue
+                item_id = str(change["ID"])
+                fields = fields_by_cat.setdefault(cat_name, {})
+                rows = rows_by_cat.setdefault(cat_name, {})
+                # 同じ ID への変更は古い順に重ねる (行全体の書き込みは、それより前の一部更新を打ち消す)
+                if change["操作"] == CHANGE_ROW and change["変更内容"]:
+                    rows[item_id] = dict(change["変更内容"], ID=item_id)
+                    fields.pop(item_id, None)
+                elif item_id in rows:
+                    rows[item_id].update(change["変更内容"])
+                else:
+                    fields.setdefault(item_id, {}).update(change["変更内容"])
+                applied += 1
+            for cat_name, fields in fields_by_cat.items():
+                if fields:
+                    self.patch_rows(cat_name, fields)
+            for cat_name, rows in rows_by_cat.items():
+                if rows:
+                    self._apply_records(cat_name, list(rows.values()))
+            if applied:
+                metrics.count("changes_applied", applied)
+            return applied
+
+    def _reload_all(self):
+        # 全シートの読込。読み込む前に変更履歴の位置を控える (読込中の他の書き込みは次の差分で取り込み直す)
+        results = {}
+        seq = None
+        try:
+            seq = self._read_change_seq()
+            results = {cat_name: self._fetch_sheet(cat_name) for cat_name in self._category_map}
+            self._compact_change_log()
+        finally:
+            with self._lock:
+                for cat_name, result in results.items():
+                    self._merge_sheet(cat_name, result)
+                # 読込中に自分が書き込んだ内容は、読み込んだデータに含まれていないことがあるので当て直す
+                for apply, cat_name, payload in self._writes_during_load:
+                    apply(cat_name, payload)
+                self._writes_during_load = []
+                self._change_seq = seq
+                self._polled_at = time.time()
+                self._loaded_at = time.time()
+                self._load_generation += 1
+                self._loading = False
+                self._loaded.notify_all()
+        self._start_retry_thread()
+
+    def _read_change_seq(self):
+        try:
+            seq = self.storage.last_change_seq(site="変更履歴")
+        except Exception as e:
+            metrics.count("change_log_error")
+            self._change_error = str(e)
+            return None
+        self._change_error = ""
+        return seq
+
+    def _compact_change_log(self):
+        # 古い変更を整理する (1日に1回まで)。失敗しても次の機会にやり直す
+        if time.time() - self._compacted_at < CHANGE_LOG_COMPACT_INTERVAL:
+            return
+        self._compacted_at = time.time()
+        before = (datetime.now() - timedelta(days=CHANGE_LOG_RETENTION_DAYS)).isoformat(timespec="seconds")
+        try:
+            self.storage.compact_changes(before, site="変更履歴")
+        except Exception as e:
+            metrics.count("change_log_error")
+            self._change_error = str(e)
+
+    def _log_changes(self, cat_name, operation, records):
+        # 書き込み自体は済んでいるので、履歴に残せなくても失敗にはしない (他のプロセスは TTL で追いつく)。
+        # パスワード類は値を残さない。受け取った側は詳細キャッシュを捨てるので、次に開くときに読み直される
+        now = datetime.now().isoformat(timespec="seconds")
+        changes = [{
+            "日時": now, "カテゴリ": cat_name, "ID": str(item_id), "操作": operation,
+            "変更内容": {c: v for c, v in fields.items() if c not in SECRET_COLUMNS}, "送信元": self.origin,
+        } for item_id, fields in records.items()]
+        try:
+            self.storage.append_changes(changes, site="変更履歴")
+        except Exception as e:
+            metrics.count("change_log_error")
+            with self._lock:
+                self._change_error = str(e)
+
+    def get_record(self, cat_name, item_id):
+        # 一覧には一部の列しか持っていないので、詳細画面を開いたときに1行分を取得する
+        key = (cat_name, str(item_id))
+        with self._lock:
+            if key in self._details:
+                metrics.count("detail_cache_hit")
+                self._details.move_to_end(key)
+                return dict(self._details[key])
+        metrics.count("detail_cache_miss")
+        with metrics.span("fetch_record"):
+            record = self.storage.load_record(cat_name, item_id)
+        if record is None:
+            raise KeyError(f"ID '{item_id}' が {cat_name} シートに見つかりません")
+        with self._lock:
+            self._details[key] = record
+            while len(self._details) > DETAIL_CACHE_SIZE:
+                self._details.popitem(last=False)
+        return dict(record)
+
+    # --- 書き込み (保存先へ書いたあと、シートを読み直さずにキャッシュへ反映する) ---
+    def write_fields(self, cat_name, updates, site):
+        # updates: {ID: {列名: 値}}
+        with metrics.span("write"):
+            written, missing = self.storage.update_fields(cat_name, updates, site)
+        done = {item_id: updates[item_id] for item_id in written}
+        self._apply_own(self.patch_rows, cat_name, done)
+        self._log_changes(cat_name, CHANGE_FIELDS, done)
+        return written, missing
+
+    def save_record(self, cat_name, item_id, base, edited, site, force=False):
+        # 詳細画面の保存。base: 開いたときの行、edited: 画面の入力値 (どちらも {列名: 値})
+        # 開いたときの行を版として、変えた列だけを「今もその値なら」という条件付きで書き込む。
+        # 他の人が別の列を変えていればそのまま残し、同じ列を別の値に変えていれば ConflictError。
+        # force=True なら、変えた列を自分の値で上書きする。
+        # 戻り値: {"written": [書き込んだ列], "merged": [他の人の変更を残した列]}
+        changes = {c: v for c, v in edited.items() if c != '更新日' and not same_value(c, base.get(c), v)}
+        if not changes:
+            return {"written": [], "merged": []}
+        expected_base = base
+        for attempt in range(SAVE_ATTEMPTS):
+            expected = {} if force else {c: str(expected_base.get(c, '')) for c in changes}
+            fields = dict(changes)
+            if '更新日' in edited:
+                fields['更新日'] = edited['更新日']
+            with metrics.span("write"):
+                ok, current = self.storage.update_if_unchanged(cat_name, item_id, expected, fields, site)
+            if current is None:
+                raise KeyError(f"ID '{item_id}' が {cat_name} シートに見つかりません")
+            if ok:
+                break
+            # 確認のために読んだ最新の行と、列ごとに突き合わせる
+            conflicts = {c: (base.get(c, ''), current.get(c, ''), v) for c, v in changes.items()
+                         if not same_value(c, current.get(c), v)
+                         and (not same_value(c, base.get(c), current.get(c)) or attempt == SAVE_ATTEMPTS - 1)}
+            if conflicts:
+                self._remember(cat_name, current)
+                raise ConflictError(cat_name, item_id, conflicts, current)
+            # 他の人が同じ値にしていた列は書かず、残りは最新の値を前提に書き直す
+            changes = {c: v for c, v in changes.items() if not same_value(c, current.get(c), v)}
+            expected_base = current
+            if not changes:
+                break
+        merged = [c for c in current if c not in fields and not same_value(c, base.get(c), current.get(c))]
+        self._remember(cat_name, current)
+        if changes:
+            self._log_changes(cat_name, CHANGE_FIELDS, {item_id: fields})
+        return {"written": list(changes), "merged": merged}
+
+    def _remember(self, cat_name, record):
+        # 書き込み・確認で読んだ最新の行を、一覧キャッシュと詳細キャッシュに入れる (次に開くときは読まない)
+        record = dict(record, カテゴリ=cat_name)
+        self._apply_own(self.patch_rows, cat_name, {record['ID']: record})
+        with self._lock:
+            self._details[(cat_name, str(record['ID']))] = record
+            while len(self._details) > DETAIL_CACHE_SIZE:
+                self._details.popitem(last=False)
+
+    def upsert_rows(self, cat_name, rows, site):
+        # rows: シートの列順に並んだ行のリスト。既存IDは上書き、新しいIDは追加
+        result = self.storage.upsert_batch(cat_name, rows, site)
+        self._apply_rows(cat_name, rows)
+        return result
+
+    def append_rows(self, cat_name, rows, site):
+        count = self.storage.append_batch(cat_name, rows, site)
+        self._apply_rows(cat_name, rows)
+        return count
+
+    def fetch_full_sheet(self, cat_name, site):
+        # エクスポート用: 全列をそのまま取得する (一覧キャッシュには入れない)
+        return self.storage.load_full_sheet(cat_name, site)
+
+    def patch_rows(self, cat_name, updates):
+        # updates: {ID: {列名: 値}} を一覧キャッシュと詳細キャッシュに反映する
+        with self._lock:
+            frame = self._frames.get(cat_name)
+            if frame is not None and not frame.empty and updates:
+                frame = frame.copy()
+                positions = {}
+                for pos, item_id in enumerate(frame['ID'].astype(str)):
+                    positions.setdefault(item_id, []).append(pos)
+                for item_id, fields in updates.items():
+                    for col, value in fields.items():
+                        if col in frame.columns:
+                            for pos in positions.get(str(item_id), []):
+                                frame.iat[pos, frame.columns.get_loc(col)] = value
+                self._frames[cat_name] = frame
+            for item_id in updates:
+                self._details.pop((cat_name, str(item_id)), None)
+            self._combined = None
+            self.version += 1
+
+    def _apply_rows(self, cat_name, rows):
+        # 行全体の書き込みをキャッシュに反映し、変更履歴に残す
+        columns = sheet_columns(cat_name)
+        records = [dict(zip(columns, [str(v) for v in row])) for row in rows]
+        self._apply_own(self._apply_records, cat_name, records)
+        self._log_changes(cat_name, CHANGE_ROW, {r['ID']: r for r in records})
+
+    def _apply_own(self, apply, cat_name, payload):
+        # 自分の書き込みをキャッシュに反映する。全件読込の最中なら、読込が終わったあとにもう一度当てる
+        with self._lock:
+            apply(cat_name, payload)
+            if self._loading:
+                self._writes_during_load.append((apply, cat_name, payload))
+
+    def _apply_records(self, cat_name, records):
+        # records: [{列名: 値}]。既にキャッシュにあるIDは差し替え、ないIDは末尾に足す
+        with self._lock:
+            frame = self._frames.get(cat_name)
+            known = set(frame['ID'].astype(str)) if frame is not None and not frame.empty else set()
+            self.patch_rows(cat_name, {r['ID']: r for r in records if r['ID'] in known})
+            new_records = [r for r in records if r['ID'] not in known]
+            if new_records and frame is not None:
+                frame = self._frames[cat_name]
+                added = pd.DataFrame(new_records).reindex(columns=frame.columns, fill_value='')
+                added['カテゴリ'] = cat_name
+                self._frames[cat_name] = pd.concat([frame, added], ignore_index=True)
+                self._combined = None
+                self.version += 1
+
+    # --- 読込 ---
+    def _load_sheet(self, cat_name):
+        # 一覧・検索・アラートに必要な列だけを取得する
+        with metrics.span("fetch_sheet"):
+            return self.storage.load_sheet(cat_name, eager_columns(cat_name))
+
+    def _fetch_sheet(self, cat_name):
+        # ロックの外で呼ぶ。戻り値: ("ok", DataFrame) / ("missing", None) / ("error", メッセージ)
+        try:
+            return "ok", self._load_sheet(cat_name)
+        except SheetNotFound:
+            return "missing", None
+        except Exception as e:
+            return "error", str(e)
+
+    def _merge_sheet(self, cat_name, result):
+        # ロックを取ってから呼ぶ
+        outcome, value = result
+        prev = self._status.get(cat_name, {})
+        if outcome == "ok":
+            self._store_sheet(cat_name, value)
+        elif outcome == "missing":
+            self._frames.pop(cat_name, None)
+            self._set_status(cat_name, "missing")
+        else:
+            state = "stale" if cat_name in self._frames else "failed"
+            self._set_status(cat_name, state, error=value, attempts=prev.get("attempts", 0) + 1)
+        self._combined = None
+        self.version += 1
+
+    def _store_sheet(self, cat_name, frame):
+        self._frames[cat_name] = frame
+        for key in [k for k in self._details if k[0] == cat_name]:
+            del self._details[key]
+        self._set_status(cat_name, "ok", rows=len(frame))
+
+    def _set_status(self, cat_name, state, error="", rows=None, attempts=0):
+        prev = self._status.get(cat_name, {})
+        self._status[cat_name] = {
+            "state": state,
+            "error": error,
+            "rows": rows if rows is not None else prev.get("rows", 0),
+            "attempts": attempts,
+            "checked_at": datetime.now(),
+        }
+
+    def _build_frame(self):
+        frames = [self._frames[c] for c in self._category_map if c in self._frames and not self._frames[c].empty]
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        df['sort_order'] = df['ステータス'].apply(lambda x: 1 if x == '廃棄' else 0)
+        # ID は文字列で持つので、数字だけの ID は数値として並べる (10 が 9 より前に来ないように)。
+        # 数字以外を含む ID はその後ろに文字列順で並べる
+        id_number = pd.to_numeric(df['ID'].astype(str).str.strip(), errors='coerce')
+        order = df.assign(_id_number=id_number).sort_values(
+            by=['sort_order', '_id_number', 'ID'], ascending=[True, True, True], na_position='last', kind='stable'
+        ).index
+        return df.loc[order]
+
+    # --- バックグラウンド再試行 ---
+    def _start_retry_thread(self):
+        if not self.stale_categories():
+            return
+        if self._retry_thread is not None and self._retry_thread.is_alive():
+            return
+        self._retry_thread = threading.Thread(target=self._retry_loop, name="inventory-retry", daemon=True)
+        self._retry_thread.start()
+
+    def _retry_loop(self):
+        for delay in self.retry_delays:
+            time.sleep(delay)
+            targets = self.stale_categories()
+            if not targets:
+                return
+            for cat_name in targets:
+                # 通信はロックの外で行い、成功したシートだけを差し込む
+                try:
+                    frame = self._load_sheet(cat_name)
+                except Exception:
+                    with self._lock:
+                        s = self._status.get(cat_name)
+                        if s and s["state"] in STALE_STATES:
+                            s["attempts"] += 1
+                    continue
+                with self._lock:
+                    self._store_sheet(cat_name, frame)
+                    self._combined = None
+                    self.version += 1
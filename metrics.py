@@ -0,0 +1,154 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+# --- 設定: 画面に残す直近の実行数 ---
+HISTORY_SIZE = 50
+
+logger = logging.getLogger("inventory.metrics")
+
+_local = threading.local()
+_history = deque(maxlen=HISTORY_SIZE)
+_history_lock = threading.Lock()
+_file_lock = threading.Lock()
+
+
+# --- 1回の再実行 (rerun) ぶんの計測値 ---
+#   phases   : 画面の上から順に区切った段階ごとの所要時間 (合計がほぼ全体の時間になる)
+#   spans    : 読込・日付解釈など、段階の中で行われる処理ごとの所要時間と回数
+#   counters : API 呼び出し・キャッシュの当たり外れ・表示した行数などの件数
+# 再実行はスクリプト用のスレッドで動くので、スレッドごとに「いま計測中の実行」を1つ持つ
+class RunMetrics:
+    def __init__(self, session=""):
+        self.session = session
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self.total = None
+        self.phases = {}
+        self.spans = {}
+        self.counters = {}
+        self._phase = None
+        self._phase_start = None
+
+    def phase(self, name):
+        # 直前の段階を締めて、次の段階を始める
+        now = time.perf_counter()
+        if self._phase is not None:
+            self.phases[self._phase] = self.phases.get(self._phase, 0.0) + now - self._phase_start
+        self._phase = name
+        self._phase_start = now
+
+    def add_time(self, name, seconds, calls=1):
+        span = self.spans.setdefault(name, {"seconds": 0.0, "calls": 0})
+        span["seconds"] += seconds
+        span["calls"] += calls
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def finish(self):
+        self.phase(None)
+        self.total = time.perf_counter() - self._start
+        return self
+
+    def to_dict(self):
+        return {
+            "session": self.session,
+            "started_at": self.started_at.isoformat(timespec="milliseconds"),
+            "total": self.total,
+            "phases": self.phases,
+            "spans": self.spans,
+            "counters": self.counters,
+        }
+
+
+def start_run(session=""):
+    _local.run = RunMetrics(session)
+    return _local.run
+
+
+def current_run():
+    return getattr(_local, "run", None)
+
+
+def finish_run(log=False, file_path=None):
+    # 計測を締めて履歴に残し、必要ならログ・ファイルにも1行の JSON として書き出す
+    run = current_run()
+    if run is None:
+        return None
+    _local.run = None
+    run.finish()
+    with _history_lock:
+        _history.append(run)
+    if log or file_path:
+        line = json.dumps(run.to_dict(), ensure_ascii=False)
+        if log:
+            _ensure_handler()
+            logger.info(line)
+        if file_path:
+            with _file_lock, open(file_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    return run
+
+
+def history():
+    with _history_lock:
+        return list(_history)
+
+
+# --- 計測用の部品 (計測中の実行がないスレッドでは何もしない) ---
+def phase(name):
+    run = current_run()
+    if run is not None:
+        run.phase(name)
+
+
+@contextmanager
+def span(name):
+    run = current_run()
+    if run is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        run.add_time(name, time.perf_counter() - start)
+
+
+def timed(name):
+    # 何度も呼ばれる関数 (parse_date など) の合計時間と呼び出し回数を集計するデコレータ
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            run = current_run()
+            if run is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                run.add_time(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def count(name, n=1):
+    run = current_run()
+    if run is not None:
+        run.count(name, n)
+
+
+def _ensure_handler():
+    # Streamlit のログ設定に左右されないよう、初回だけ標準エラー出力への出力先を用意する
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
@@ -0,0 +1,163 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import metrics
+
+# --- 設定: カテゴリとシート名の対応表 ---
+CATEGORY_MAP = {
+    "PC": "PC",
+    "訪問車": "訪問車",
+    "iPad": "iPad",
+    "携帯電話": "携帯電話",
+    "Office365": "Office365",
+    "ウイルスバスター": "ウイルスバスター",
+    "その他": "その他"
+}
+
+# --- 設定: 変更履歴 (他のセッション・他のサーバーへ変更を伝えるための追記専用シート) ---
+# 連番はシート上の行位置 (見出しの次の行が 1)。SQLite では同名のテーブルに連番列を持つ
+CHANGE_LOG_SHEET = "変更履歴"
+CHANGE_LOG_COLUMNS = ["日時", "カテゴリ", "ID", "操作", "変更内容", "送信元"]
+
+# 変更履歴に値を残さない列 (変わったことだけを記録し、値は受け取った側が行ごと読み直す)
+SECRET_COLUMNS = {"パスワード", "チームビューワPW"}
+
+# --- 設定: ステータスの選択肢 ---
+STATUS_OPTIONS = ["利用可能", "貸出中", "故障/修理中", "廃棄"]
+
+# --- 設定: 全シート共通の基本列 (A列〜F列) ---
+BASE_COLUMNS = ["ID", "カテゴリ", "品名", "利用者", "ステータス", "更新日"]
+
+# --- 設定: 各シートの列定義 (基本列の後ろに続く) ---
+COLUMNS_DEF = {
+    "PC": [
+        "購入日", "OS", "プロダクトID(シリアルNo)", "ラベル",
+        "ORCA宇都宮", "ORCA鹿沼", "ORCA益子",
+        "officeのアカウント割振", "ウィルスバスターシリアルNo", "ウィルスバスター期限", "ウィルスバスター識別ネーム",
+        "チームビューワID", "チームビューワPW", "備考"
+    ],
+    "訪問車": [
+        "登録番号", "洗車グループ", "駐車場",
+        "タイヤサイズ", "スタッドレス有無", "タイヤ保管場所",
+        "リース開始日", "リース満了日", "車検満了日",
+        "駐禁除外指定満了日", "通行禁止許可満了日", "使用部署", "備考"
+    ],
+    "iPad": [
+        "購入日", "ラベル", "AppleID", "シリアルNo",
+        "ストレージ", "製造番号IMEI", "端末番号",
+        "使用部署", "キャリア", "備考"
+    ],
+    "携帯電話": [
+        "購入日", "電話番号", "SIM", "メーカー",
+        "製造番号", "使用部署", "保管場所", "キャリア", "備考"
+    ],
+    "Office365": [
+        "アカウントID", "パスワード", "利用者1", "利用者2", "利用者3", "利用者4", "利用者5", "備考"
+    ],
+    "ウイルスバスター": [
+        "利用者1", "利用者2", "利用者3", "期限", "備考"
+    ],
+    "その他": [
+        "備考"
+    ]
+}
+
+# --- 設定: 一覧読込で先に取得する列 (基本列以外) ---
+# 一覧に表示する列
+LIST_COLUMNS = {
+    "PC": ["購入日", "OS"],
+    "訪問車": ["登録番号", "使用部署", "洗車グループ"],
+    "iPad": ["ラベル", "使用部署", "購入日"],
+    "携帯電話": ["購入日", "電話番号", "使用部署"],
+    "Office365": ["利用者1", "利用者2", "利用者3", "利用者4", "利用者5"],
+    "ウイルスバスター": ["利用者1", "利用者2", "利用者3", "期限"],
+    "その他": ["備考"],
+}
+
+# フリーワード検索の対象にする列 (一覧読込で先に取得する)
+# パスワード類は読み込まず、検索の対象にもしない。有無の欄 (スタッドレス有無) も対象外
+SEARCH_COLUMNS = {
+    "PC": ["プロダクトID(シリアルNo)", "ラベル", "ORCA宇都宮", "ORCA鹿沼", "ORCA益子", "officeのアカウント割振",
+           "ウィルスバスターシリアルNo", "ウィルスバスター識別ネーム", "チームビューワID", "備考"],
+    "訪問車": ["駐車場", "タイヤサイズ", "タイヤ保管場所", "リース開始日", "備考"],
+    "iPad": ["AppleID", "シリアルNo", "ストレージ", "製造番号IMEI", "端末番号", "キャリア", "備考"],
+    "携帯電話": ["SIM", "メーカー", "製造番号", "保管場所", "キャリア", "備考"],
+    "Office365": ["アカウントID", "備考"],
+    "ウイルスバスター": ["備考"],
+    "その他": ["備考"],
+}
+
+# 期日アラートの判定に使う列
+ALERT_COLUMNS = {
+    "訪問車": ["リース満了日", "車検満了日", "駐禁除外指定満了日", "通行禁止許可満了日"],
+    "iPad": ["購入日"],
+}
+
+# 期限・満了日の列 (期限カレンダーに載せる)
+EXPIRY_COLUMNS = {
+    "PC": ["ウィルスバスター期限"],
+    "訪問車": ["リース満了日", "車検満了日", "駐禁除外指定満了日", "通行禁止許可満了日"],
+    "ウイルスバスター": ["期限"],
+}
+
+# 購入日から何年で買い替え時期とみなすか (期限カレンダーと期日アラートに使う)
+REPLACEMENT_YEARS = {
+    "iPad": 5,
+}
+
+# 機器ごとに一意になるはずの列と、その種類 (データ整合性チェックで、カテゴリをまたいで重複を探す)
+IDENTIFIER_COLUMNS = {
+    "PC": {"プロダクトID(シリアルNo)": "シリアル番号"},
+    "iPad": {"シリアルNo": "シリアル番号", "製造番号IMEI": "IMEI・製造番号"},
+    "携帯電話": {"製造番号": "IMEI・製造番号", "電話番号": "電話番号"},
+}
+
+# 日付として扱う列 (Parquet/XLSX の型付けに使う)
+DATE_COLUMNS = {
+    "更新日", "購入日", "ウィルスバスター期限", "リース開始日", "リース満了日", "車検満了日",
+    "駐禁除外指定満了日", "通行禁止許可満了日", "期限",
+}
+
+# 一括編集で変更できる列
+BULK_EDIT_COLUMNS = ["ステータス", "利用者", "使用部署"]
+
+
+def sheet_columns(cat):
+    return BASE_COLUMNS + COLUMNS_DEF.get(cat, [])
+
+
+def eager_columns(cat):
+    # シート上の並び順を保ったまま、一覧・検索・アラート・期限カレンダー・整合性チェックに必要な列だけを返す
+    wanted = set(LIST_COLUMNS.get(cat, []) + SEARCH_COLUMNS.get(cat, []) + ALERT_COLUMNS.get(cat, [])
+                 + EXPIRY_COLUMNS.get(cat, []) + list(IDENTIFIER_COLUMNS.get(cat, {})))
+    if cat in REPLACEMENT_YEARS:
+        wanted.add("購入日")
+    return BASE_COLUMNS + [c for c in COLUMNS_DEF.get(cat, []) if c in wanted]
+
+
+# --- 【最強版】日付パース関数 ---
+@metrics.timed("parse_date")
+def parse_date(date_val):
+    if date_val is None or date_val == "":
+        return None
+    
+    if isinstance(date_val, (int, float)):
+        try:
+            return datetime(1899, 12, 30) + timedelta(days=date_val)
+        except:
+            pass
+
+    date_str = str(date_val).strip()
+    if not date_str:
+        return None
+
+    date_str = date_str.replace('.', '/').replace('-', '/').replace('年', '/').replace('月', '/').replace('日', '')
+    
+    try:
+        ts = pd.to_datetime(date_str, errors='coerce')
+        if pd.isna(ts):
+            return None
+        return ts.to_pydatetime()
+    except:
+        return None
@@ -0,0 +1,6 @@
+# --- フリーワード検索 ---
+# 読み込んだ全列 (一覧・検索・アラート用の列) のどこかに、大文字小文字を区別せず含まれる行を返す
+def filter_by_query(df, query):
+    if df.empty or not query:
+        return df
+    return df[df.astype(str).apply(lambda row: row.str.contains(query, case=False).any(), axis=1)]
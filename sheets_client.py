@@ -0,0 +1,207 @@
+import random
+import threading
+import time
+
+import gspread
+import requests
+from urllib3.exceptions import NewConnectionError
+
+import metrics
+
+# --- 設定: Google Sheets API のクォータ (サービスアカウント1つあたり / 1分) ---
+READ_QUOTA_PER_MINUTE = 60
+WRITE_QUOTA_PER_MINUTE = 60
+
+# --- 設定: リトライ (指数バックオフ + ジッター) ---
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 32.0
+
+# 書き込みクォータを消費するワークシートのメソッド (それ以外は読み取り扱い)
+WRITE_METHODS = {
+    "update", "update_cell", "update_cells", "batch_update",
+    "append_row", "append_rows", "insert_row", "insert_rows",
+    "delete_rows", "clear", "batch_clear",
+}
+
+# 2回実行すると結果が変わる書き込み (行が二重に追加される・余分に消える)。
+# サーバーに届いていないと確実に分かるエラー (429・接続できなかった) のときだけ再試行する
+NON_IDEMPOTENT_METHODS = {"append_row", "append_rows", "insert_row", "insert_rows", "delete_rows"}
+
+
+# --- トークンバケット方式のレートリミッター ---
+class TokenBucket:
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        # 1分窓での超過を抑えるため、バースト幅はクォータの1/6程度に留める
+        self.capacity = burst or max(1, per_minute // 6)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # トークンを1つ取得するまで待機し、待った秒数を返す
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._blocked_until:
+                    elapsed = now - self._updated
+                    self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return now - start
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    wait = self._blocked_until - now
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        # 429 を受けたら、同じバケットを使う全スレッドをまとめて待たせる
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+def _status_code(error):
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _is_retryable(error, idempotent=True):
+    if not idempotent:
+        return _never_sent(error)
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    return _status_code(error) in RETRY_STATUS_CODES
+
+
+def _never_sent(error):
+    # 要求がサーバーで実行されていないと確実に分かるエラー。
+    # 5xx や応答待ちのタイムアウト・途中での切断は、サーバー側では書き込みが済んでいることがある
+    if _status_code(error) == 429 or isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        return isinstance(getattr(error.args[0], "reason", error.args[0]), NewConnectionError)
+    return False
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+# --- クォータ対応の Sheets クライアント ---
+# すべての API 呼び出しをここに通し、読み取り/書き込みごとのレート制限・
+# 429/5xx のリトライ・呼び出し元 (site) ごとの集計をまとめて行う。
+class SheetsClient:
+    def __init__(self, client, spreadsheet_name,
+                 read_per_minute=READ_QUOTA_PER_MINUTE, write_per_minute=WRITE_QUOTA_PER_MINUTE,
+                 max_retries=MAX_RETRIES, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+        self._client = client
+        self.spreadsheet_name = spreadsheet_name
+        self._buckets = {
+            "read": TokenBucket(read_per_minute),
+            "write": TokenBucket(write_per_minute),
+        }
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._spreadsheet = None
+        self._worksheets = {}
+        self._open_lock = threading.Lock()
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def worksheet(self, sheet_name, site):
+        # open() と worksheet() はそれぞれ API を消費するので、ハンドルはプロセス内で使い回す
+        with self._open_lock:
+            worksheet = self._worksheets.get(sheet_name)
+            if worksheet is None:
+                if self._spreadsheet is None:
+                    self._spreadsheet = self.call(site, "read", self._client.open, self.spreadsheet_name)
+                worksheet = self.call(site, "read", self._spreadsheet.worksheet, sheet_name)
+                self._worksheets[sheet_name] = worksheet
+        return _WorksheetProxy(self, worksheet, site)
+
+    def add_worksheet(self, sheet_name, header, site):
+        # 見出し行だけのシートを追加する (変更履歴シートがまだないときに使う)
+        with self._open_lock:
+            if self._spreadsheet is None:
+                self._spreadsheet = self.call(site, "read", self._client.open, self.spreadsheet_name)
+            worksheet = self.call(site, "write", self._spreadsheet.add_worksheet,
+                                  title=sheet_name, rows=1000, cols=len(header))
+            self.call(site, "write", worksheet.append_row, header)
+            self._worksheets[sheet_name] = worksheet
+        return _WorksheetProxy(self, worksheet, site)
+
+    def call(self, site, kind, func, *args, **kwargs):
+        bucket = self._buckets[kind]
+        idempotent = getattr(func, "__name__", "") not in NON_IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            waited = bucket.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if isinstance(e, gspread.WorksheetNotFound) or not _is_retryable(e, idempotent) or attempt >= self.max_retries:
+                    self._record(site, kind, waited, error=True)
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                if _status_code(e) == 429:
+                    bucket.pause(delay)
+                self._record(site, kind, waited, retry=True)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._record(site, kind, waited)
+            return result
+
+    def _record(self, site, kind, waited, retry=False, error=False):
+        # 実行中の再実行 (rerun) の計測値にも加える
+        metrics.count(f"api_{kind}")
+        if waited:
+            metrics.count("api_wait_ms", int(waited * 1000))
+        if retry:
+            metrics.count("api_retry")
+        with self._stats_lock:
+            s = self._stats.setdefault(site, {
+                "呼び出し元": site, "読み取り": 0, "書き込み": 0,
+                "リトライ": 0, "エラー": 0, "待機秒": 0.0,
+            })
+            s["読み取り" if kind == "read" else "書き込み"] += 1
+            s["待機秒"] += waited
+            if retry:
+                s["リトライ"] += 1
+            if error:
+                s["エラー"] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            return [dict(s, 待機秒=round(s["待機秒"], 2)) for s in self._stats.values()]
+
+
+class _WorksheetProxy:
+    def __init__(self, owner, worksheet, site):
+        self._owner = owner
+        self._worksheet = worksheet
+        self._site = site
+
+    def __getattr__(self, name):
+        attr = getattr(self._worksheet, name)
+        if not callable(attr):
+            return attr
+        kind = "write" if name in WRITE_METHODS else "read"
+
+        def call(*args, **kwargs):
+            return self._owner.call(self._site, kind, attr, *args, **kwargs)
+        return call
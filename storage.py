@@ -0,0 +1,536 @@
+import json
+import re
+import sqlite3
+import threading
+
+import gspread
+import pandas as pd
+
+from schema import CATEGORY_MAP, CHANGE_LOG_COLUMNS, CHANGE_LOG_SHEET, sheet_columns
+
+# 変更履歴シートの見出し行で、列名の後ろに置く欄 (見出し・値の順)
+#   整理済みの連番 : どこまで古い変更を整理したか
+#   最新の連番     : 追記するたびに書き込む。同時に追記すると小さい値で上書きされることはあるが、実際より大きくはならない
+CHANGE_LOG_COMPACTED_LABEL = "整理済みの連番"
+CHANGE_LOG_LATEST_LABEL = "最新の連番"
+
+
+class SheetNotFound(Exception):
+    pass
+
+
+class DuplicateIdError(Exception):
+    def __init__(self, ids):
+        self.ids = list(ids)
+        super().__init__(f"ID {', '.join(self.ids)} は既に登録されています")
+
+
+class AmbiguousIdError(Exception):
+    # 同じシートに同じIDの行が複数あり、どの行に書き込むか決められない
+    def __init__(self, cat_name, ids):
+        self.cat_name = cat_name
+        self.ids = list(ids)
+        super().__init__(
+            f"{cat_name} に ID {', '.join(self.ids)} の行が複数あるため書き込みませんでした"
+            "（データ整合性チェックで重複を解消してください）"
+        )
+
+
+# --- 保存先の共通インターフェース ---
+# すべてカテゴリ単位で動く。rows はシートの列順 (基本列 + カテゴリ固有列) に並んだ値のリスト。
+class StorageBackend:
+    def load_sheet(self, cat_name, columns, site="一覧読込"):
+        # 指定列だけの DataFrame を返す (カテゴリ列付き)
+        raise NotImplementedError
+
+    def load_record(self, cat_name, item_id, site="詳細取得"):
+        # 1行分の全項目を dict で返す。見つからなければ None
+        raise NotImplementedError
+
+    def load_full_sheet(self, cat_name, site):
+        raise NotImplementedError
+
+    def upsert_batch(self, cat_name, rows, site):
+        # 既存IDは行ごと上書き、新しいIDは末尾に追加。戻り値: {"updated": n, "appended": m}
+        # 複数行あるIDが含まれていたら、何も書き込まずに AmbiguousIdError
+        raise NotImplementedError
+
+    def append_batch(self, cat_name, rows, site):
+        # 新規追加のみ。既に登録されているIDが含まれていたら DuplicateIdError
+        raise NotImplementedError
+
+    def update_fields(self, cat_name, updates, site):
+        # updates: {ID: {列名: 値}}。戻り値: (更新したIDのリスト, 見つからなかったIDのリスト)
+        # 複数行あるIDが含まれていたら、何も書き込まずに AmbiguousIdError
+        raise NotImplementedError
+
+    def update_if_unchanged(self, cat_name, item_id, expected, fields, site):
+        # 1行だけの条件付き書き込み。expected ({列名: 値}) の列が今もその値のときだけ fields を書き込む。
+        # 戻り値: (書き込んだか, 書き込み後 (書き込まなかったときは現在) の行 {列名: 値})。IDがなければ (False, None)
+        raise NotImplementedError
+
+    # --- 変更履歴 ---
+    # change: {"日時", "カテゴリ", "ID", "操作", "変更内容" ({列名: 値}), "送信元"}
+    def append_changes(self, changes, site):
+        raise NotImplementedError
+
+    def load_changes(self, after, site):
+        # 連番が after より後の変更を古い順に返す (各 change に "連番" 付き)
+        raise NotImplementedError
+
+    def last_change_seq(self, site):
+        # いちばん新しい変更の連番 (まだ変更がなければ 0)
+        raise NotImplementedError
+
+    def compact_changes(self, before, site):
+        # 日時が before (ISO 形式の文字列) より古い変更の中身を消す。戻り値: 整理した件数
+        raise NotImplementedError
+
+    def api_stats(self):
+        return []
+
+
+# --- Google スプレッドシート ---
+class SheetsBackend(StorageBackend):
+    def __init__(self, sheets, category_map=CATEGORY_MAP):
+        self._sheets = sheets
+        self._category_map = category_map
+        self._headers = {}
+        self._row_numbers = {}
+        self._lock = threading.Lock()
+
+    def _worksheet(self, cat_name, site):
+        try:
+            return self._sheets.worksheet(self._category_map[cat_name], site=site)
+        except gspread.WorksheetNotFound as e:
+            raise SheetNotFound(cat_name) from e
+
+    def _change_sheet(self, site, create=False):
+        # 変更履歴シート。書き込むときだけ、なければ作る (読むときにないのは「まだ変更がない」)
+        try:
+            return self._sheets.worksheet(CHANGE_LOG_SHEET, site=site)
+        except gspread.WorksheetNotFound:
+            if not create:
+                return None
+            header = CHANGE_LOG_COLUMNS + [CHANGE_LOG_COMPACTED_LABEL, "0", CHANGE_LOG_LATEST_LABEL, "0"]
+            return self._sheets.add_worksheet(CHANGE_LOG_SHEET, header, site=site)
+
+    def _row_map(self, worksheet):
+        # ID列を1回読んで、ID → 行番号 (2行目〜) の対応と、複数行に出てくるIDを返す
+        row_of = {}
+        repeated = set()
+        for i, value in enumerate(worksheet.col_values(1)[1:]):
+            if str(value) in row_of:
+                repeated.add(str(value))
+            else:
+                row_of[str(value)] = i + 2
+        return row_of, repeated
+
+    def load_sheet(self, cat_name, columns, site="一覧読込"):
+        # 必要な列だけを1回の batch_get で取得する
+        worksheet = self._worksheet(cat_name, site)
+        expected = sheet_columns(cat_name)
+        positions = {col: expected.index(col) for col in columns if col in expected}
+        header, values = _fetch_columns(worksheet, positions)
+        if any(positions[col] >= len(header) or header[positions[col]] != col for col in positions):
+            # シートの列順が定義と違う場合は、実際の見出しから位置を取り直す
+            actual = {}
+            for i, col in enumerate(header):
+                actual.setdefault(col, i)
+            positions = {col: actual[col] for col in columns if col in actual}
+            header, values = _fetch_columns(worksheet, positions)
+        n_rows = max((len(v) for v in values.values()), default=0)
+        frame = pd.DataFrame({col: values.get(col, []) + [''] * (n_rows - len(values.get(col, []))) for col in columns})
+        frame['カテゴリ'] = cat_name
+        row_numbers = {}
+        for i, item_id in enumerate(frame['ID'] if n_rows else []):
+            # 同じIDが複数行あるときは行番号を持たない (使うときに ID 列から探し直す)
+            row_numbers[str(item_id)] = None if str(item_id) in row_numbers else i + 2
+        with self._lock:
+            self._headers[cat_name] = header
+            self._row_numbers[cat_name] = row_numbers
+        return frame
+
+    def load_record(self, cat_name, item_id, site="詳細取得"):
+        # 一覧読込時の行番号で1行だけ読む。読込後に行の追加・削除があった場合は ID で探し直す
+        with self._lock:
+            header = self._headers.get(cat_name) or sheet_columns(cat_name)
+            row_num = self._row_numbers.get(cat_name, {}).get(str(item_id))
+        worksheet = self._worksheet(cat_name, site)
+        values = worksheet.row_values(row_num, value_render_option='FORMATTED_VALUE') if row_num else []
+        if not values or str(values[0]) != str(item_id):
+            cell = worksheet.find(str(item_id), in_column=1)
+            if cell is None:
+                return None
+            values = worksheet.row_values(cell.row, value_render_option='FORMATTED_VALUE')
+        record = {col: values[i] if i < len(values) else '' for i, col in enumerate(header) if col}
+        record['カテゴリ'] = cat_name
+        return record
+
+    def load_full_sheet(self, cat_name, site):
+        # 数値への自動変換をすると電話番号などの先頭の0が消えるので、表示どおりの文字列で受け取る
+        worksheet = self._worksheet(cat_name, site)
+        records = worksheet.get_all_records(value_render_option='FORMATTED_VALUE', numericise_ignore=['all'])
+        return pd.DataFrame(records)
+
+    def upsert_batch(self, cat_name, rows, site):
+        # ID列の読込1回 + 更新1回 (batch_update) + 追加1回 (append_rows)
+        worksheet = self._worksheet(cat_name, site)
+        row_of, repeated = self._row_map(worksheet)
+        _check_unique(cat_name, [row[0] for row in rows], repeated)
+        updates = []
+        appends = []
+        for row in rows:
+            r = row_of.get(str(row[0]))
+            if r is None:
+                appends.append(row)
+            else:
+                last = _column_letter(len(row) - 1)
+                updates.append({'range': f"A{r}:{last}{r}", 'values': [row]})
+        if updates:
+            worksheet.batch_update(updates)
+        if appends:
+            worksheet.append_rows(appends)
+        return {"updated": len(updates), "appended": len(appends)}
+
+    def append_batch(self, cat_name, rows, site):
+        worksheet = self._worksheet(cat_name, site)
+        row_of, _ = self._row_map(worksheet)
+        duplicated = [str(row[0]) for row in rows if str(row[0]) in row_of]
+        if duplicated:
+            raise DuplicateIdError(duplicated)
+        if rows:
+            worksheet.append_rows(rows)
+        return len(rows)
+
+    def update_fields(self, cat_name, updates, site):
+        # 変更したセルだけを1回の batch_update でまとめて書き込む
+        worksheet = self._worksheet(cat_name, site)
+        row_of, repeated = self._row_map(worksheet)
+        _check_unique(cat_name, updates, repeated)
+        with self._lock:
+            header = self._headers.get(cat_name) or sheet_columns(cat_name)
+        data = []
+        written = []
+        missing = []
+        for item_id, fields in updates.items():
+            r = row_of.get(str(item_id))
+            if r is None:
+                missing.append(item_id)
+                continue
+            for col, value in fields.items():
+                if col in header:
+                    data.append({'range': f"{_column_letter(header.index(col))}{r}", 'values': [[value]]})
+            written.append(item_id)
+        if data:
+            worksheet.batch_update(data)
+        return written, missing
+
+    def update_if_unchanged(self, cat_name, item_id, expected, fields, site):
+        # 一覧読込時の行番号の1行だけを読んで確かめ、変わっていなければ変更したセルだけを書き込む
+        # (ID列全体は読まない)。この1回の読み込みが、行の位置と内容の両方の確認になるので省かない。
+        # Sheets に条件付き書き込みはないので、確認から書き込みまでの短い間は守れない
+        worksheet = self._worksheet(cat_name, site)
+        with self._lock:
+            header = self._headers.get(cat_name) or sheet_columns(cat_name)
+            row_num = self._row_numbers.get(cat_name, {}).get(str(item_id))
+        values = worksheet.row_values(row_num, value_render_option='FORMATTED_VALUE') if row_num else []
+        if not values or str(values[0]) != str(item_id):
+            # 読込後に行の追加・削除があった (または読込後に追加した行)。ID列から探し直す
+            row_of, repeated = self._row_map(worksheet)
+            _check_unique(cat_name, [item_id], repeated)
+            row_num = row_of.get(str(item_id))
+            if row_num is None:
+                return False, None
+            values = worksheet.row_values(row_num, value_render_option='FORMATTED_VALUE')
+            with self._lock:
+                self._row_numbers.setdefault(cat_name, {})[str(item_id)] = row_num
+        current = {col: values[i] if i < len(values) else '' for i, col in enumerate(header) if col}
+        if any(str(current.get(col, '')) != str(value) for col, value in expected.items()):
+            return False, current
+        data = [{'range': f"{_column_letter(header.index(col))}{row_num}", 'values': [[value]]}
+                for col, value in fields.items() if col in header]
+        if data:
+            worksheet.batch_update(data)
+        current.update({col: str(value) for col, value in fields.items() if col in header})
+        return True, current
+
+    def append_changes(self, changes, site):
+        if not changes:
+            return
+        worksheet = self._change_sheet(site, create=True)
+        response = worksheet.append_rows([_encode_change(c) for c in changes])
+        # 追記した範囲の最終行から、最新の連番を見出し行に書いておく (読む側が全行を数えずに済む)
+        m = re.search(r"(\d+)$", str((response or {}).get("updates", {}).get("updatedRange", "")))
+        if m:
+            mark = _column_letter(len(CHANGE_LOG_COLUMNS) + 3) + "1"
+            worksheet.batch_update([{'range': mark, 'values': [[str(int(m.group(1)) - 1)]]}])
+
+    def load_changes(self, after, site):
+        # 最後に読んだ行から末尾までを1回で読む。最後に読んだ行 (after=0 なら見出し) を含めて頼むのは、
+        # 範囲の先頭がシートの行数を超えて API がエラーにならないようにするため
+        worksheet = self._change_sheet(site)
+        if worksheet is None:
+            return []
+        last = _column_letter(len(CHANGE_LOG_COLUMNS) - 1)
+        rows = worksheet.get(f"A{after + 1}:{last}")[1:]
+        return [_decode_change(after + 1 + i, row) for i, row in enumerate(rows) if row]
+
+    def last_change_seq(self, site):
+        # 見出し行の「最新の連番」1セルだけを読む。実際より小さいことはあるが、その分は次の差分で読み直すだけ
+        worksheet = self._change_sheet(site)
+        if worksheet is None:
+            return 0
+        return _int_cell(worksheet.get(_column_letter(len(CHANGE_LOG_COLUMNS) + 3) + "1"))
+
+    def compact_changes(self, before, site):
+        # 行を消すと連番 (行位置) がずれるので、古い変更は「変更内容」だけを空にする。
+        # どこまで整理したかを見出し行に持ち、前回の続きの日時だけを読む
+        worksheet = self._change_sheet(site)
+        if worksheet is None:
+            return 0
+        mark = _column_letter(len(CHANGE_LOG_COLUMNS) + 1) + "1"
+        compacted = _int_cell(worksheet.get(mark))
+        expired = 0
+        for row in worksheet.get(f"A{compacted + 2}:A"):
+            if not row or row[0] >= before:
+                break
+            expired += 1
+        if expired:
+            content = _column_letter(CHANGE_LOG_COLUMNS.index("変更内容"))
+            worksheet.batch_update([
+                {'range': f"{content}{compacted + 2}:{content}{compacted + expired + 1}", 'values': [['']] * expired},
+                {'range': mark, 'values': [[str(compacted + expired)]]},
+            ])
+        return expired
+
+    def api_stats(self):
+        return self._sheets.stats()
+
+
+def _check_unique(cat_name, ids, repeated):
+    # 最初に見つかった行へ黙って書き込むと別の機器のデータを上書きしかねないので、書き込む前に止める
+    ambiguous = [str(item_id) for item_id in ids if str(item_id) in repeated]
+    if ambiguous:
+        raise AmbiguousIdError(cat_name, ambiguous)
+
+
+def _encode_change(change):
+    values = dict(change, 変更内容=json.dumps(change["変更内容"], ensure_ascii=False, separators=(",", ":"), default=str))
+    return [str(values.get(col, "")) for col in CHANGE_LOG_COLUMNS]
+
+
+def _decode_change(seq, row):
+    change = dict(zip(CHANGE_LOG_COLUMNS, list(row) + [''] * (len(CHANGE_LOG_COLUMNS) - len(row))))
+    try:
+        change["変更内容"] = json.loads(change["変更内容"] or "{}")
+    except ValueError:
+        change["変更内容"] = {}
+    change["連番"] = seq
+    return change
+
+
+def _int_cell(values):
+    # get("H1") の結果 ([[値]] か []) を整数にする
+    try:
+        return int(values[0][0])
+    except (IndexError, ValueError):
+        return 0
+
+
+def _column_letter(index):
+    # 0始まりの列番号を A1 表記の列名に変換する
+    return gspread.utils.rowcol_to_a1(1, index + 1)[:-1]
+
+
+def _fetch_columns(worksheet, positions):
+    # 見出し行と、指定列を連続した範囲にまとめたものを1回の API 呼び出しで取得する
+    ordered = sorted(positions.items(), key=lambda item: item[1])
+    runs = []
+    for col, pos in ordered:
+        if runs and pos == runs[-1][-1][1] + 1:
+            runs[-1].append((col, pos))
+        else:
+            runs.append([(col, pos)])
+    ranges = ["1:1"] + [f"{_column_letter(run[0][1])}2:{_column_letter(run[-1][1])}" for run in runs]
+    results = worksheet.batch_get(ranges, value_render_option='FORMATTED_VALUE')
+    header = [str(h) for h in results[0][0]] if results and results[0] else []
+    values = {}
+    for run, rows in zip(runs, results[1:]):
+        for offset, (col, _) in enumerate(run):
+            values[col] = [row[offset] if offset < len(row) else '' for row in rows]
+    return header, values
+
+
+# --- ローカル SQLite ---
+# カテゴリごとに1テーブル (列はシートと同じ、値はすべて文字列)。ID列にインデックスを張る。
+class SQLiteBackend(StorageBackend):
+    def __init__(self, path, category_map=CATEGORY_MAP):
+        self.path = path
+        self._category_map = category_map
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            for cat_name in category_map:
+                self._ensure_table(cat_name)
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {_quote(CHANGE_LOG_SHEET)} (\"連番\" INTEGER PRIMARY KEY AUTOINCREMENT, "
+                + ', '.join(_quote(c) + ' TEXT' for c in CHANGE_LOG_COLUMNS) + ")"
+            )
+
+    def _ensure_table(self, cat_name):
+        table = _quote(cat_name)
+        columns = sheet_columns(cat_name)
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(_quote(c) + ' TEXT' for c in columns)})")
+        # 列定義に後から追加された列を足す
+        existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+        for col in columns:
+            if col not in existing:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {_quote(col)} TEXT")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {_quote('idx_' + cat_name + '_ID')} ON {table} (\"ID\")")
+
+    def _first_rowid(self, table, item_id):
+        row = self._conn.execute(f"SELECT rowid FROM {table} WHERE \"ID\" = ? ORDER BY rowid LIMIT 1", (str(item_id),)).fetchone()
+        return row[0] if row else None
+
+    def _repeated_ids(self, table, ids):
+        # 指定したIDのうち、複数行あるもの
+        ids = list({str(item_id) for item_id in ids})
+        repeated = set()
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ', '.join('?' for _ in chunk)
+            repeated.update(row[0] for row in self._conn.execute(
+                f"SELECT \"ID\" FROM {table} WHERE \"ID\" IN ({placeholders}) GROUP BY \"ID\" HAVING COUNT(*) > 1", chunk
+            ))
+        return repeated
+
+    def load_sheet(self, cat_name, columns, site="一覧読込"):
+        with self._lock:
+            frame = pd.read_sql_query(
+                f"SELECT {', '.join(_quote(c) for c in columns)} FROM {_quote(cat_name)} ORDER BY rowid", self._conn
+            )
+        frame = frame.fillna('')
+        frame['カテゴリ'] = cat_name
+        return frame
+
+    def load_record(self, cat_name, item_id, site="詳細取得"):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT * FROM {_quote(cat_name)} WHERE \"ID\" = ? ORDER BY rowid LIMIT 1", (str(item_id),)
+            ).fetchone()
+        if row is None:
+            return None
+        record = {k: (row[k] if row[k] is not None else '') for k in row.keys()}
+        record['カテゴリ'] = cat_name
+        return record
+
+    def load_full_sheet(self, cat_name, site):
+        with self._lock:
+            frame = pd.read_sql_query(f"SELECT * FROM {_quote(cat_name)} ORDER BY rowid", self._conn)
+        return frame.fillna('')
+
+    def upsert_batch(self, cat_name, rows, site):
+        table = _quote(cat_name)
+        columns = sheet_columns(cat_name)
+        updated = 0
+        appended = 0
+        # まとめて1トランザクションで書き込む (途中で失敗したら全件ロールバック)
+        with self._lock, self._conn:
+            _check_unique(cat_name, [row[0] for row in rows], self._repeated_ids(table, [row[0] for row in rows]))
+            for row in rows:
+                values = [str(v) for v in row] + [''] * (len(columns) - len(row))
+                rowid = self._first_rowid(table, row[0])
+                if rowid is None:
+                    self._insert(table, columns, values)
+                    appended += 1
+                else:
+                    assignments = ', '.join(f"{_quote(c)} = ?" for c in columns)
+                    self._conn.execute(f"UPDATE {table} SET {assignments} WHERE rowid = ?", values + [rowid])
+                    updated += 1
+        return {"updated": updated, "appended": appended}
+
+    def append_batch(self, cat_name, rows, site):
+        table = _quote(cat_name)
+        columns = sheet_columns(cat_name)
+        with self._lock, self._conn:
+            duplicated = [str(row[0]) for row in rows if self._first_rowid(table, row[0]) is not None]
+            if duplicated:
+                raise DuplicateIdError(duplicated)
+            for row in rows:
+                self._insert(table, columns, [str(v) for v in row] + [''] * (len(columns) - len(row)))
+        return len(rows)
+
+    def update_fields(self, cat_name, updates, site):
+        table = _quote(cat_name)
+        columns = set(sheet_columns(cat_name))
+        written = []
+        missing = []
+        with self._lock, self._conn:
+            _check_unique(cat_name, updates, self._repeated_ids(table, updates))
+            for item_id, fields in updates.items():
+                rowid = self._first_rowid(table, item_id)
+                if rowid is None:
+                    missing.append(item_id)
+                    continue
+                fields = {c: v for c, v in fields.items() if c in columns}
+                if fields:
+                    assignments = ', '.join(f"{_quote(c)} = ?" for c in fields)
+                    self._conn.execute(f"UPDATE {table} SET {assignments} WHERE rowid = ?", [str(v) for v in fields.values()] + [rowid])
+                written.append(item_id)
+        return written, missing
+
+    def update_if_unchanged(self, cat_name, item_id, expected, fields, site):
+        # 確認と書き込みを1トランザクションで行う
+        table = _quote(cat_name)
+        fields = {c: str(v) for c, v in fields.items() if c in set(sheet_columns(cat_name))}
+        with self._lock, self._conn:
+            rows = self._conn.execute(f"SELECT rowid, * FROM {table} WHERE \"ID\" = ? ORDER BY rowid LIMIT 2", (str(item_id),)).fetchall()
+            if len(rows) > 1:
+                raise AmbiguousIdError(cat_name, [str(item_id)])
+            if not rows:
+                return False, None
+            rowid = rows[0][0]
+            current = {k: (rows[0][k] if rows[0][k] is not None else '') for k in rows[0].keys() if k != 'rowid'}
+            if any(str(current.get(col, '')) != str(value) for col, value in expected.items()):
+                return False, current
+            if fields:
+                assignments = ', '.join(f"{_quote(c)} = ?" for c in fields)
+                self._conn.execute(f"UPDATE {table} SET {assignments} WHERE rowid = ?", list(fields.values()) + [rowid])
+            current.update(fields)
+        return True, current
+
+    def append_changes(self, changes, site):
+        if not changes:
+            return
+        with self._lock, self._conn:
+            for change in changes:
+                self._insert(_quote(CHANGE_LOG_SHEET), CHANGE_LOG_COLUMNS, _encode_change(change))
+
+    def load_changes(self, after, site):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT \"連番\", {', '.join(_quote(c) for c in CHANGE_LOG_COLUMNS)} FROM {_quote(CHANGE_LOG_SHEET)} "
+                "WHERE \"連番\" > ? ORDER BY \"連番\"", (after,)
+            ).fetchall()
+        return [_decode_change(row[0], list(row)[1:]) for row in rows]
+
+    def last_change_seq(self, site):
+        with self._lock:
+            row = self._conn.execute(f"SELECT MAX(\"連番\") FROM {_quote(CHANGE_LOG_SHEET)}").fetchone()
+        return row[0] or 0
+
+    def compact_changes(self, before, site):
+        # 連番は AUTOINCREMENT なので、古い行を消しても番号は使い回されない
+        with self._lock, self._conn:
+            return self._conn.execute(f"DELETE FROM {_quote(CHANGE_LOG_SHEET)} WHERE \"日時\" < ?", (before,)).rowcount
+
+    def _insert(self, table, columns, values):
+        placeholders = ', '.join('?' for _ in columns)
+        self._conn.execute(f"INSERT INTO {table} ({', '.join(_quote(c) for c in columns)}) VALUES ({placeholders})", values)
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
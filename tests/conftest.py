@@ -0,0 +1,79 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_sheets import FakeClient
+from import_export import build_row
+from inventory_store import InventoryStore
+from schema import CATEGORY_MAP
+from sheets_client import SheetsClient
+from storage import SheetsBackend, SQLiteBackend
+
+SPREADSHEET_NAME = "management_db"
+UNTHROTTLED = 10 ** 6
+
+# テスト用の PC 3台 (ID は文字列で比較する)
+PC_RECORDS = [
+    {"ID": "1", "品名": "ノートPC", "利用者": "佐藤", "ステータス": "利用可能", "OS": "Windows 11", "備考": "",
+     "プロダクトID(シリアルNo)": "SN-001", "チームビューワPW": "secret1"},
+    {"ID": "2", "品名": "デスクトップ", "利用者": "鈴木", "ステータス": "貸出中", "OS": "Windows 10", "備考": "",
+     "プロダクトID(シリアルNo)": "SN-002", "チームビューワPW": "secret2"},
+    {"ID": "10", "品名": "ノートPC", "利用者": "", "ステータス": "廃棄", "OS": "Windows 7", "備考": "",
+     "プロダクトID(シリアルNo)": "SN-010", "チームビューワPW": ""},
+]
+
+
+def seed(backend, records=PC_RECORDS):
+    backend.append_batch("PC", [build_row("PC", r, "2024-04-01") for r in records], site="テスト")
+
+
+def make_sheets_backend(fake):
+    return SheetsBackend(SheetsClient(fake, SPREADSHEET_NAME, read_per_minute=UNTHROTTLED, write_per_minute=UNTHROTTLED))
+
+
+@pytest.fixture
+def fake():
+    fake = FakeClient(latency=0.0)
+    fake.create(SPREADSHEET_NAME)
+    return fake
+
+
+# 保存先ごとに「同じデータを見る2つ目の接続」を作れるようにする (別サーバーのプロセスの代わり)
+@pytest.fixture(params=["sheets", "sqlite"])
+def open_backend(request, fake, tmp_path):
+    if request.param == "sheets":
+        return lambda: make_sheets_backend(fake)
+    path = str(tmp_path / "inventory.db")
+    return lambda: SQLiteBackend(path)
+
+
+@pytest.fixture
+def backend(open_backend):
+    backend = open_backend()
+    seed(backend)
+    return backend
+
+
+@pytest.fixture
+def make_store(backend, open_backend):
+    # 1つ目は seed 済みの backend をそのまま使い、2つ目以降は同じ保存先に新しく接続する
+    backends = [backend]
+
+    def make(poll_interval=0):
+        storage = backends.pop() if backends else open_backend()
+        store = InventoryStore(storage, CATEGORY_MAP, poll_interval=poll_interval)
+        store.get_data()
+        return store
+    return make
+
+
+def add_duplicate_row(backend, fake, cat_name, item_id):
+    # append_batch は既存IDを拒むので、同じIDの行は保存先へ直接足す
+    if isinstance(backend, SQLiteBackend):
+        with backend._conn:
+            backend._conn.execute(f"INSERT INTO \"{cat_name}\" (\"ID\", \"カテゴリ\") VALUES (?, ?)", (item_id, cat_name))
+    else:
+        fake.open(SPREADSHEET_NAME).worksheet(CATEGORY_MAP[cat_name]).append_row([item_id, cat_name])
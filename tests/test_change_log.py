@@ -0,0 +1,86 @@
+import threading
+
+from schema import CATEGORY_MAP
+
+
+def change(when, item_id, fields, origin="other"):
+    return {"日時": when, "カテゴリ": "PC", "ID": item_id, "操作": "更新", "変更内容": fields, "送信元": origin}
+
+
+def test_append_and_load_changes_in_order(backend):
+    assert backend.last_change_seq(site="テスト") == 0
+    backend.append_changes([change("2024-04-01T10:00:00", "1", {"OS": "a"}),
+                            change("2024-04-01T10:01:00", "2", {"OS": "b"})], site="テスト")
+    backend.append_changes([change("2024-04-01T10:02:00", "1", {"OS": "c"})], site="テスト")
+    assert backend.last_change_seq(site="テスト") == 3
+    changes = backend.load_changes(1, site="テスト")
+    assert [(c["連番"], c["ID"], c["変更内容"]) for c in changes] == [(2, "2", {"OS": "b"}), (3, "1", {"OS": "c"})]
+
+
+def test_compaction_drops_old_payloads_but_keeps_sequence(backend):
+    backend.append_changes([change("2024-04-01T10:00:00", "1", {"OS": "a"}),
+                            change("2024-04-09T10:00:00", "2", {"OS": "b"})], site="テスト")
+    assert backend.compact_changes("2024-04-05T00:00:00", site="テスト") == 1
+    assert backend.compact_changes("2024-04-05T00:00:00", site="テスト") == 0
+    assert [c["変更内容"] for c in backend.load_changes(0, site="テスト") if c["ID"] == "1"] in ([], [{}])
+    assert [c["変更内容"] for c in backend.load_changes(1, site="テスト")] == [{"OS": "b"}]
+    backend.append_changes([change("2024-04-10T10:00:00", "1", {"OS": "c"})], site="テスト")
+    assert backend.last_change_seq(site="テスト") == 3
+
+
+def test_sync_changes_applies_other_stores_writes(make_store):
+    a = make_store()
+    b = make_store()
+    a.write_fields("PC", {"2": {"OS": "Ubuntu"}}, site="テスト")
+    a.append_rows("PC", [["20", "PC", "タブレットPC", "", "利用可能", "2024-04-01"]], site="テスト")
+    assert b.sync_changes() == 2
+    df = b.get_data()
+    assert df.loc[df["ID"] == "2", "OS"].tolist() == ["Ubuntu"]
+    assert "20" in set(df["ID"])
+
+
+def test_sync_changes_skips_own_writes(make_store):
+    a = make_store()
+    a.write_fields("PC", {"2": {"OS": "Ubuntu"}}, site="テスト")
+    assert a.sync_changes() == 0
+
+
+def test_change_log_does_not_carry_secret_columns(make_store, backend):
+    a = make_store()
+    base = a.get_record("PC", "1")
+    a.save_record("PC", "1", base, dict(base, チームビューワPW="changed", OS="macOS"), site="テスト")
+    changes = backend.load_changes(0, site="テスト")
+    assert changes
+    for c in changes:
+        assert "チームビューワPW" not in c["変更内容"]
+        assert "パスワード" not in c["変更内容"]
+
+
+def test_reload_runs_outside_the_lock(make_store, backend, monkeypatch):
+    store = make_store()
+    started = threading.Event()
+    release = threading.Event()
+    load_sheet = backend.load_sheet
+
+    def slow_load_sheet(cat_name, *args, **kwargs):
+        # 読み終えたところで止める (この後の書き込みは読んだデータに含まれない)
+        frame = load_sheet(cat_name, *args, **kwargs)
+        if cat_name == "PC":
+            started.set()
+            release.wait(5)
+        return frame
+    monkeypatch.setattr(backend, "load_sheet", slow_load_sheet)
+
+    store.invalidate()
+    loader = threading.Thread(target=store.get_data)
+    loader.start()
+    assert started.wait(5)
+    # 読込中も他のセッションには手元のデータを返し、自分の書き込みも受け付ける
+    assert len(store.get_data()) == 3
+    store.write_fields("PC", {"2": {"OS": "Ubuntu"}}, site="テスト")
+    release.set()
+    loader.join(5)
+    assert not loader.is_alive()
+    df = store.get_data()
+    assert df.loc[df["ID"] == "2", "OS"].tolist() == ["Ubuntu"]
+    assert set(store.status()) == set(CATEGORY_MAP)
@@ -0,0 +1,79 @@
+import json
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+import cli
+from conftest import seed
+from import_export import build_row, read_upload
+from storage import SQLiteBackend
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = tmp_path / "inventory.db"
+    seed(SQLiteBackend(str(path)))
+    secrets = tmp_path / "secrets.toml"
+    secrets.write_text(f'[storage]\nbackend = "sqlite"\npath = "{path.as_posix()}"\n', encoding="utf-8")
+    return {"path": str(path), "secrets": str(secrets), "dir": tmp_path}
+
+
+def run(db, *args):
+    return cli.main(["--secrets", db["secrets"], *args])
+
+
+def test_export_writes_every_category(db):
+    out = db["dir"] / "backup.zip"
+    assert run(db, "export", "--out", str(out)) == cli.EXIT_OK
+    df = read_upload(out.name, out.read_bytes())
+    assert sorted(df.loc[df["カテゴリ"] == "PC", "ID"]) == ["1", "10", "2"]
+
+
+def test_import_dry_run_does_not_write(db):
+    src = db["dir"] / "PC.csv"
+    pd.DataFrame([{"ID": "50", "品名": "新しいPC", "ステータス": "利用可能"}]).to_csv(src, index=False)
+    assert run(db, "import", str(src), "--category", "PC", "--dry-run") == cli.EXIT_OK
+    assert SQLiteBackend(db["path"]).load_record("PC", "50") is None
+
+
+def test_import_writes_in_batches(db):
+    src = db["dir"] / "PC.csv"
+    pd.DataFrame([
+        {"ID": "1", "品名": "ノートPC (更新)", "ステータス": "貸出中"},
+        {"ID": "50", "品名": "新しいPC", "ステータス": "利用可能"},
+        {"ID": "51", "品名": "新しいPC", "ステータス": "利用可能"},
+    ]).to_csv(src, index=False)
+    assert run(db, "import", str(src), "--category", "PC", "--batch-size", "1") == cli.EXIT_OK
+    backend = SQLiteBackend(db["path"])
+    assert backend.load_record("PC", "1")["ステータス"] == "貸出中"
+    assert backend.load_record("PC", "51")["品名"] == "新しいPC"
+
+
+def test_split_batches():
+    chunks = cli.split_batches({"PC": {"1": {}, "2": {}, "3": {}}, "iPad": {"9": {}}}, 2)
+    assert [{cat: list(rows) for cat, rows in chunk.items()} for chunk in chunks] == [
+        {"PC": ["1", "2"], "iPad": ["9"]},
+        {"PC": ["3"]},
+    ]
+
+
+def test_alerts_json_and_exit_code(db, capsys):
+    soon = (date.today() + timedelta(days=10)).isoformat()
+    car = {"ID": "7", "品名": "軽自動車", "ステータス": "利用可能", "登録番号": "品川 1", "車検満了日": soon}
+    SQLiteBackend(db["path"]).append_batch("訪問車", [build_row("訪問車", car, "")], site="テスト")
+    assert run(db, "alerts", "--json", "--days", "30") == cli.EXIT_OK
+    result = json.loads(capsys.readouterr().out)
+    assert result["alerts"] == [{"title": "訪問車【軽自動車 品川 1】", "messages": [f"車検満了日 あと10日 ({soon})"]}]
+    assert [u["ID"] for u in result["upcoming"]] == ["7"]
+    assert run(db, "alerts", "--exit-code") == cli.EXIT_ALERTS
+
+
+def test_check_reports_duplicates(db, capsys):
+    assert run(db, "check", "--exit-code") == cli.EXIT_OK
+    capsys.readouterr()
+    ipad = {"ID": "2", "品名": "iPad", "ステータス": "利用可能"}
+    SQLiteBackend(db["path"]).append_batch("iPad", [build_row("iPad", ipad, "")], site="テスト")
+    assert run(db, "check", "--json", "--exit-code") == cli.EXIT_ALERTS
+    issues = json.loads(capsys.readouterr().out)["issues"]
+    assert [(i["種類"], i["値"]) for i in issues] == [("ID重複 (別シート)", "2")]
@@ -0,0 +1,156 @@
+import os
+
+import pandas as pd
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from conftest import PC_RECORDS, SPREADSHEET_NAME, add_duplicate_row
+from import_export import export_bytes
+from inventory_store import ConflictError
+from schema import sheet_columns
+from storage import AmbiguousIdError
+
+APP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+SUBMIT_KEY = "FormSubmitter:edit_dialog_form-✅ この内容で更新する"
+
+
+# --- 保存先の条件付き書き込み ---
+def test_update_if_unchanged_writes_when_expected_matches(backend):
+    ok, current = backend.update_if_unchanged("PC", "2", {"OS": "Windows 10"}, {"OS": "Windows 11"}, site="テスト")
+    assert ok
+    assert current["OS"] == "Windows 11"
+    assert current["品名"] == "デスクトップ"
+    assert backend.load_record("PC", "2")["OS"] == "Windows 11"
+
+
+def test_update_if_unchanged_returns_current_row_on_mismatch(backend):
+    backend.update_fields("PC", {"2": {"OS": "Ubuntu"}}, site="テスト")
+    ok, current = backend.update_if_unchanged("PC", "2", {"OS": "Windows 10"}, {"OS": "Windows 11"}, site="テスト")
+    assert not ok
+    assert current["OS"] == "Ubuntu"
+    assert backend.load_record("PC", "2")["OS"] == "Ubuntu"
+
+
+def test_update_if_unchanged_missing_id(backend):
+    assert backend.update_if_unchanged("PC", "999", {}, {"OS": "x"}, site="テスト") == (False, None)
+
+
+def test_update_if_unchanged_refuses_ambiguous_id(backend, fake):
+    add_duplicate_row(backend, fake, "PC", "2")
+    with pytest.raises(AmbiguousIdError):
+        backend.update_if_unchanged("PC", "2", {}, {"OS": "x"}, site="テスト")
+
+
+def test_sheets_save_finds_the_row_after_rows_move(make_store, backend, fake):
+    if not hasattr(backend, "_row_numbers"):
+        pytest.skip("行番号を持つのは Sheets だけ")
+    store = make_store()
+    base = store.get_record("PC", "2")
+    # 一覧を読んだ後にシート上で行が消され、ID 2 の行が1つ上にずれる
+    del fake.open(SPREADSHEET_NAME).worksheet("PC")._rows[1]
+    store.save_record("PC", "2", base, dict(base, OS="macOS"), site="テスト")
+    assert backend.load_record("PC", "2")["OS"] == "macOS"
+    assert backend.load_record("PC", "10")["OS"] == "Windows 7"
+
+
+# --- 詳細画面の保存 (列ごとの突き合わせ) ---
+def test_save_record_writes_only_changed_columns(make_store, backend):
+    store = make_store()
+    base = store.get_record("PC", "1")
+    result = store.save_record("PC", "1", base, dict(base, OS="macOS"), site="テスト")
+    assert result == {"written": ["OS"], "merged": []}
+    assert backend.load_record("PC", "1")["OS"] == "macOS"
+    df = store.get_data()
+    assert df.loc[df["ID"] == "1", "OS"].tolist() == ["macOS"]
+
+
+def test_save_record_keeps_other_users_change_to_another_column(make_store, backend):
+    store = make_store()
+    base = store.get_record("PC", "1")
+    backend.update_fields("PC", {"1": {"利用者": "田中"}}, site="テスト")
+    result = store.save_record("PC", "1", base, dict(base, OS="macOS"), site="テスト")
+    assert result["written"] == ["OS"]
+    assert result["merged"] == ["利用者"]
+    record = backend.load_record("PC", "1")
+    assert (record["OS"], record["利用者"]) == ("macOS", "田中")
+
+
+def test_save_record_raises_conflict_for_the_same_column(make_store, backend):
+    store = make_store()
+    base = store.get_record("PC", "1")
+    backend.update_fields("PC", {"1": {"OS": "Ubuntu"}}, site="テスト")
+    with pytest.raises(ConflictError) as e:
+        store.save_record("PC", "1", base, dict(base, OS="macOS"), site="テスト")
+    assert e.value.conflicts == {"OS": ("Windows 11", "Ubuntu", "macOS")}
+    assert backend.load_record("PC", "1")["OS"] == "Ubuntu"
+
+
+def test_save_record_force_overwrites(make_store, backend):
+    store = make_store()
+    base = store.get_record("PC", "1")
+    backend.update_fields("PC", {"1": {"OS": "Ubuntu"}}, site="テスト")
+    result = store.save_record("PC", "1", base, dict(base, OS="macOS"), site="テスト", force=True)
+    assert result["written"] == ["OS"]
+    assert backend.load_record("PC", "1")["OS"] == "macOS"
+
+
+def test_save_record_same_value_is_not_a_conflict(make_store, backend):
+    store = make_store()
+    base = store.get_record("PC", "1")
+    backend.update_fields("PC", {"1": {"OS": "macOS"}}, site="テスト")
+    result = store.save_record("PC", "1", base, dict(base, OS="macOS"), site="テスト")
+    assert result["written"] == []
+
+
+def test_save_record_detects_conflict_before_the_next_poll(make_store, backend):
+    # 差分の確認間隔内に別のプロセスが保存していても、保存前の確認で競合として止める
+    a = make_store(poll_interval=5)
+    b = make_store(poll_interval=5)
+    base_a = a.get_record("PC", "2")
+    base_b = b.get_record("PC", "2")
+    a.save_record("PC", "2", base_a, dict(base_a, OS="Ubuntu"), site="テスト")
+    with pytest.raises(ConflictError):
+        b.save_record("PC", "2", base_b, dict(base_b, OS="macOS"), site="テスト")
+    assert backend.load_record("PC", "2")["OS"] == "Ubuntu"
+
+
+# --- 詳細ダイアログ (2つのセッション) ---
+@pytest.fixture
+def seed_file(tmp_path):
+    df = pd.DataFrame([dict(r, カテゴリ="PC") for r in PC_RECORDS])
+    data, ext, _ = export_bytes({"PC": df.reindex(columns=sheet_columns("PC"), fill_value="")}, "CSV")
+    path = tmp_path / f"seed.{ext}"
+    path.write_bytes(data)
+    st.cache_resource.clear()
+    yield str(path)
+    st.cache_resource.clear()
+
+
+def open_app(seed_file):
+    at = AppTest.from_file(APP_FILE, default_timeout=60)
+    at.secrets["sheets"] = {"client": "fake", "seed_file": seed_file}
+    return at.run()
+
+
+def submit_os(at, button, value):
+    # AppTest はダイアログだけを再実行できないので、詳細ボタンと保存ボタンを同じ回に押す
+    at.button(key=button).click()
+    at.text_input(key="detail_OS").input(value)
+    at.button(key=SUBMIT_KEY).click()
+    return at.run()
+
+
+def test_dialog_keeps_its_base_when_another_session_saves(seed_file):
+    a = open_app(seed_file)
+    b = open_app(seed_file)
+    button = next(x.key for x in b.button if x.key and x.key.startswith("btn_"))
+    b.button(key=button).click().run()
+    a.button(key=button).click().run()
+    submit_os(a, button, "Ubuntu")
+    assert [t.value for t in a.toast] == ["更新しました！"]
+    # B は開いたときの版のまま保存するので、入力は捨てられずに競合として表示される
+    submit_os(b, button, "macOS")
+    assert [t.value for t in b.toast] == []
+    assert [x.key for x in b.button if x.key == "conflict_force_btn"]
+    assert b.text_input(key="detail_OS").value == "macOS"
@@ -0,0 +1,110 @@
+import os
+import sys
+from datetime import date
+
+import pandas as pd
+
+from alerts import collect_alerts
+from expiry import ExpiryIndex, add_years, timeline_frame
+from schema import parse_date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+from generate_inventory import generate  # noqa: E402
+
+TODAY = date(2024, 6, 1)
+
+
+def frame(rows):
+    return pd.DataFrame(rows).fillna("")
+
+
+def test_add_years_moves_leap_day_to_feb_28():
+    assert add_years(date(2020, 2, 29), 5) == date(2025, 2, 28)
+    assert add_years(date(2020, 3, 1), 5) == date(2025, 3, 1)
+
+
+def test_index_skips_disposed_rows_and_unreadable_dates():
+    index = ExpiryIndex.build(frame([
+        {"カテゴリ": "訪問車", "ID": "1", "ステータス": "利用可能", "車検満了日": "2024/07/01", "リース満了日": "未定"},
+        {"カテゴリ": "訪問車", "ID": "2", "ステータス": "廃棄", "車検満了日": "2024/06/10"},
+        {"カテゴリ": "iPad", "ID": "3", "ステータス": "利用可能", "購入日": "2019-05-01"},
+    ]))
+    assert [(e["ID"], e["項目"], e["期日"]) for e in index.entries] == [
+        ("3", "購入から5年", date(2024, 5, 1)),
+        ("1", "車検満了日", date(2024, 7, 1)),
+    ]
+
+
+def test_between_and_due_within():
+    index = ExpiryIndex.build(frame([
+        {"カテゴリ": "ウイルスバスター", "ID": "1", "ステータス": "", "期限": "2024-05-01"},
+        {"カテゴリ": "ウイルスバスター", "ID": "2", "ステータス": "", "期限": "2024-06-30"},
+        {"カテゴリ": "PC", "ID": "3", "ステータス": "", "ウィルスバスター期限": "2024-12-31"},
+    ]))
+    assert [e["ID"] for e in index.between(TODAY, date(2024, 12, 31))] == ["2", "3"]
+    assert [e["ID"] for e in index.due_within(30, TODAY)] == ["1", "2"]
+    assert [e["ID"] for e in index.between(categories={"PC"})] == ["3"]
+
+
+def test_timeline_groups_overdue_and_months():
+    index = ExpiryIndex.build(frame([
+        {"カテゴリ": "ウイルスバスター", "ID": "1", "ステータス": "", "期限": "2024-05-01"},
+        {"カテゴリ": "ウイルスバスター", "ID": "2", "ステータス": "", "期限": "2024-06-30"},
+    ]))
+    timeline = timeline_frame(index.entries, TODAY)
+    assert timeline["月"].tolist() == ["期限切れ", "2024年6月"]
+    assert timeline["残り日数"].tolist() == [-31, 29]
+
+
+def test_alert_messages():
+    df = frame([
+        {"カテゴリ": "訪問車", "ID": "1", "品名": "軽自動車", "登録番号": "品川 1", "ステータス": "利用可能",
+         "リース満了日": "2024-05-20", "車検満了日": "2024-07-01"},
+        {"カテゴリ": "iPad", "ID": "2", "品名": "iPad", "ラベル": "A-1", "ステータス": "利用可能", "購入日": "2019-06-01"},
+        {"カテゴリ": "iPad", "ID": "3", "品名": "iPad", "ラベル": "A-2", "ステータス": "利用可能", "購入日": "2019-06-02"},
+    ])
+    assert [(a["title"], a["messages"]) for a in collect_alerts(df, TODAY)] == [
+        ("訪問車【軽自動車 品川 1】", ["リース満了日 超過 (2024-05-20)", "車検満了日 あと30日 (2024-07-01)"]),
+        ("iPad【A-1 iPad】", ["購入から5年経過 (2019-06-01)"]),
+    ]
+
+
+def baseline_alerts(df, today):
+    # 索引を使う前の、行ごとに全列を調べていた実装 (結果が変わっていないことの確認用)
+    alert_items = []
+    for _, row in df.iterrows():
+        if str(row.get('ステータス', '')).strip() == '廃棄':
+            continue
+        cat = row.get('カテゴリ')
+        name = row.get('品名', '名称不明')
+        msg_list = []
+        if cat == "訪問車":
+            display_text = f"{name} {str(row.get('登録番号', ''))}".strip()
+            for col in ["リース満了日", "車検満了日", "駐禁除外指定満了日", "通行禁止許可満了日"]:
+                dt = parse_date(row.get(col))
+                if dt:
+                    diff = (dt.date() - today).days
+                    if diff < 0:
+                        msg_list.append(f"{col} 超過 ({dt.strftime('%Y-%m-%d')})")
+                    elif diff <= 45:
+                        msg_list.append(f"{col} あと{diff}日 ({dt.strftime('%Y-%m-%d')})")
+            if msg_list:
+                alert_items.append((f"訪問車【{display_text}】", msg_list))
+        elif cat == "iPad":
+            display_text = f"{str(row.get('ラベル', ''))} {name}".strip()
+            dt = parse_date(row.get("購入日"))
+            if dt:
+                target = add_years(dt.date(), 5)
+                if today >= target:
+                    msg_list.append(f"購入から5年経過 ({dt.strftime('%Y-%m-%d')})")
+            if msg_list:
+                alert_items.append((f"iPad【{display_text}】", msg_list))
+    return alert_items
+
+
+def test_alerts_match_the_row_by_row_implementation():
+    df = generate(3000, seed=1).reset_index(drop=True)
+    today = date.today()
+    alerts = collect_alerts(df, today)
+    assert alerts
+    assert [(a["title"], a["messages"]) for a in alerts] == baseline_alerts(df, today)
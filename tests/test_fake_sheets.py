@@ -0,0 +1,62 @@
+import time
+
+import gspread
+import pytest
+
+from conftest import SPREADSHEET_NAME
+from fake_sheets import FakeClient
+
+
+def status_of(error):
+    return error.response.status_code
+
+
+def test_seeded_sheet_reads_like_gspread(fake):
+    worksheet = fake.open(SPREADSHEET_NAME).worksheet("PC")
+    worksheet.append_rows([["1", "PC", "ノートPC"], ["2", "PC", "デスクトップ"]])
+    assert worksheet.col_values(1) == ["ID", "1", "2"]
+    assert worksheet.row_values(3)[:3] == ["2", "PC", "デスクトップ"]
+    assert worksheet.find("2", in_column=1).row == 3
+
+
+def test_latency_is_applied_to_every_call():
+    fake = FakeClient(latency=0.05)
+    fake.create(SPREADSHEET_NAME)
+    start = time.monotonic()
+    fake.open(SPREADSHEET_NAME).worksheet("PC").row_values(1)
+    assert time.monotonic() - start >= 0.15
+
+
+def test_read_quota_returns_429_with_retry_after():
+    fake = FakeClient(read_quota=2)
+    fake.create(SPREADSHEET_NAME)
+    spreadsheet = fake.open(SPREADSHEET_NAME)
+    spreadsheet.worksheet("PC")
+    with pytest.raises(gspread.exceptions.APIError) as e:
+        spreadsheet.worksheet("PC")
+    assert status_of(e.value) == 429
+    assert float(e.value.response.headers["Retry-After"]) > 0
+    assert fake.counts == {"read": 2, "write": 0, "429": 1, "503": 0}
+
+
+def test_write_quota_is_counted_separately():
+    fake = FakeClient(write_quota=1)
+    fake.create(SPREADSHEET_NAME)
+    worksheet = fake.open(SPREADSHEET_NAME).worksheet("PC")
+    worksheet.append_row(["1", "PC", "ノートPC"])
+    with pytest.raises(gspread.exceptions.APIError) as e:
+        worksheet.append_row(["2", "PC", "デスクトップ"])
+    assert status_of(e.value) == 429
+    # 超過した書き込みは反映されず、読み取りはできる
+    assert worksheet.col_values(1) == ["ID", "1"]
+
+
+def test_error_rate_returns_503_without_applying_the_call():
+    fake = FakeClient(error_rate=1.0, seed=0)
+    fake.create(SPREADSHEET_NAME)
+    with pytest.raises(gspread.exceptions.APIError) as e:
+        fake.open(SPREADSHEET_NAME)
+    assert status_of(e.value) == 503
+    assert fake.counts["503"] == 1
+    fake.error_rate = 0.0
+    assert fake.open(SPREADSHEET_NAME).worksheet("PC").col_values(1) == ["ID"]
@@ -0,0 +1,107 @@
+import io
+import zipfile
+
+import pandas as pd
+
+from import_export import build_row, commit_all, export_bytes, plan_import, read_upload
+from schema import sheet_columns
+
+
+def test_plan_import_groups_rows_by_category():
+    df = pd.DataFrame([
+        {"ID": "1", "カテゴリ": "PC", "品名": "ノートPC", "ステータス": ""},
+        {"ID": "5", "カテゴリ": "iPad", "品名": "iPad Air", "ステータス": "貸出中"},
+    ])
+    batches, errors, warnings = plan_import(df)
+    assert errors == [] and warnings == []
+    assert batches["PC"]["1"]["ステータス"] == "利用可能"
+    assert batches["iPad"]["5"]["品名"] == "iPad Air"
+
+
+def test_plan_import_reports_row_errors():
+    df = pd.DataFrame([
+        {"ID": "", "カテゴリ": "PC", "ステータス": "利用可能"},
+        {"ID": "2", "カテゴリ": "冷蔵庫", "ステータス": "利用可能"},
+        {"ID": "3", "カテゴリ": "PC", "ステータス": "紛失"},
+    ])
+    batches, errors, _ = plan_import(df)
+    assert batches == {}
+    assert errors == [
+        "2行目: IDが空欄です",
+        "3行目: カテゴリ「冷蔵庫」は登録されていません",
+        "4行目: ステータス「紛失」は選択肢にありません",
+    ]
+
+
+def test_plan_import_warns_on_unknown_columns_and_duplicates():
+    df = pd.DataFrame([
+        {"ID": "1", "品名": "古い", "色": "黒"},
+        {"ID": "1", "品名": "新しい", "色": "白"},
+    ])
+    batches, errors, warnings = plan_import(df, fixed_cat="PC")
+    assert errors == []
+    assert batches["PC"]["1"]["品名"] == "新しい"
+    assert any("色" in w for w in warnings)
+    assert any("重複" in w for w in warnings)
+
+
+def test_plan_import_needs_category_column():
+    _, errors, _ = plan_import(pd.DataFrame([{"ID": "1"}]))
+    assert errors
+
+
+def test_plan_import_warns_about_columns_of_another_category():
+    df = pd.DataFrame([
+        {"ID": "1", "カテゴリ": "PC", "OS": "Windows 11", "登録番号": "品川 300 あ 1234"},
+        {"ID": "2", "カテゴリ": "訪問車", "OS": "", "登録番号": "品川 300 あ 5678"},
+    ])
+    batches, errors, warnings = plan_import(df)
+    assert errors == []
+    assert warnings == ["2行目: PC にない列の値は取り込みません: 登録番号"]
+    assert set(batches) == {"PC", "訪問車"}
+
+
+def test_zip_rows_are_reported_by_file_and_line():
+    pc = pd.DataFrame([{"ID": "1", "品名": "ノートPC", "ステータス": ""}, {"ID": "", "品名": "ID なし", "ステータス": ""}])
+    car = pd.DataFrame([{"ID": "9", "品名": "軽自動車", "ステータス": "紛失"}])
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("PC_inventory.csv", pc.to_csv(index=False))
+        zf.writestr("訪問車_inventory.csv", car.to_csv(index=False))
+    _, errors, warnings = plan_import(read_upload("all.zip", buf.getvalue()))
+    assert errors == [
+        "PC_inventory.csv 3行目: IDが空欄です",
+        "訪問車_inventory.csv 2行目: ステータス「紛失」は選択肢にありません",
+    ]
+    assert warnings == []
+
+
+def test_xlsx_rows_are_reported_by_sheet_and_line():
+    frames = {
+        "PC": pd.DataFrame([{"ID": "1", "カテゴリ": "PC", "品名": "ノートPC", "ステータス": "利用可能"}]).reindex(columns=sheet_columns("PC"), fill_value=""),
+        "iPad": pd.DataFrame([{"ID": "", "カテゴリ": "iPad", "品名": "iPad", "ステータス": "利用可能"}]).reindex(columns=sheet_columns("iPad"), fill_value=""),
+    }
+    data, ext, _ = export_bytes(frames, "Excel (XLSX)")
+    _, errors, _ = plan_import(read_upload(f"all.{ext}", data))
+    assert errors == ["iPad シート 2行目: IDが空欄です"]
+
+
+def test_build_row_follows_sheet_column_order():
+    row = build_row("PC", {"ID": "1", "品名": "ノートPC", "ステータス": "利用可能", "備考": "メモ"}, "2024-04-01")
+    assert len(row) == len(sheet_columns("PC"))
+    assert row[:6] == ["1", "PC", "ノートPC", "", "利用可能", "2024-04-01"]
+    assert row[-1] == "メモ"
+
+
+def test_commit_all_updates_and_appends_per_sheet(make_store, backend):
+    store = make_store()
+    df = pd.DataFrame([
+        {"ID": "1", "カテゴリ": "PC", "品名": "ノートPC (更新)", "ステータス": "貸出中"},
+        {"ID": "30", "カテゴリ": "iPad", "品名": "iPad mini", "ステータス": ""},
+    ])
+    batches, _, _ = plan_import(df)
+    results = commit_all(store, batches)
+    assert results == {"PC": {"updated": 1, "appended": 0}, "iPad": {"updated": 0, "appended": 1}}
+    assert backend.load_record("PC", "1")["ステータス"] == "貸出中"
+    assert backend.load_record("iPad", "30")["品名"] == "iPad mini"
+    assert set(store.get_data()["ID"]) >= {"1", "30"}
@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+
+from conftest import add_duplicate_row
+from integrity import ISSUE_CROSS_SHEET, ISSUE_NOTATION, ISSUE_SAME_SHEET, IntegrityReport, normalize_key
+from storage import AmbiguousIdError
+
+
+def frame(rows):
+    return pd.DataFrame(rows).fillna("")
+
+
+def test_normalize_key():
+    assert normalize_key("ｐｃ－００１") == normalize_key("PC-001")
+    assert normalize_key("090-1234-5678", "電話番号") == "09012345678"
+    assert normalize_key("不明", "シリアル番号") == ""
+
+
+def test_clean_data_has_no_issues():
+    report = IntegrityReport.build(frame([
+        {"カテゴリ": "PC", "ID": "1", "プロダクトID(シリアルNo)": "A"},
+        {"カテゴリ": "PC", "ID": "2", "プロダクトID(シリアルNo)": "B"},
+    ]))
+    assert len(report) == 0
+    assert report.ambiguous == {}
+
+
+def test_duplicate_ids():
+    report = IntegrityReport.build(frame([
+        {"カテゴリ": "PC", "ID": "1"},
+        {"カテゴリ": "PC", "ID": "1"},
+        {"カテゴリ": "PC", "ID": "7"},
+        {"カテゴリ": "iPad", "ID": "7"},
+        {"カテゴリ": "PC", "ID": "a1"},
+        {"カテゴリ": "PC", "ID": "A1"},
+    ]))
+    assert [i["種類"] for i in report.issues] == [ISSUE_SAME_SHEET, ISSUE_CROSS_SHEET, ISSUE_NOTATION]
+    assert report.ambiguous == {"PC": {"1"}}
+    assert report.counts() == {ISSUE_SAME_SHEET: 1, ISSUE_CROSS_SHEET: 1, ISSUE_NOTATION: 1}
+
+
+def test_duplicate_serial_across_categories():
+    report = IntegrityReport.build(frame([
+        {"カテゴリ": "PC", "ID": "1", "プロダクトID(シリアルNo)": "sn-100"},
+        {"カテゴリ": "iPad", "ID": "2", "シリアルNo": "SN 100"},
+        {"カテゴリ": "iPad", "ID": "3", "シリアルNo": "-"},
+        {"カテゴリ": "PC", "ID": "4", "プロダクトID(シリアルNo)": "-"},
+    ]))
+    assert report.counts() == {"シリアル番号重複": 1}
+    assert report.to_frame()["件数"].tolist() == [2]
+
+
+def test_store_report_and_refused_writes_for_repeated_ids(make_store, backend, fake):
+    add_duplicate_row(backend, fake, "PC", "2")
+    store = make_store()
+    report = store.derived("integrity", IntegrityReport.build)
+    assert report.ambiguous == {"PC": {"2"}}
+    with pytest.raises(AmbiguousIdError):
+        backend.update_fields("PC", {"2": {"OS": "x"}}, site="テスト")
+    with pytest.raises(AmbiguousIdError):
+        backend.upsert_batch("PC", [["2", "PC", "上書き"]], site="テスト")
+    # 重複していない ID は書き込める
+    assert backend.update_fields("PC", {"1": {"OS": "x"}}, site="テスト") == (["1"], [])
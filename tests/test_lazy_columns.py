@@ -0,0 +1,29 @@
+from search import filter_by_query
+
+
+def test_list_frame_has_search_columns_but_not_passwords(make_store, backend):
+    backend.update_fields("PC", {"2": {"備考": "予備機として保管"}}, site="テスト")
+    df = make_store().get_data()
+    assert "備考" in df.columns
+    assert "チームビューワPW" not in df.columns
+    assert filter_by_query(df, "予備機")["ID"].tolist() == ["2"]
+    assert filter_by_query(df, "secret1").empty
+
+
+def test_get_record_returns_every_column(make_store):
+    record = make_store().get_record("PC", "1")
+    assert record["チームビューワPW"] == "secret1"
+    assert record["OS"] == "Windows 11"
+
+
+def test_combined_frame_sorts_numeric_ids_by_value(make_store):
+    df = make_store().get_data()
+    # 廃棄 (ID 10) は末尾、それ以外は ID の数値順
+    assert df["ID"].tolist() == ["1", "2", "10"]
+
+
+def test_numeric_ids_come_before_other_ids(make_store):
+    store = make_store()
+    store.append_rows("PC", [["9", "PC", "", "", "利用可能", ""], ["A-1", "PC", "", "", "利用可能", ""]], site="テスト")
+    df = store.get_data()
+    assert df["ID"].tolist() == ["1", "2", "9", "A-1", "10"]
@@ -0,0 +1,116 @@
+import gspread
+import pytest
+import requests
+from urllib3.exceptions import NewConnectionError
+
+import sheets_client
+from conftest import SPREADSHEET_NAME, UNTHROTTLED
+from fake_sheets import _api_error
+from sheets_client import SheetsClient, TokenBucket
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # 待ち時間は記録だけして、実際には待たない
+    recorded = []
+    monkeypatch.setattr(sheets_client.time, "sleep", recorded.append)
+    return recorded
+
+
+def make_client(fake=None, **kwargs):
+    kwargs.setdefault("read_per_minute", UNTHROTTLED)
+    kwargs.setdefault("write_per_minute", UNTHROTTLED)
+    return SheetsClient(fake, SPREADSHEET_NAME, **kwargs)
+
+
+def failing(name, errors, result="ok"):
+    # errors を順に送出し、尽きたら result を返す API 呼び出しの代わり
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    func.__name__ = name
+    func.calls = calls
+    return func
+
+
+def test_retries_5xx_with_exponential_backoff(sleeps):
+    client = make_client(base_delay=1.0, max_delay=3.0)
+    func = failing("get", [_api_error(503, "unavailable")] * 3)
+    assert client.call("テスト", "read", func) == "ok"
+    assert len(func.calls) == 4
+    assert len(sleeps) == 3
+    for attempt, delay in enumerate(sleeps):
+        assert 0 <= delay <= min(3.0, 2 ** attempt)
+    assert client.stats()[0]["リトライ"] == 3
+
+
+def test_gives_up_after_max_retries(sleeps):
+    client = make_client(max_retries=2, base_delay=0.01)
+    func = failing("get", [_api_error(500, "error")] * 5)
+    with pytest.raises(gspread.exceptions.APIError):
+        client.call("テスト", "read", func)
+    assert len(func.calls) == 3
+    assert client.stats()[0]["エラー"] == 1
+
+
+def test_honours_retry_after(sleeps):
+    client = make_client(base_delay=0.01)
+    func = failing("get", [_api_error(503, "unavailable", retry_after=4)])
+    client.call("テスト", "read", func)
+    assert sleeps == [5.0]
+
+
+def test_does_not_retry_client_errors(sleeps):
+    client = make_client()
+    func = failing("get", [_api_error(400, "bad request")])
+    with pytest.raises(gspread.exceptions.APIError):
+        client.call("テスト", "read", func)
+    assert len(func.calls) == 1 and sleeps == []
+
+
+def test_append_is_not_retried_after_5xx_or_read_timeout(sleeps):
+    client = make_client(base_delay=0.01)
+    for error in [_api_error(503, "unavailable"), requests.exceptions.ReadTimeout()]:
+        func = failing("append_rows", [error])
+        with pytest.raises(type(error)):
+            client.call("テスト", "write", func)
+        assert len(func.calls) == 1
+    assert sleeps == []
+
+
+def test_append_is_retried_when_the_request_never_ran(sleeps):
+    client = make_client(base_delay=0.01)
+    refused = requests.exceptions.ConnectionError(NewConnectionError(None, "refused"))
+    func = failing("append_rows", [_api_error(429, "quota"), refused, requests.exceptions.ConnectTimeout()])
+    assert client.call("テスト", "write", func) == "ok"
+    assert len(func.calls) == 4
+
+
+def test_429_pauses_the_whole_bucket(sleeps, monkeypatch):
+    client = make_client(base_delay=0.01)
+    bucket = client._buckets["read"]
+    paused = []
+    monkeypatch.setattr(bucket, "pause", paused.append)
+    client.call("テスト", "read", failing("get", [_api_error(503, "unavailable"), _api_error(429, "quota")]))
+    # 503 はその呼び出しだけが待ち、429 は同じバケットを使う呼び出しをまとめて止める
+    assert len(sleeps) == 2
+    assert paused == sleeps[1:]
+
+
+def test_token_bucket_waits_when_empty():
+    bucket = TokenBucket(per_minute=600, burst=1)
+    assert bucket.acquire() < 0.05
+    # 1秒に10回なので、2回目はおよそ 0.1 秒待つ
+    assert 0.05 < bucket.acquire() < 0.5
+
+
+def test_worksheet_handles_are_opened_once(fake):
+    client = make_client(fake)
+    client.worksheet("PC", site="テスト").row_values(1)
+    client.worksheet("PC", site="テスト").row_values(1)
+    # open 1回 + worksheet 1回 + row_values 2回
+    assert fake.counts["read"] == 4
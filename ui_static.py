@@ -0,0 +1,138 @@
+# --- 画面の固定コンテンツ ---
+# 再実行のたびに組み立て直さないよう、プロセスで1度だけ読み込まれるモジュールに置く
+
+# --- CSS (UI調整: 極限までコンパクト化) ---
+APP_CSS = """
+    <style>
+        /* メインエリアの上部余白 */
+        .block-container {
+            padding-top: 4rem !important;
+            padding-bottom: 5rem;
+        }
+
+        /* タイトルの固定 */
+        div[data-testid="stVerticalBlock"] > div:has(h1) {
+            position: sticky !important;
+            top: 2.875rem !important;
+            background-color: white !important;
+            z-index: 1000 !important;
+            padding-top: 1rem !important;
+            padding-bottom: 0.5rem !important;
+            border-bottom: 2px solid #f0f2f6;
+            margin-bottom: 0 !important;
+        }
+        
+        h1 {
+            margin: 0 !important;
+            padding: 0 !important;
+            font-size: 1.8rem !important;
+        }
+
+        /* タブバーの固定 */
+        div[data-baseweb="tab-list"],
+        div[role="tablist"],
+        div[data-testid="stTabs"] > div:first-child {
+            position: sticky !important;
+            top: 6.8rem !important;
+            background-color: white !important;
+            z-index: 999 !important;
+            padding-top: 0.5rem !important;
+            padding-bottom: 0.5rem !important;
+            box-shadow: 0 2px 4px rgba(0,0,0,0.05);
+        }
+
+        div[data-testid="stTabs"] button {
+            background-color: white !important;
+        }
+
+        /* === 行間短縮のための設定 === */
+        
+        /* ボタンを小さく薄く */
+        .stButton button {
+            height: 1.6rem !important;
+            min-height: 1.6rem !important;
+            padding-top: 0 !important;
+            padding-bottom: 0 !important;
+            margin-top: 2px !important;
+            font-size: 0.8rem !important;
+        }
+        
+        /* テキストの行間・余白を削除 */
+        p {
+            margin-bottom: 0px !important;
+            padding-bottom: 0px !important;
+            font-size: 0.9rem !important;
+            line-height: 1.7rem !important;
+        }
+        
+        /* 区切り線(hr)の余白を極小に */
+        hr {
+            margin: 2px 0 !important;
+            padding: 0 !important;
+        }
+        
+        /* 列(カラム)内の余白削除 */
+        div[data-testid="column"] {
+            padding: 0px !important;
+        }
+        
+        /* 要素間の垂直ギャップを詰める */
+        div.stMarkdown {
+            margin-bottom: 0px !important;
+        }
+        
+        /* アラート外枠のパディング調整 */
+        div.alert-box {
+            padding: 0.5rem 1rem !important;
+        }
+        
+        /* トグルスイッチの位置調整 */
+        div[data-testid="stToggle"] {
+            margin-top: 0px;
+            padding-top: 5px;
+        }
+        div[data-testid="stToggle"] label {
+            font-size: 0.9rem !important;
+        }
+    </style>
+"""
+
+# --- 操作マニュアル ---
+MANUAL_MARKDOWN = """
+**1. 検索機能**
+* 画面上部の枠に文字を入れて `Enter` を押すと検索できます。
+* **バーコードリーダー対応:** 入力後、自動で文字が消えるので連続して読み取れます。
+* 「検索解除」ボタンで全表示に戻ります。
+* 備考も検索の対象です。パスワード類は検索の対象外です。
+
+**2. 期日アラート**
+* 期限が **45日以内**（車）または **5年経過**（iPad）の場合、検索窓の下に赤字で警告が出ます。
+* アラート右側の **「詳細」ボタン** を押すと、その場で編集・確認ができます。
+* 赤枠内のトグルスイッチで「訪問車」と「iPad」の表示を切り替えられます。
+* アラートが多いときは先頭の20件だけを表示します。「残りの○件も表示する」をONにすると全件表示されます。
+
+**3. 編集・更新**
+* リスト左の「詳細」ボタンで編集画面が開きます。
+* 内容を書き換えて「更新する」を押すと保存されます。書き換えた項目だけが保存されます。
+* 編集中に他の人が別の項目を更新していた場合は、その変更を残したまま保存します。同じ項目を更新していた場合は保存せずに両方の値を表示するので、「自分の入力で上書きする」か「最新の内容で編集し直す」を選んでください。
+
+**4. 一括編集**
+* 「複数選択して一括編集」をONにすると、リスト左側がチェックボックスになります。
+* 選択した全件のステータス・利用者・使用部署をまとめて変更できます。
+
+**5. 新規登録**
+* 上部のタブを「📝 新規登録」に切り替えて入力してください。
+
+**6. ファイル一括入出力**
+* データをCSV・Excel・Parquetでダウンロードして編集し、一括で更新・登録ができます。
+* 「すべて」でダウンロードしたZIP (またはカテゴリ列を含む1つのCSV) は、そのまま全カテゴリまとめて取り込めます。
+* その行のカテゴリにない列 (例: PCの行の登録番号) に入っている値は取り込まれず、警告に行番号付きで表示されます。
+
+**7. 期限カレンダー**
+* ウイルスバスター期限・車検やリースの満了日・iPadの買い替え時期を、月ごとにまとめて確認できます。
+* 期間とカテゴリを選ぶと、更新の予定を立てたい範囲だけに絞り込めます。
+
+**8. データ整合性レポート**
+* IDの重複や、シリアル番号・IMEI・電話番号が複数の行に登録されている場合は画面上部に警告が出ます。
+* 同じシート内でIDが重複している行は、誤った行を上書きしないよう編集・インポートで書き込まれません。スプレッドシート上で重複を解消してください。
+"""